@@ -0,0 +1,27 @@
+-- Job level rollup of the performance statistics (see rollup.py).
+CREATE TABLE IF NOT EXISTS job_stats (
+  job  INTEGER NOT NULL,
+  num_results  INTEGER NOT NULL,
+  duration  DOUBLE,
+  rel_duration  DOUBLE,
+  cpu_time  DOUBLE,
+  rel_cpu_time  DOUBLE,
+  cpu_usage_avg  DOUBLE,
+  rel_cpu_usage_avg  DOUBLE,
+  cpu_usage_max  DOUBLE,
+  rel_cpu_usage_max  DOUBLE,
+  memory_avg  DOUBLE,
+  rel_memory_avg  DOUBLE,
+  memory_max  DOUBLE,
+  rel_memory_max  DOUBLE,
+  io_read  DOUBLE,
+  rel_io_read  DOUBLE,
+  io_write  DOUBLE,
+  rel_io_write  DOUBLE,
+  threads_avg  DOUBLE,
+  rel_threads_avg  DOUBLE,
+  threads_max  DOUBLE,
+  rel_threads_max  DOUBLE,
+  PRIMARY KEY(job),
+  FOREIGN KEY(job) REFERENCES jobs(ID) ON DELETE CASCADE
+);
@@ -0,0 +1,15 @@
+-- Indexes for the hot queries of performances.py and api/*.py.
+
+-- Results of a job (job summaries, branch aggregates, rollup). Covers the
+-- metrics used by the branch summaries so they never read the base rows.
+ALTER TABLE results ADD INDEX idx_results_job
+  (job, result, test, duration, cpu_time, memory_avg, io_read);
+
+-- History of a test, newest first.
+ALTER TABLE results ADD INDEX idx_results_test_history (test, result, start);
+
+-- Jobs of a branch, by date or by ID.
+ALTER TABLE jobs ADD INDEX idx_jobs_tag_start (dockerTag, timestamp_start);
+
+-- Jobs by frequency tag.
+ALTER TABLE jobs ADD INDEX idx_jobs_scope (testScope);
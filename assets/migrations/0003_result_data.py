@@ -0,0 +1,52 @@
+"""
+Move `results.raw_data` and `results.output` to the `result_data` table.
+
+The copy is done in ID ranges, each committed on its own, so that readers
+are never blocked. Rows inserted while copying are caught up before the
+blob columns are dropped with an in-place ALTER. Loaders writing the blobs
+to `results` must be stopped (and updated) before running this migration.
+"""
+
+BATCH = 500
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS result_data (
+  result  INTEGER NOT NULL,
+  raw_data  MEDIUMBLOB NOT NULL,
+  output  MEDIUMBLOB,
+  PRIMARY KEY(result),
+  FOREIGN KEY(result) REFERENCES results(ID) ON DELETE CASCADE
+);
+"""
+
+COPY_RANGE = """
+INSERT IGNORE INTO result_data (result, raw_data, output)
+SELECT ID, raw_data, output FROM results WHERE ID > %s AND ID <= %s;
+"""
+
+DROP_COLUMNS = """
+ALTER TABLE results DROP COLUMN raw_data, DROP COLUMN output,
+  ALGORITHM=INPLACE, LOCK=NONE;
+"""
+
+
+def __copy__(db, cursor, low):
+    cursor.execute('SELECT MAX(ID) AS high FROM results;')
+    high = cursor.fetchone()['high'] or 0
+    while low < high:
+        cursor.execute(COPY_RANGE, (low, low + BATCH))
+        db.commit()
+        low += BATCH
+        print(f'\r  copied up to ID {min(low, high):>8}/{high}', end='')
+    print()
+    return high
+
+
+def migrate(db):
+    """Apply the migration."""
+    with db.cursor() as cursor:
+        cursor.execute(CREATE_TABLE)
+        last = __copy__(db, cursor, 0)
+        __copy__(db, cursor, last)
+        cursor.execute(DROP_COLUMNS)
+    db.commit()
@@ -0,0 +1,46 @@
+"""
+Store the `raw_data` profiles gzip compressed.
+
+Adds the `encoding` column to `result_data` and compresses the existing
+profiles in batches, each committed on its own.
+"""
+import gzip
+
+BATCH = 200
+
+ADD_COLUMN = """
+ALTER TABLE result_data
+  ADD COLUMN encoding VARCHAR(16) NOT NULL DEFAULT 'identity' AFTER raw_data,
+  ALGORITHM=INPLACE, LOCK=NONE;
+"""
+
+SELECT_BATCH = """
+SELECT result, raw_data FROM result_data
+WHERE encoding = 'identity' AND result > %s
+ORDER BY result LIMIT %s;
+"""
+
+UPDATE_ROW = """
+UPDATE result_data SET raw_data = %s, encoding = 'gzip' WHERE result = %s;
+"""
+
+
+def migrate(db):
+    """Apply the migration."""
+    with db.cursor() as cursor:
+        cursor.execute(ADD_COLUMN)
+        last = 0
+        count = 0
+        while True:
+            cursor.execute(SELECT_BATCH, (last, BATCH))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(UPDATE_ROW, [
+                (gzip.compress(row['raw_data']), row['result']) for row in rows])
+            db.commit()
+            last = rows[-1]['result']
+            count += len(rows)
+            print(f'\r  compressed {count:>8} profiles', end='')
+        print()
+    db.commit()
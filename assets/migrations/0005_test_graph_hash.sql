@@ -0,0 +1,16 @@
+-- One graph per test, stored with the SHA-256 of its XML and its encoding
+-- so that uploads can skip unchanged graphs (see upload_graphs.py).
+
+-- Graphs uploaded several times: keep the last one.
+DELETE old FROM test_graph old
+INNER JOIN test_graph newer ON newer.test = old.test AND newer.ID > old.ID;
+
+ALTER TABLE test_graph
+  MODIFY COLUMN graph MEDIUMBLOB NOT NULL,
+  ADD COLUMN encoding VARCHAR(16) NOT NULL DEFAULT 'identity' AFTER graph,
+  ADD COLUMN hash CHAR(64) AFTER encoding,
+  ADD UNIQUE INDEX idx_test_graph_test (test);
+
+UPDATE test_graph SET hash = SHA2(graph, 256);
+
+ALTER TABLE test_graph MODIFY COLUMN hash CHAR(64) NOT NULL;
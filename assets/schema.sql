@@ -1,3 +1,6 @@
+DROP TABLE IF EXISTS schema_version;
+DROP TABLE IF EXISTS job_stats;
+DROP TABLE IF EXISTS result_data;
 DROP TABLE IF EXISTS results;
 DROP TABLE IF EXISTS reference_values;
 DROP TABLE IF EXISTS jobs;
@@ -108,6 +111,9 @@ CREATE TABLE results (
   FOREIGN KEY(test) REFERENCES tests(ID)
 );
 
+-- Later changes are versioned in assets/migrations, apply them with
+-- scripts/migrate.py after loading this schema.
+
 -- Cleanup needed on DB restore
 -- DELETE results FROM results INNER JOIN jobs ON results.job = jobs.ID WHERE jobs.branch NOT IN ('8.0.0.', '9.0.0', '8.0.0-reference');
 -- DELETE FROM jobs WHERE jobs.branch NOT IN ('8.0.0.', '9.0.0', '8.0.0-reference');
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Benchmark the hot history and details statements of the backend.
+
+Each statement is executed with bound parameters through the text protocol
+(as the backend does with aiomysql, values escaped client side) and as a
+server side prepared statement (`PREPARE` once, then `EXECUTE ... USING`),
+to measure how much of the latency is spent parsing and planning.
+"""
+import re
+import sys
+import os
+import time
+import statistics
+from collections import namedtuple
+
+import pymysql
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'snap_reports_backend'))
+import queries
+
+PLACEHOLDER = re.compile(r'%\((\w+)\)s')
+
+
+def __parse_db_arg__(arg):
+    if '@' not in arg or ':' not in arg:
+        print('Error: malformed DB connection informations')
+        __help__()
+        sys.exit(2)
+
+    userinfo, conninfo = arg.split('@')
+    user, pwd = userinfo.split(':')
+    conninfo, db_name = conninfo.split('/')
+    host, port = conninfo.split(':')
+    Info = namedtuple('Info', 'user password, host port db_name')
+    return Info(user=user, password= pwd, host= host,
+                port= port, db_name= db_name)
+
+
+def __help__():
+    print('Helper to benchmark the statements of the snap-reports backend.')
+    print('   benchmark_queries.py DB_USER:DB_PASSWORD@DB_HOST:DB_PORT/DB_NAME [-n N]')
+    print('      -n N: number of executions of each statement (default 200)')
+
+
+def __args__():
+    args = sys.argv[1:]
+    if '-h' in args:
+        __help__()
+        sys.exit(0)
+
+    num = 200
+    if '-n' in args:
+        index = args.index('-n')
+        if index + 1 >= len(args) or not args[index + 1].isdigit():
+            print('Error: -n expects a number')
+            __help__()
+            sys.exit(2)
+        num = int(args[index + 1])
+        del args[index:index + 2]
+    if len(args) != 1:
+        print('Error: wrong number of arguments')
+        __help__()
+        sys.exit(2)
+    return __parse_db_arg__(args[0]), num
+
+
+def __samples__(db):
+    """Retrieve the (tag, test) pairs the statements are executed on."""
+    with db.cursor() as cursor:
+        cursor.execute("SELECT ID FROM resultTags WHERE tag = 'SUCCESS';")
+        success = cursor.fetchone()['ID']
+        cursor.execute('''
+            SELECT DISTINCT jobs.dockerTag AS tag, results.test
+            FROM results
+            INNER JOIN jobs ON jobs.ID = results.job
+            ORDER BY results.test LIMIT 50;''')
+        rows = cursor.fetchall()
+    return [{'tag': row['tag'], 'test': row['test'], 'success': success,
+             'limit': 100} for row in rows]
+
+
+def __text__(cursor, query, samples, num):
+    timings = []
+    for i in range(num):
+        begin = time.perf_counter()
+        cursor.execute(query, samples[i % len(samples)])
+        cursor.fetchall()
+        timings.append(time.perf_counter() - begin)
+    return timings
+
+
+def __prepared__(cursor, query, samples, num):
+    names = PLACEHOLDER.findall(query)
+    cursor.execute('PREPARE bench_stmt FROM %s', (PLACEHOLDER.sub('?', query),))
+    assign = 'SET ' + ', '.join(f'@p{i} = %s' for i in range(len(names)))
+    execute = 'EXECUTE bench_stmt USING ' + ', '.join(
+        f'@p{i}' for i in range(len(names)))
+    timings = []
+    try:
+        for i in range(num):
+            sample = samples[i % len(samples)]
+            begin = time.perf_counter()
+            cursor.execute(assign, [sample[name] for name in names])
+            cursor.execute(execute)
+            cursor.fetchall()
+            timings.append(time.perf_counter() - begin)
+    finally:
+        cursor.execute('DEALLOCATE PREPARE bench_stmt')
+    return timings
+
+
+def benchmark(db, statements, samples, num):
+    """Execute every statement in both modes and print the latencies."""
+    print(f"{'statement':<32} {'mode':<9} {'mean ms':>9} {'median ms':>10} {'p95 ms':>8}")
+    with db.cursor() as cursor:
+        for name, query in statements.items():
+            for mode, run in (('text', __text__), ('prepared', __prepared__)):
+                timings = sorted(run(cursor, query, samples, num))
+                print(f'{name:<32} {mode:<9} '
+                      f'{statistics.mean(timings) * 1000:>9.3f} '
+                      f'{statistics.median(timings) * 1000:>10.3f} '
+                      f'{timings[int(len(timings) * 0.95)] * 1000:>8.3f}')
+
+
+if __name__ == "__main__":
+    DB_INFO, NUM = __args__()
+    DB = pymysql.connect(
+        host=DB_INFO.host,
+        port=int(DB_INFO.port),
+        user=DB_INFO.user,
+        password=DB_INFO.password,
+        db=DB_INFO.db_name,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+    SAMPLES = __samples__(DB)
+    if not SAMPLES:
+        print('Error: no results to benchmark')
+        sys.exit(1)
+    benchmark(DB, {
+        'branch_test_history': queries.BRANCH_TEST_HISTORY(field='cpu_time'),
+        'test_history': queries.TEST_HISTORY(field='cpu_time'),
+        'branch_details': queries.BRANCH_DETAILS(),
+        'branch_details_last': queries.BRANCH_DETAILS_LAST(),
+    }, SAMPLES, NUM)
+    DB.close()
@@ -0,0 +1,112 @@
+"""
+Benchmark the JSON serialization of a `/api/job/list` response.
+
+Synthetic job rows, as returned by the driver, are serialized the legacy
+way (every value converted to a Python primitive, then the standard `json`
+encoder) and with the backend serializer (`orjson` if installed), which
+converts the native values while encoding.
+"""
+import datetime as dt
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'snap_reports_backend'))
+import serializer
+
+DESC = ('ID', 'branch', 'jobnum', 'dockerTag', 'testScope', 'timestamp_start',
+        'timestamp_end', 'result')
+
+
+def __help__():
+    print('Helper to benchmark the JSON serialization of the backend responses.')
+    print('   benchmark_serializer.py [-r ROWS] [-n N]')
+    print('      -r ROWS: number of jobs of the response (default 10000)')
+    print('      -n N: number of serializations (default 20)')
+
+
+def __option__(args, flag, default):
+    if flag not in args:
+        return default
+    index = args.index(flag)
+    if index + 1 >= len(args) or not args[index + 1].isdigit():
+        print(f'Error: {flag} expects a number')
+        __help__()
+        sys.exit(2)
+    value = int(args[index + 1])
+    del args[index:index + 2]
+    return value
+
+
+def __args__():
+    args = sys.argv[1:]
+    if '-h' in args:
+        __help__()
+        sys.exit(0)
+    rows = __option__(args, '-r', 10000)
+    num = __option__(args, '-n', 20)
+    if args:
+        print('Error: wrong number of arguments')
+        __help__()
+        sys.exit(2)
+    return rows, num
+
+
+def __rows__(num):
+    """Build job rows with the tags resolved as by `/api/job/list`."""
+    start = dt.datetime(2020, 1, 1)
+    rows = []
+    for i in range(num):
+        begin = start + dt.timedelta(hours=i)
+        row = dict(zip(DESC, (
+            i + 1, b'master', i, None, b'DAILY', begin,
+            begin + dt.timedelta(minutes=45), None)))
+        row['dockerTag'] = {'ID': 1, 'name': 'snap:master'}
+        row['result'] = {'ID': 1, 'tag': 'SUCCESS'}
+        rows.append(row)
+    return rows
+
+
+def __legacy_value__(value):
+    """Conversion applied to every value before the serializer."""
+    if value is None or type(value) in (str, int, float):
+        return value
+    if isinstance(value, dict):
+        return {key: __legacy_value__(val) for key, val in value.items()}
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return str(value)
+
+
+def legacy(rows):
+    """Convert every value and encode with the standard library."""
+    return json.dumps([{key: __legacy_value__(val) for key, val in row.items()}
+                       for row in rows]).encode('utf-8')
+
+
+def current(rows):
+    """Encode the native values with the backend serializer."""
+    body = serializer.dumps(rows)
+    return body if isinstance(body, bytes) else body.encode('utf-8')
+
+
+def benchmark(rows, num):
+    """Serialize the rows in both ways and print the latencies."""
+    print(f"{'serializer':<12} {'mean ms':>9} {'median ms':>10} {'size KB':>9}")
+    for name, run in (('legacy', legacy), ('serializer', current)):
+        timings = []
+        for _ in range(num):
+            begin = time.perf_counter()
+            body = run(rows)
+            timings.append(time.perf_counter() - begin)
+        print(f'{name:<12} {statistics.mean(timings) * 1000:>9.3f} '
+              f'{statistics.median(timings) * 1000:>10.3f} {len(body) / 1024:>9.1f}')
+    print(f"backend serializer: {'orjson' if serializer.orjson else 'json'}")
+
+
+if __name__ == "__main__":
+    ROWS, NUM = __args__()
+    benchmark(__rows__(ROWS), NUM)
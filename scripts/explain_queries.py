@@ -0,0 +1,152 @@
+"""
+Verify that the backend queries use indexes on the `results` table.
+
+Every statement of the `queries` module and of the job rollup is bound to
+sample values taken from the DB and checked with `EXPLAIN`: the script
+fails if any of them falls back to a full scan of `results`, either of the
+table or of one of its indexes.
+"""
+import sys
+import os
+from collections import namedtuple
+
+import pymysql
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'snap_reports_backend'))
+import queries
+import rollup
+
+SCANNED_TABLE = 'results'
+# access types reading the whole table (`index`: full index scan)
+SCAN_TYPES = ('ALL', 'index')
+
+
+def __parse_db_arg__(arg):
+    if '@' not in arg or ':' not in arg:
+        print('Error: malformed DB connection informations')
+        __help__()
+        sys.exit(2)
+
+    userinfo, conninfo = arg.split('@')
+    user, pwd = userinfo.split(':')
+    conninfo, db_name = conninfo.split('/')
+    host, port = conninfo.split(':')
+    Info = namedtuple('Info', 'user password, host port db_name')
+    return Info(user=user, password= pwd, host= host,
+                port= port, db_name= db_name)
+
+
+def __help__():
+    print('Helper to check the query plans of the snap-reports backend.')
+    print('   explain_queries.py DB_USER:DB_PASSWORD@DB_HOST:DB_PORT/DB_NAME [-v]')
+
+
+def __args__():
+    args = sys.argv[1:]
+    if '-h' in args:
+        __help__()
+        sys.exit(0)
+
+    verbose = '-v' in args
+    args = [arg for arg in args if arg != '-v']
+    if len(args) != 1:
+        print('Error: wrong number of arguments')
+        __help__()
+        sys.exit(2)
+    return __parse_db_arg__(args[0]), verbose
+
+
+def __samples__(db):
+    """Retrieve sample values to bind to the statements."""
+    with db.cursor() as cursor:
+        cursor.execute('''
+            SELECT ID AS job, dockerTag AS tag
+            FROM jobs
+            ORDER BY ID DESC LIMIT 1;''')
+        row = cursor.fetchone()
+        cursor.execute("SELECT ID FROM resultTags WHERE tag = 'SUCCESS';")
+        success = cursor.fetchone()
+        cursor.execute("SELECT test FROM results WHERE job = %s LIMIT 1;", (row['job'],))
+        test = cursor.fetchone()
+    res = {
+        'job': row['job'],
+        'tag': row['tag'],
+        'test': test['test'] if test else 1,
+        'tag_a': row['tag'],
+        'tag_b': row['tag'],
+        'success': success['ID'] if success else 1,
+        'limit': 10,
+        'window': 10,
+        'scope': 'daily',
+        'testset': '',
+    }
+    for i in range(queries.MAX_COMPARE_TAGS):
+        res[f'tag_{i}'] = row['tag']
+    return res
+
+
+def statements(sample):
+    """
+    Return the statements of the backend bound to the sample values.
+
+    Returns:
+    --------
+    dictionary of statement name and tuple of SQL text and parameters
+    """
+    res = {}
+    for name, query in queries.QUERIES.items():
+        if query.sql.lstrip().startswith('INSERT'):
+            continue
+        identifiers = {}
+        for ident, allowed in query.identifiers.items():
+            identifiers[ident] = 'cpu_time' if 'cpu_time' in allowed else next(iter(allowed))
+        params = dict.fromkeys(queries.COMPARE_FILTERS)
+        params.update(sample)
+        res[name] = (query(**identifiers), params)
+    res['rollup.UPDATE_JOB'] = (rollup.UPDATE_JOB, (sample['job'],))
+    res['rollup.UPDATE_PENDING'] = (rollup.UPDATE_PENDING, None)
+    res['rollup.UPDATE_ALL'] = (rollup.UPDATE_ALL, None)
+    return res
+
+
+def explain(db, statements, verbose=False):
+    """
+    Run EXPLAIN on the statements.
+
+    Returns:
+    --------
+    list of statement names falling back to a full scan of `results`
+    """
+    failures = []
+    with db.cursor() as cursor:
+        for name, (query, params) in statements.items():
+            cursor.execute('EXPLAIN ' + query, params if params and '%' in query else None)
+            plan = cursor.fetchall()
+            scans = [row for row in plan
+                     if row['table'] == SCANNED_TABLE and row['type'] in SCAN_TYPES]
+            status = 'FULL SCAN' if scans else 'OK'
+            print(f'{status:>9}  {name}')
+            if verbose or scans:
+                for row in plan:
+                    print(f"           {row['table']}: type={row['type']} key={row['key']} rows={row['rows']}")
+            if scans:
+                failures.append(name)
+    return failures
+
+
+if __name__ == "__main__":
+    DB_INFO, VERBOSE = __args__()
+    DB = pymysql.connect(
+        host=DB_INFO.host,
+        port=int(DB_INFO.port),
+        user=DB_INFO.user,
+        password=DB_INFO.password,
+        db=DB_INFO.db_name,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+    FAILURES = explain(DB, statements(__samples__(DB)), VERBOSE)
+    if FAILURES:
+        print(f'{len(FAILURES)} queries scan the whole `{SCANNED_TABLE}` table')
+        sys.exit(1)
+    print('Done')
@@ -0,0 +1,386 @@
+"""
+Bulk load a directory of CI result artifacts into the reports MySQL DB.
+
+Expected layout (directories can be nested at will):
+
+    RESULTS_DIR/.../<job>/job.json          job metadata
+    RESULTS_DIR/.../<job>/<test>.stats.csv  statistics of a test
+    RESULTS_DIR/.../<job>/<test>.csv        raw profile of a test (optional)
+    RESULTS_DIR/.../*.xml                   GPT graphs
+
+`job.json` holds the job keys of the `POST /api/job` payload (tags by
+name). A stats CSV has a header line and one row with `result` (tag name),
+`start` and every rollup field. Graphs are matched to tests through
+`tests.graphPath`, relative to RESULTS_DIR, and only stored for tests
+without a graph.
+
+Artifacts are parsed in a process pool into staging TSV files, which are
+loaded with `LOAD DATA LOCAL INFILE` (the server needs `local_infile=ON`)
+into temporary staging tables. Jobs, results, profiles and graphs are then
+inserted from the staging tables in a single transaction, skipping jobs
+that already exist together with their results and profiles, and rolled
+up in `job_stats`. Staging rows referring
+to unknown tests, tags or jobs are counted and reported before committing.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+import pymysql
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'snap_reports_backend'))
+import ingest
+import rawdata
+import rollup
+
+FIELDS = rollup.FIELDS
+STATS_SUFFIX = '.stats.csv'
+
+STAGING_TABLES = {
+    'staging_jobs': """
+        branch  VARCHAR(64) NOT NULL,
+        jobnum  INTEGER NOT NULL,
+        dockerTag  VARCHAR(64) NOT NULL,
+        testScope  VARCHAR(128) NOT NULL,
+        timestamp_start  DATETIME NOT NULL,
+        timestamp_end  DATETIME NOT NULL,
+        result  VARCHAR(64) NOT NULL""",
+    'staging_results': """
+        branch  VARCHAR(64) NOT NULL,
+        jobnum  INTEGER NOT NULL,
+        test  VARCHAR(256) NOT NULL,
+        result  VARCHAR(64) NOT NULL,
+        start  DATETIME NOT NULL,
+        """ + ',\n        '.join(f'{field}  INTEGER NOT NULL' for field in FIELDS),
+    'staging_result_data': """
+        branch  VARCHAR(64) NOT NULL,
+        jobnum  INTEGER NOT NULL,
+        test  VARCHAR(256) NOT NULL,
+        raw_data  MEDIUMBLOB NOT NULL,
+        encoding  VARCHAR(16) NOT NULL""",
+    'staging_graphs': """
+        graphPath  VARCHAR(256) NOT NULL,
+        graph  MEDIUMBLOB NOT NULL,
+        hash  CHAR(64) NOT NULL""",
+}
+
+# columns of the staging files, blobs are hex encoded
+STAGING_COLUMNS = {
+    'staging_jobs': ('(branch, jobnum, dockerTag, testScope, timestamp_start, '
+                     'timestamp_end, result)'),
+    'staging_results': '(branch, jobnum, test, result, start, ' + ', '.join(FIELDS) + ')',
+    'staging_result_data': ('(branch, jobnum, test, @raw_data, encoding) '
+                            'SET raw_data = UNHEX(@raw_data)'),
+    'staging_graphs': '(graphPath, @graph, hash) SET graph = UNHEX(@graph)',
+}
+
+LOAD_DATA = """
+LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+CHARACTER SET utf8mb4
+FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+LINES TERMINATED BY '\\n'
+{columns};
+"""
+
+# staging rows of the jobs already stored, removed before SWAP so that
+# their results are not merged into the stored jobs
+EXISTING = (
+    ('results of existing jobs', """
+        DELETE s FROM staging_results s
+        INNER JOIN jobs ON jobs.branch = s.branch AND jobs.jobnum = s.jobnum;"""),
+    ('profiles of existing jobs', """
+        DELETE s FROM staging_result_data s
+        INNER JOIN jobs ON jobs.branch = s.branch AND jobs.jobnum = s.jobnum;"""),
+    ('existing jobs', """
+        DELETE s FROM staging_jobs s
+        INNER JOIN jobs ON jobs.branch = s.branch AND jobs.jobnum = s.jobnum;"""),
+)
+
+# statements moving the staging tables in place, in order: existing rows
+# are kept as they are, any other error aborts the whole load
+SWAP = (
+    ('dockerTags', """
+        INSERT INTO dockerTags (name)
+        SELECT DISTINCT dockerTag FROM staging_jobs s
+        WHERE NOT EXISTS (
+            SELECT ID FROM dockerTags WHERE dockerTags.name = s.dockerTag);"""),
+    ('jobs', """
+        INSERT INTO jobs (
+            branch, jobnum, dockerTag, testScope, timestamp_start,
+            timestamp_end, result)
+        SELECT
+            s.branch, s.jobnum, dockerTags.ID, s.testScope,
+            s.timestamp_start, s.timestamp_end, resultTags.ID
+        FROM staging_jobs s
+        INNER JOIN dockerTags ON dockerTags.name = s.dockerTag
+        INNER JOIN resultTags ON resultTags.tag = s.result
+        ON DUPLICATE KEY UPDATE ID = jobs.ID;"""),
+    ('results', """
+        INSERT INTO results (test, job, result, start, """ + ', '.join(FIELDS) + """)
+        SELECT tests.ID, jobs.ID, resultTags.ID, s.start, """ + ', '.join(
+            f's.{field}' for field in FIELDS) + """
+        FROM staging_results s
+        INNER JOIN jobs ON jobs.branch = s.branch AND jobs.jobnum = s.jobnum
+        INNER JOIN tests ON tests.name = s.test
+        INNER JOIN resultTags ON resultTags.tag = s.result
+        ON DUPLICATE KEY UPDATE ID = results.ID;"""),
+    ('result_data', """
+        INSERT INTO result_data (result, raw_data, encoding)
+        SELECT results.ID, s.raw_data, s.encoding
+        FROM staging_result_data s
+        INNER JOIN jobs ON jobs.branch = s.branch AND jobs.jobnum = s.jobnum
+        INNER JOIN tests ON tests.name = s.test
+        INNER JOIN results ON results.job = jobs.ID AND results.test = tests.ID
+        ON DUPLICATE KEY UPDATE result = result_data.result;"""),
+    ('test_graph', """
+        INSERT INTO test_graph (test, graph, hash)
+        SELECT tests.ID, s.graph, s.hash
+        FROM staging_graphs s
+        INNER JOIN tests ON tests.graphPath = s.graphPath
+        WHERE NOT EXISTS (
+            SELECT ID FROM test_graph WHERE test_graph.test = tests.ID);"""),
+    ('job_stats', rollup.UPDATE_PENDING),
+)
+
+# staging rows not matching any test, tag or job, checked after SWAP
+UNMATCHED = (
+    ('jobs with an unknown result tag', """
+        SELECT COUNT(*) AS num FROM staging_jobs s
+        LEFT JOIN resultTags ON resultTags.tag = s.result
+        WHERE resultTags.ID IS NULL;"""),
+    ('results with an unknown test', """
+        SELECT COUNT(*) AS num FROM staging_results s
+        LEFT JOIN tests ON tests.name = s.test
+        WHERE tests.ID IS NULL;"""),
+    ('results with an unknown result tag', """
+        SELECT COUNT(*) AS num FROM staging_results s
+        LEFT JOIN resultTags ON resultTags.tag = s.result
+        WHERE resultTags.ID IS NULL;"""),
+    ('results without job', """
+        SELECT COUNT(*) AS num FROM staging_results s
+        LEFT JOIN jobs ON jobs.branch = s.branch AND jobs.jobnum = s.jobnum
+        WHERE jobs.ID IS NULL;"""),
+    ('profiles without result', """
+        SELECT COUNT(*) AS num FROM staging_result_data s
+        LEFT JOIN (jobs
+            INNER JOIN results ON results.job = jobs.ID
+            INNER JOIN tests ON tests.ID = results.test)
+        ON jobs.branch = s.branch AND jobs.jobnum = s.jobnum AND tests.name = s.test
+        WHERE results.ID IS NULL;"""),
+    ('graphs without test', """
+        SELECT COUNT(*) AS num FROM staging_graphs s
+        LEFT JOIN tests ON tests.graphPath = s.graphPath
+        WHERE tests.ID IS NULL;"""),
+)
+
+
+def __args__():
+    parser = argparse.ArgumentParser(
+        description='Bulk load CI result artifacts into the reports DB.')
+    parser.add_argument('target', help='MySQL DB user:password@host:port/db')
+    parser.add_argument('directory', help='directory of the result artifacts')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='number of parsing processes')
+    return parser.parse_args()
+
+
+def __tsv__(values):
+    """Format a row of a staging file."""
+    fields = []
+    for value in values:
+        if value is None:
+            fields.append('\\N')
+            continue
+        value = str(value)
+        for char, escaped in (('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'),
+                              ('\r', '\\r')):
+            value = value.replace(char, escaped)
+        fields.append(value)
+    return '\t'.join(fields) + '\n'
+
+
+def scan(directory):
+    """
+    Find the artifacts of a result directory.
+
+    Returns:
+    --------
+    list of job directories and list of graph paths
+    """
+    jobs = []
+    graphs = []
+    for root, _, files in os.walk(directory):
+        if 'job.json' in files:
+            jobs.append(root)
+        graphs.extend(os.path.join(root, name) for name in files
+                      if name.endswith('.xml'))
+    return sorted(jobs), sorted(graphs)
+
+
+def parse_job(job_dir, staging):
+    """
+    Parse the artifacts of a job and write its staging files.
+
+    Returns:
+    --------
+    dictionary of staging table and file path
+    """
+    with open(os.path.join(job_dir, 'job.json'), 'r', encoding='utf-8') as job_file:
+        job = json.load(job_file)
+    results = []
+    for name in sorted(os.listdir(job_dir)):
+        if not name.endswith(STATS_SUFFIX):
+            continue
+        with open(os.path.join(job_dir, name), 'r', newline='',
+                  encoding='utf-8') as stats_file:
+            row = next(csv.DictReader(stats_file), None)
+        if row is not None:
+            results.append(dict(row, test=name[:-len(STATS_SUFFIX)]))
+    job, results = ingest.validate(job, results)
+
+    key = (job['branch'], job['jobnum'])
+    name = f"{job['branch']}-{job['jobnum']}".replace(os.sep, '_')
+    prefix = os.path.join(staging, name)
+    files = {table: f'{prefix}.{table}.tsv' for table in
+             ('staging_jobs', 'staging_results', 'staging_result_data')}
+    # LOAD DATA reads the staging files as utf8mb4
+    with open(files['staging_jobs'], 'w', encoding='utf-8') as out:
+        out.write(__tsv__([job[k] for k in ingest.JOB_KEYS]))
+    with open(files['staging_results'], 'w', encoding='utf-8') as out:
+        for res in results:
+            out.write(__tsv__(key + tuple(res[k] for k in ingest.RESULT_KEYS)))
+    with open(files['staging_result_data'], 'w', encoding='utf-8') as out:
+        for res in results:
+            path = os.path.join(job_dir, res['test'] + '.csv')
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as profile:
+                payload, encoding = rawdata.encode(profile.read())
+            out.write(__tsv__(key + (res['test'], payload.hex(), encoding)))
+    return files
+
+
+def parse_graph(path, directory):
+    """
+    Check a GPT graph.
+
+    Returns:
+    --------
+    staging row of the graph, None if the XML is malformed
+    """
+    with open(path, 'rb') as xml_file:
+        graph = xml_file.read()
+    try:
+        ET.fromstring(graph)
+    except ET.ParseError:
+        return None
+    # same hash as upload_graphs.py, on the bytes of the file
+    return __tsv__([os.path.relpath(path, directory), graph.hex(),
+                    hashlib.sha256(graph).hexdigest()])
+
+
+def stage(directory, staging, workers):
+    """
+    Parse every artifact of a directory in a process pool.
+
+    Returns:
+    --------
+    dictionary of staging table and list of file paths
+    """
+    job_dirs, graph_paths = scan(directory)
+    print(f'{len(job_dirs)} jobs and {len(graph_paths)} graphs found')
+    files = {table: [] for table in STAGING_TABLES}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {job_dir: pool.submit(parse_job, job_dir, staging)
+                   for job_dir in job_dirs}
+        graphs = pool.map(parse_graph, graph_paths,
+                          [directory] * len(graph_paths), chunksize=16)
+        graph_file = os.path.join(staging, 'graphs.staging_graphs.tsv')
+        with open(graph_file, 'w', encoding='utf-8') as out:
+            for path, row in zip(graph_paths, graphs):
+                if row is None:
+                    print(f'Skipping malformed graph {path}')
+                else:
+                    out.write(row)
+        files['staging_graphs'].append(graph_file)
+        for i, (job_dir, future) in enumerate(futures.items()):
+            print(f'\rParsing: {i+1:>6}/{len(futures)}', end='')
+            try:
+                for table, path in future.result().items():
+                    files[table].append(path)
+            except Exception as error:  # pylint: disable=broad-except
+                # any malformed artifact only skips its job
+                print(f'\nSkipping {job_dir}: {type(error).__name__}: {error}')
+        print()
+    return files
+
+
+def load(db, files):
+    """
+    Load the staging files and move them in place in one transaction.
+
+    Returns:
+    --------
+    dictionary of table and number of inserted rows
+    """
+    counts = {}
+    with db.cursor() as cursor:
+        for table, columns in STAGING_TABLES.items():
+            cursor.execute(f'CREATE TEMPORARY TABLE {table} ({columns});')
+        for table, paths in files.items():
+            query = LOAD_DATA.format(table=table, columns=STAGING_COLUMNS[table])
+            for path in paths:
+                cursor.execute(query, (path,))
+            print(f'{table}: {len(paths)} files loaded')
+        try:
+            for what, query in EXISTING:
+                num = cursor.execute(query)
+                if num:
+                    print(f'Skipped {num} staging {what}')
+            for table, query in SWAP:
+                counts[table] = cursor.execute(query)
+            for what, query in UNMATCHED:
+                cursor.execute(query)
+                num = cursor.fetchone()['num']
+                if num:
+                    print(f'Skipped {num} staging {what}')
+            db.commit()
+        except pymysql.MySQLError:
+            db.rollback()
+            raise
+        for table in STAGING_TABLES:
+            cursor.execute(f'DROP TEMPORARY TABLE {table};')
+    return counts
+
+
+def __main__():
+    args = __args__()
+    dbusr, dbpwd = args.target.split('@')[0].split(':')
+    db_name = args.target.split('@')[1].split('/')[1]
+    host, port = args.target.split('@')[1].split('/')[0].split(':')
+    with tempfile.TemporaryDirectory(prefix='snap-reports-') as staging:
+        files = stage(args.directory, staging, args.jobs)
+        trg_db = pymysql.connect(
+            host=host,
+            port=int(port),
+            user=dbusr,
+            password=dbpwd,
+            db=db_name,
+            local_infile=True,
+            cursorclass=pymysql.cursors.DictCursor
+        )
+        for table, count in load(trg_db, files).items():
+            print(f'{table}: {count} rows inserted')
+        trg_db.close()
+    print('Done')
+
+
+if __name__ == '__main__':
+    __main__()
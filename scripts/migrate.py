@@ -0,0 +1,185 @@
+"""
+Apply the versioned schema migrations to the reports MySQL DB.
+
+Migrations are stored in `assets/migrations` as `NNNN_description.sql`
+(statements separated by `;`, see split_statements) or `NNNN_description.py` (module exposing a
+`migrate(connection)` function). Applied versions are recorded in the
+`schema_version` table so that each migration runs only once, in order.
+"""
+import importlib.util
+import os
+import re
+import sys
+from collections import namedtuple
+
+import pymysql
+
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'assets', 'migrations')
+
+CREATE_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_version (
+  version  INTEGER NOT NULL,
+  name  VARCHAR(256) NOT NULL,
+  applied  DATETIME NOT NULL,
+  PRIMARY KEY(version)
+);
+"""
+
+Migration = namedtuple('Migration', 'version name path')
+
+
+def __parse_db_arg__(arg):
+    if '@' not in arg or ':' not in arg:
+        print('Error: malformed DB connection informations')
+        __help__()
+        sys.exit(2)
+
+    userinfo, conninfo = arg.split('@')
+    user, pwd = userinfo.split(':')
+    conninfo, db_name = conninfo.split('/')
+    host, port = conninfo.split(':')
+    Info = namedtuple('Info', 'user password, host port db_name')
+    return Info(user=user, password= pwd, host= host,
+                port= port, db_name= db_name)
+
+
+def __help__():
+    print('Helper to apply schema migrations to the snap-reports mysql database.')
+    print('   migrate.py DB_USER:DB_PASSWORD@DB_HOST:DB_PORT/DB_NAME [--dry-run]')
+
+
+def __args__():
+    args = sys.argv[1:]
+    if '-h' in args:
+        __help__()
+        sys.exit(0)
+
+    dry_run = '--dry-run' in args
+    args = [arg for arg in args if arg != '--dry-run']
+    if len(args) != 1:
+        print('Error: wrong number of arguments')
+        __help__()
+        sys.exit(2)
+    return __parse_db_arg__(args[0]), dry_run
+
+
+def split_statements(script):
+    """
+    Split a SQL script in statements, dropping comments and blanks.
+
+    Semicolons inside quoted strings or identifiers and comments (`-- `,
+    `#` and `/* */`) do not end a statement.
+    """
+    res = []
+    current = []
+    i = 0
+    while i < len(script):
+        char = script[i]
+        if char in '\'"`':
+            end = i + 1
+            while end < len(script) and script[end] != char:
+                # backslash escapes (not in identifiers)
+                end += 2 if script[end] == '\\' and char != '`' else 1
+            current.append(script[i:end + 1])
+            i = end + 1
+        elif script.startswith('--', i) or char == '#':
+            end = script.find('\n', i)
+            i = len(script) if end < 0 else end
+        elif script.startswith('/*', i):
+            end = script.find('*/', i + 2)
+            i = len(script) if end < 0 else end + 2
+        elif char == ';':
+            res.append(''.join(current).strip())
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+    res.append(''.join(current).strip())
+    return [query for query in res if query]
+
+
+def list_migrations(path=MIGRATIONS_DIR):
+    """List available migrations sorted by version."""
+    res = []
+    for name in os.listdir(path):
+        match = re.match(r'^(\d+)_(\w+)\.(sql|py)$', name)
+        if match:
+            res.append(Migration(int(match.group(1)), name,
+                                 os.path.join(path, name)))
+    res.sort()
+    versions = [migration.version for migration in res]
+    if len(versions) != len(set(versions)):
+        raise ValueError('Duplicated migration version')
+    return res
+
+
+def applied_versions(db):
+    """Retrieve the set of already applied migration versions."""
+    with db.cursor() as cursor:
+        cursor.execute(CREATE_VERSION_TABLE)
+        cursor.execute('SELECT version FROM schema_version;')
+        rows = cursor.fetchall()
+    db.commit()
+    return {row['version'] for row in rows}
+
+
+def __run__(db, migration):
+    if migration.path.endswith('.sql'):
+        with open(migration.path, 'r') as sql_file:
+            queries = split_statements(sql_file.read())
+        with db.cursor() as cursor:
+            for query in queries:
+                cursor.execute(query)
+    else:
+        spec = importlib.util.spec_from_file_location(
+            f'migration_{migration.version}', migration.path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.migrate(db)
+    with db.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO schema_version (version, name, applied) VALUES (%s, %s, NOW());',
+            (migration.version, migration.name))
+    db.commit()
+
+
+def apply_migrations(db, dry_run=False):
+    """
+    Apply pending migrations.
+
+    Parameters:
+    -----------
+     - db: mysql db connection
+     - dry_run: only list pending migrations
+
+    Returns:
+    --------
+    list of pending (or applied) migrations
+    """
+    done = applied_versions(db)
+    pending = [migration for migration in list_migrations()
+               if migration.version not in done]
+    for migration in pending:
+        print(f'{"Pending" if dry_run else "Applying"}: {migration.name}')
+        if not dry_run:
+            __run__(db, migration)
+    return pending
+
+
+if __name__ == "__main__":
+    DB_INFO, DRY_RUN = __args__()
+    DB = pymysql.connect(
+        host=DB_INFO.host,
+        port=int(DB_INFO.port),
+        user=DB_INFO.user,
+        password=DB_INFO.password,
+        db=DB_INFO.db_name,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+    print('MySQL DB connected')
+    PENDING = apply_migrations(DB, DRY_RUN)
+    if not PENDING:
+        print('Schema up to date')
+    print('Done')
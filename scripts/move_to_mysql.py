@@ -1,18 +1,42 @@
 """
 Move sqlite reports db to MySQL remote server.
 
+Tables are streamed from SQLite in chunks of rows ordered by key, each
+chunk inserted with a parameterized `executemany` and committed together
+with its checkpoint (the last key copied) in the `copy_checkpoint` table.
+An interrupted copy is resumed with `--resume`, which keeps the target
+database and only copies the rows after the checkpoints. The lookup
+tables, which do not depend on each other, are copied in parallel.
+
 author: Martino Ferrari (CS Group)
 email: martino.ferrari@c-s.fr
 """
 import argparse
+import os
 import sqlite3
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
 import pymysql
 
+from migrate import split_statements, apply_migrations
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'snap_reports_backend'))
+import rawdata
+
 
 def __args__():
     parser = argparse.ArgumentParser()
     parser.add_argument('source', help='Source SQLite DB file')
     parser.add_argument('target', help='Target MySQL DB user:password@host:port/db')
+    parser.add_argument('--resume', action='store_true',
+                        help='resume an interrupted copy from its checkpoints')
+    parser.add_argument('--chunk-size', type=int, default=1000,
+                        help='number of rows inserted per transaction')
+    parser.add_argument('-j', '--workers', type=int, default=4,
+                        help='number of lookup tables copied in parallel')
     return parser.parse_args()
 
 
@@ -21,56 +45,78 @@ def init_mysql_db(connection):
     Initialize MySQL database.
     """
     with open('assets/schema.sql', 'r') as schema_f:
-        schema = schema_f.read().split(';')
+        schema = split_statements(schema_f.read())
         with connection.cursor() as cursor:
-            for query in schema: 
-                if query:
-                    print(query)
-                    cursor.execute(query)
+            for query in schema:
+                print(query)
+                cursor.execute(query)
         connection.commit()
+    apply_migrations(connection)
 
 
-def __val__(val):
-    if isinstance(val, bytes):
-        return "'"+val.decode('utf-8')+"'"
-    return "'"+str(val)+"'"
+RESULT_COLUMNS = ['ID', 'test', 'job', 'result', 'start', 'duration',
+                  'cpu_time', 'cpu_usage_avg', 'cpu_usage_max', 'memory_avg',
+                  'memory_max', 'io_write', 'io_read', 'threads_avg',
+                  'threads_max']
 
+CHECKPOINT_TABLE = """
+CREATE TABLE IF NOT EXISTS copy_checkpoint (
+  tbl  VARCHAR(64) NOT NULL,
+  last_key  BIGINT NOT NULL,
+  done  BOOLEAN NOT NULL,
+  PRIMARY KEY(tbl)
+);
+"""
 
-def copy_table(table, source, target):
-    with target.cursor() as cursor:
-        print(f'== {table} ==')
-        src_query = f'SELECT * FROM {table};'
-        rows = source.execute(src_query)
-        keys = None
-        for i, row in enumerate(rows):
-            if keys is None:
-                keys = row.keys()
-            print(f'\rRow {i+1:>6}', end='')
-            query = f'INSERT INTO {table} ({", ".join(keys)}) '
-            query += f"VALUES ({', '.join([__val__(row[key]) for key in keys])})"
-            cursor.execute(query)
-    print()
-    target.commit()
+LOAD_CHECKPOINT = """
+SELECT last_key, done FROM copy_checkpoint WHERE tbl = %s;
+"""
 
+SAVE_CHECKPOINT = """
+INSERT INTO copy_checkpoint (tbl, last_key, done) VALUES (%s, %s, %s)
+ON DUPLICATE KEY UPDATE last_key = VALUES(last_key), done = VALUES(done);
+"""
 
-def copy_db(source, target):
-    copy_table('resultTags', source, target)
-    copy_table('dockerTags', source, target)        
-    copy_table('referenceTags', source, target)
-    copy_table('tests', source, target)
-    copy_table('jobs', source, target)
-    copy_table('results', source, target)
-    copy_table('reference_values', source, target)
 
+def __encode_result_data__(row):
+    payload, encoding = rawdata.encode(row['raw_data'] or b'')
+    return row['result'], payload, encoding, row['output']
 
-def __main__():
-    args = __args__()
-    src_db = sqlite3.connect(args.source)
-    src_db.row_factory = sqlite3.Row
-    dbusr, dbpwd = args.target.split('@')[0].split(':')
-    db_name = args.target.split('@')[1].split('/')[1]
-    host, port = args.target.split('@')[1].split('/')[0].split(':')
-    trg_db = pymysql.connect(
+
+# copy of a table:
+#  - table: target table
+#  - source: source table
+#  - columns: selected source columns
+#  - key: source column the rows are ordered and checkpointed by
+#  - alias: name of the key in the selected rows
+#  - target_columns: inserted columns (the selected ones if None)
+#  - transform: conversion of a selected row to the inserted values
+Copy = namedtuple('Copy', 'table source columns key alias target_columns transform',
+                  defaults=('*', 'ID', 'ID', None, None))
+
+LOOKUP_TABLES = [
+    Copy('resultTags', 'resultTags'),
+    Copy('dockerTags', 'dockerTags'),
+    Copy('referenceTags', 'referenceTags'),
+    Copy('tests', 'tests'),
+]
+
+# copied in order, after the lookup tables they reference
+DATA_TABLES = [
+    Copy('jobs', 'jobs'),
+    Copy('results', 'results', ', '.join(RESULT_COLUMNS)),
+    Copy('result_data', 'results', 'ID AS result, raw_data, output', alias='result',
+         target_columns=('result', 'raw_data', 'encoding', 'output'),
+         transform=__encode_result_data__),
+    Copy('reference_values', 'reference_values'),
+]
+
+
+def __connect__(target):
+    dbusr, dbpwd = target.split('@')[0].split(':')
+    db_name = target.split('@')[1].split('/')[1]
+    host, port = target.split('@')[1].split('/')[0].split(':')
+    return pymysql.connect(
         host=host,
         port=int(port),
         user=dbusr,
@@ -78,8 +124,102 @@ def __main__():
         db=db_name,
         cursorclass=pymysql.cursors.DictCursor
     )
-    init_mysql_db(trg_db)
-    copy_db(src_db, trg_db)
+
+
+def __checkpoint__(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute(LOAD_CHECKPOINT, (table,))
+        row = cursor.fetchone()
+    connection.commit()
+    if row is None:
+        return 0, False
+    return row['last_key'], bool(row['done'])
+
+
+def copy_table(copy, source_path, target, chunk_size):
+    """
+    Stream a table from SQLite to MySQL, resuming from its checkpoint.
+
+    Parameters:
+    -----------
+     - copy: Copy of the table
+     - source_path: SQLite DB file
+     - target: MySQL DB user:password@host:port/db
+     - chunk_size: number of rows inserted per transaction
+
+    Returns:
+    --------
+    number of copied rows
+    """
+    # connections are not shared between the workers
+    source = sqlite3.connect(source_path)
+    source.row_factory = sqlite3.Row
+    connection = __connect__(target)
+    copied = 0
+    query = None
+    transform = copy.transform or tuple
+    try:
+        last, done = __checkpoint__(connection, copy.table)
+        if done:
+            print(f'{copy.table}: already copied')
+            return copied
+        total = source.execute(
+            f'SELECT COUNT(*) FROM {copy.source} WHERE {copy.key} > ?;',
+            (last,)).fetchone()[0]
+        rows = source.execute(
+            f'SELECT {copy.columns} FROM {copy.source} WHERE {copy.key} > ? '
+            f'ORDER BY {copy.key};', (last,))
+        with connection.cursor() as cursor:
+            while True:
+                chunk = rows.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                if query is None:
+                    columns = copy.target_columns or chunk[0].keys()
+                    query = (f'INSERT INTO {copy.table} ({", ".join(columns)}) '
+                             f'VALUES ({", ".join(["%s"] * len(columns))});')
+                cursor.executemany(query, [transform(row) for row in chunk])
+                last = chunk[-1][copy.alias]
+                cursor.execute(SAVE_CHECKPOINT, (copy.table, last, False))
+                connection.commit()
+                copied += len(chunk)
+                print(f'{copy.table}: {copied:>8}/{total}')
+            cursor.execute(SAVE_CHECKPOINT, (copy.table, last, True))
+            connection.commit()
+    except pymysql.MySQLError:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+        source.close()
+    return copied
+
+
+def copy_db(source_path, target, chunk_size=1000, workers=4):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # consume the results to raise the errors of the workers
+        list(pool.map(lambda copy: copy_table(copy, source_path, target, chunk_size),
+                      LOOKUP_TABLES))
+    for copy in DATA_TABLES:
+        copy_table(copy, source_path, target, chunk_size)
+
+
+def __main__():
+    args = __args__()
+    trg_db = __connect__(args.target)
+    if not args.resume:
+        init_mysql_db(trg_db)
+        with trg_db.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS copy_checkpoint;')
+    with trg_db.cursor() as cursor:
+        cursor.execute(CHECKPOINT_TABLE)
+    trg_db.commit()
+    copy_db(args.source, args.target, args.chunk_size, args.workers)
+    with trg_db.cursor() as cursor:
+        cursor.execute('DROP TABLE copy_checkpoint;')
+    trg_db.commit()
+    trg_db.close()
+    print('Done')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,94 @@
+"""
+Fill the job level rollup table (`job_stats`) of the reports MySQL DB.
+"""
+import pymysql
+import sys
+import os
+from collections import namedtuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from snap_reports_backend import rollup
+
+
+def __parse_db_arg__(arg):
+    if '@' not in arg or ':' not in arg:
+        print('Error: malformed DB connection informations')
+        __help__()
+        sys.exit(2)
+
+    userinfo, conninfo = arg.split('@')
+    user, pwd = userinfo.split(':')
+    conninfo, db_name = conninfo.split('/')
+    host, port = conninfo.split(':')
+    Info = namedtuple('Info', 'user password, host port db_name')
+    return Info(user=user, password= pwd, host= host,
+                port= port, db_name= db_name)
+
+
+def __help__():
+    print('Helper to fill the job rollup table of the snap-reports mysql database.')
+    print('   update_job_stats.py DB_USER:DB_PASSWORD@DB_HOST:DB_PORT/DB_NAME [pending|all|JOB_ID...]')
+    print('      pending: rollup jobs not yet present in job_stats (default)')
+    print('      all:     rebuild the rollup of every job')
+    print('      JOB_ID:  rollup (again) the given jobs')
+
+
+def __args__():
+    args = sys.argv[1:]
+    if '-h' in args:
+        __help__()
+        sys.exit(0)
+
+    if len(args) < 1:
+        print('Error: wrong number of arguments')
+        __help__()
+        sys.exit(2)
+    db_info = __parse_db_arg__(args[0])
+    mode = args[1:] if len(args) > 1 else ['pending']
+    if len(mode) > 1 or mode[0] not in ('pending', 'all'):
+        if not all(x.isdigit() for x in mode):
+            print('Error: job ids must be integers')
+            __help__()
+            sys.exit(2)
+    return db_info, mode
+
+
+def update_job_stats(db, mode):
+    """
+    Update the rollup of the jobs.
+
+    Parameters:
+    -----------
+     - db: mysql db connection
+     - mode: `['pending']`, `['all']` or list of job ids
+
+    Returns:
+    --------
+    number of affected rows
+    """
+    with db.cursor() as cursor:
+        if mode == ['pending']:
+            count = cursor.execute(rollup.UPDATE_PENDING)
+        elif mode == ['all']:
+            count = cursor.execute(rollup.UPDATE_ALL)
+        else:
+            count = 0
+            for job_id in mode:
+                count += cursor.execute(rollup.UPDATE_JOB, (int(job_id),))
+    db.commit()
+    return count
+
+
+if __name__ == "__main__":
+    DB_INFO, MODE = __args__()
+    DB = pymysql.connect(
+        host=DB_INFO.host,
+        port=int(DB_INFO.port),
+        user=DB_INFO.user,
+        password=DB_INFO.password,
+        db=DB_INFO.db_name,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+    print('MySQL DB connected')
+    print(f'{update_job_stats(DB, MODE)} rows updated')
+    print('Done')
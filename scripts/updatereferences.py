@@ -1,129 +1,206 @@
 """
 Simple script to refresh references.
+
+References are computed on the server from the successful results of the
+reference branch (optionally only its last N jobs) and upserted, stale
+references are removed and the job rollup is rebuilt, all in a single
+transaction: readers always see either the previous or the new references.
 """
-import pymysql
+import argparse
 import datetime as dt
+import os
 import sys
-from collections import namedtuple
 
-def selectQuery(ref_tag):
-    query = """
-    SELECT
-        test, duration, cpu_time, cpu_usage_avg, cpu_usage_max,
-        memory_avg, memory_max, io_write, io_read, threads_avg, threads_max
-    FROM results
-    WHERE
-        result =
-            (SELECT ID FROM resultTags WHERE tag = "SUCCESS")
-        AND job IN
-            (SELECT ID FROM jobs WHERE dockerTag =
-                (SELECT ID FROM dockerTags WHERE name = "snap:"""+ref_tag+""""));
-    """
-    return query
+import pymysql
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from snap_reports_backend import rollup
+
+KEYS = ["duration", "cpu_time", "cpu_usage_avg", "cpu_usage_max", "memory_avg",
+    "memory_max", "io_read", "io_write", "threads_avg", "threads_max"]
+
+# rank bounds of the values averaged by each aggregation, `cnt` being the
+# number of values of the test
+AGGREGATIONS = {
+    'mean': ('1', 'cnt'),
+    'median': ('FLOOR((cnt + 1) / 2)', 'CEIL((cnt + 1) / 2)'),
+    'trimmed': ('FLOOR(cnt * %(trim)s) + 1', 'cnt - FLOOR(cnt * %(trim)s)'),
+}
 
-CLEAR_REFRENCES = """
-DELETE FROM reference_values;
+# value of LIMIT meaning "all the rows"
+NO_LIMIT = 18446744073709551615
+
+REF_TAG_QUERY = """
+SELECT ID FROM dockerTags WHERE name = %(name)s;
 """
 
-def updateRefQuery(ref_tag):
-    query = """
+
+# successful results of the reference branch, `res` being the results table
+__REFERENCE_RESULTS__ = """
+            {res}.result = (SELECT ID FROM resultTags WHERE tag = 'SUCCESS')
+            AND {res}.job IN (
+                SELECT ID FROM (
+                    SELECT ID FROM jobs WHERE dockerTag = %(tag)s
+                    ORDER BY ID DESC LIMIT %(jobs)s
+                ) last_jobs)"""
+
+
+def refresh_query(aggregation):
+    """
+    Build the upsert of the references.
+
+    Each value is averaged between the rank bounds of the aggregation,
+    values of a test being ranked independently for each field by counting
+    the smaller ones (MySQL 5.7 has no window functions).
+    """
+    low, high = AGGREGATIONS[aggregation]
+    ranks = ',\n            '.join(
+        f"""1 + (
+                SELECT COUNT(*) FROM results other
+                WHERE other.test = results.test
+                AND (other.{key} < results.{key}
+                    OR (other.{key} = results.{key} AND other.ID < results.ID))
+                AND {__REFERENCE_RESULTS__.format(res='other').strip()}
+            ) AS rn_{key}"""
+        for key in KEYS)
+    values = ',\n        '.join(
+        f'ROUND(AVG(CASE WHEN rn_{key} BETWEEN {low} AND {high} THEN {key} END))'
+        for key in KEYS)
+    updates = ', '.join(f'{key} = VALUES({key})' for key in KEYS)
+    return f"""
     INSERT INTO reference_values
-        (test, referenceTag, updated, duration, cpu_time, cpu_usage_avg,
-        cpu_usage_max, memory_avg, memory_max, io_write, io_read, threads_avg,
-        threads_max, raw_data)
-    VALUES
-        (:test, (SELECT ID FROM dockerTags WHERE name = "snap:"""+ref_tag+""""), :updated,
-        :duration, :cpu_time, :cpu_usage_avg, :cpu_usage_max, :memory_avg,
-        :memory_max, :io_write, :io_read, :threads_avg, :threads_max, "");
+        (test, referenceTag, updated, {', '.join(KEYS)}, raw_data)
+    SELECT
+        test, %(tag)s, %(updated)s,
+        {values},
+        ''
+    FROM (
+        SELECT
+            results.test, {', '.join(f'results.{key}' for key in KEYS)},
+            counts.cnt,
+            {ranks}
+        FROM results
+        INNER JOIN (
+            SELECT test, COUNT(*) AS cnt
+            FROM results
+            WHERE{__REFERENCE_RESULTS__.format(res='results')}
+            GROUP BY test
+        ) counts ON counts.test = results.test
+        WHERE{__REFERENCE_RESULTS__.format(res='results')}
+    ) ranked
+    GROUP BY test
+    ON DUPLICATE KEY UPDATE updated = VALUES(updated), {updates};
     """
-    return query
 
-KEYS = ["duration", "cpu_time", "cpu_usage_avg", "cpu_usage_max", "memory_avg",
-    "memory_max", "io_read", "io_write", "threads_avg", "threads_max"]
 
-def __help__():
-    print('Helper to update reference values to the snap-reports mysql database with specific ref branch.')
-    print('update_ref.py DB_USER:DB_PASSWORD@DB_HOST:DB_PORT/DB_NAME ref_tag')
+# references not refreshed by the upsert (other tests or reference tags)
+CLEAR_STALE = """
+DELETE FROM reference_values WHERE updated <> %(updated)s OR referenceTag <> %(tag)s;
+"""
 
-def __args__():
-    args = sys.argv[1:]
-    if '-h' in args:
-        __help__()
-        sys.exit(0)
-
-    if len(args) != 2:
-        print('Error: wrong number of arguments')
-        __help__()
-        sys.exit(2)
-    db_info = __parse_db_arg__(args[0])
-    graph_path = args[1]
+COUNT_REFRESHED = """
+SELECT COUNT(*) AS num FROM reference_values
+WHERE updated = %(updated)s AND referenceTag = %(tag)s;
+"""
 
-    return db_info, graph_path
+
+def __args__():
+    parser = argparse.ArgumentParser(
+        description='Update reference values of the snap-reports mysql '
+                    'database with specific ref branch.')
+    parser.add_argument('target', help='DB_USER:DB_PASSWORD@DB_HOST:DB_PORT/DB_NAME')
+    parser.add_argument('ref_tag', help='reference docker tag (without `snap:`)')
+    parser.add_argument('-a', '--aggregation', choices=list(AGGREGATIONS),
+                        default='mean', help='aggregation of the values')
+    parser.add_argument('-t', '--trim', type=float, default=0.1,
+                        help='fraction trimmed at each end by `trimmed`')
+    parser.add_argument('-n', '--jobs', type=int, default=None,
+                        help='only use the last N jobs of the reference branch')
+    args = parser.parse_args()
+    if not 0 <= args.trim < 0.5:
+        parser.error('trim must be in [0, 0.5)')
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('jobs must be a positive number')
+    args.db_info = __parse_db_arg__(args.target)
+    return args
 
 
 def __parse_db_arg__(arg):
     if '@' not in arg or ':' not in arg:
         print('Error: malformed DB connection informations')
-        __help__()
         sys.exit(2)
 
     userinfo, conninfo = arg.split('@')
     user, pwd = userinfo.split(':')
     conninfo, db_name = conninfo.split('/')
     host, port = conninfo.split(':')
-    Info = namedtuple('Info', 'user password, host port db_name')
-    return Info(user=user, password= pwd, host= host,
-                port= port, db_name= db_name)
-
-def __sum_tests__(a, b):
-    c = {
-        'test': a['test'],
-    }
-    for key in KEYS:
-        c[key] = a[key] + b[key]
-    return c
+    return user, pwd, host, port, db_name
 
-def __update_reference__(db, tests, ref_tag):
-    db.execute(CLEAR_REFRENCES)
-    cursor = db.cursor()
-    updated = str(dt.datetime.now())
 
-    for i, test_id in enumerate(tests):
-        print(f'\r{i+1:>3}/{len(tests)}', end='')
-        test = tests[test_id]
-        test['updated'] = updated
-        cursor.execute(updateRefQuery(ref_tag), test)
-        db.commit()
-    cursor.close()
-    print()
+def update_references(db, ref_tag, aggregation='mean', trim=0.1, jobs=None):
+    """
+    Refresh the references and the job rollup in one transaction.
+
+    Parameters:
+    -----------
+     - db: mysql db connection
+     - ref_tag: reference docker tag (without `snap:`)
+     - aggregation: `mean`, `median` or `trimmed`
+     - trim: fraction of values trimmed at each end by `trimmed`
+     - jobs: number of most recent jobs used (all if None)
+
+    Returns:
+    --------
+    number of refreshed and of removed references, ValueError is raised
+    (and nothing changed) if the tag is unknown or no reference is refreshed
+    """
+    params = {
+        'name': 'snap:' + ref_tag,
+        'updated': dt.datetime.now().replace(microsecond=0),
+        'jobs': NO_LIMIT if jobs is None else jobs,
+        'trim': trim,
+    }
+    with db.cursor() as cursor:
+        cursor.execute(REF_TAG_QUERY, params)
+        row = cursor.fetchone()
+        if row is None:
+            raise ValueError(f"Docker tag `{params['name']}` not found")
+        params['tag'] = row['ID']
+        try:
+            cursor.execute(refresh_query(aggregation), params)
+            cursor.execute(COUNT_REFRESHED, params)
+            refreshed = cursor.fetchone()['num']
+            if not refreshed:
+                # keep the current references rather than clearing them all
+                db.rollback()
+                raise ValueError(f"No successful results for `{params['name']}`")
+            removed = cursor.execute(CLEAR_STALE, params)
+            # relative values of the job rollup depend on the references
+            cursor.execute(rollup.UPDATE_ALL)
+            db.commit()
+        except pymysql.MySQLError:
+            db.rollback()
+            raise
+    return refreshed, removed
 
 
 if __name__ == "__main__":
-    DB_INFO, REF_TAG = __args__()
-    print("Update with ref: "+REF_TAG)
-
+    ARGS = __args__()
+    print("Update with ref: " + ARGS.ref_tag)
+    USER, PASSWORD, HOST, PORT, DB_NAME = ARGS.db_info
     DB = pymysql.connect(
-        host=DB_INFO.host,
-        port=int(DB_INFO.port),
-        user=DB_INFO.user,
-        password=DB_INFO.password,
-        db=DB_INFO.db_name,
+        host=HOST,
+        port=int(PORT),
+        user=USER,
+        password=PASSWORD,
+        db=DB_NAME,
         cursorclass=pymysql.cursors.DictCursor
     )
     print('MySQL DB connected')
-    cursor = DB.cursor()
-    rows = cursor.execute(selectQuery(REF_TAG))
-    tests = {}
-    tests_counter = {}
-    for row in rows:
-        test_id = row['test']
-        if test_id not in tests:
-            tests[test_id] = dict(row)
-            tests_counter[test_id] = 1
-        else:
-            tests[test_id] = __sum_tests__(tests[test_id], row)
-            tests_counter[test_id] += 1
-    for test_id in tests:
-        for key in KEYS:
-            tests[test_id][key] /= tests_counter[test_id]
-    __update_reference__(DB, tests, REF_TAG)
\ No newline at end of file
+    try:
+        REFRESHED, REMOVED = update_references(
+            DB, ARGS.ref_tag, ARGS.aggregation, ARGS.trim, ARGS.jobs)
+    except ValueError as error:
+        print(f'Error: {error}')
+        sys.exit(1)
+    print(f'{REFRESHED} references refreshed ({ARGS.aggregation}), {REMOVED} removed')
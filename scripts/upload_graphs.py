@@ -1,13 +1,32 @@
 """
 Upload XML GPT Graph to the reports MySQL DB.
 
+Graphs are read and hashed (SHA-256 of the XML) in a process pool. Graphs
+whose hash and storage encoding match the stored ones are skipped, the
+others are compressed in the pool and upserted in batches, so that
+uploading the same directory twice does not change anything.
+
 author: Martino Ferrari
 email: martino.ferrari@c-s.fr
 """
+import hashlib
 import pymysql
 import sys
 import os
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'snap_reports_backend'))
+import compression
+
+BATCH = 100
+
+UPSERT_GRAPH = """
+INSERT INTO test_graph (test, graph, encoding, hash) VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+  graph = VALUES(graph), encoding = VALUES(encoding), hash = VALUES(hash);
+"""
 
 
 def __parse_db_arg__(arg):
@@ -27,7 +46,23 @@ def __parse_db_arg__(arg):
 
 def __help__():
     print('Helper to upload XML GPT grpah to the snap-reports mysql database.')
-    print('   upload_graphs.py DB_USER:DB_PASSWORD@DB_HOST:DB_PORT/DB_NAME XML_GRAPH_PATH')
+    print('   upload_graphs.py DB_USER:DB_PASSWORD@DB_HOST:DB_PORT/DB_NAME XML_GRAPH_PATH [-j N] [-e ENCODING]')
+    print('      -j N: number of reading processes (default number of CPUs)')
+    print(f'      -e ENCODING: storage encoding, one of {", ".join(compression.available())} (default identity)')
+
+
+def __option__(args, flag, default):
+    """Pop the value of an option from the arguments."""
+    if flag not in args:
+        return default
+    index = args.index(flag)
+    if index + 1 >= len(args):
+        print(f'Error: {flag} expects a value')
+        __help__()
+        sys.exit(2)
+    value = args[index + 1]
+    del args[index:index + 2]
+    return value
 
 
 def __args__():
@@ -36,6 +71,16 @@ def __args__():
         __help__()
         sys.exit(0)
 
+    workers = __option__(args, '-j', str(os.cpu_count()))
+    encoding = __option__(args, '-e', compression.IDENTITY)
+    if not workers.isdigit() or int(workers) < 1:
+        print('Error: -j expects a positive number')
+        __help__()
+        sys.exit(2)
+    if encoding not in compression.available():
+        print(f'Error: encoding `{encoding}` not supported')
+        __help__()
+        sys.exit(2)
     if len(args) != 2:
         print('Error: wrong number of arguments')
         __help__()
@@ -43,7 +88,7 @@ def __args__():
     db_info = __parse_db_arg__(args[0])
     graph_path = args[1]
 
-    return db_info, graph_path
+    return db_info, graph_path, int(workers), encoding
 
 
 def retrive_tests(db):
@@ -56,16 +101,46 @@ def retrive_tests(db):
 
     Returns:
     --------
-    list of tests with ID and graph path
+    list of tests with ID, graph path, hash and encoding of the stored graph
     """
     with db.cursor() as cursor:
-        query = '''SELECT ID, graphPath FROM tests;'''
+        query = '''
+            SELECT tests.ID, tests.graphPath, test_graph.hash, test_graph.encoding
+            FROM tests
+            LEFT JOIN test_graph ON test_graph.test = tests.ID;'''
         res = cursor.execute(query)
         print(f'Retriving {res} tests...')
         return list(cursor.fetchall())
 
 
-def upload_graphs(db, tests, graph_path):
+def read_graph(path, encoding, stored_hash=None, stored_encoding=None):
+    """
+    Read and hash a graph, compressing it only if it changed.
+
+    Parameters:
+    -----------
+     - path: XML graph path
+     - encoding: storage encoding of the graph
+     - stored_hash: hash of the stored graph (None if not stored)
+     - stored_encoding: encoding of the stored graph
+
+    Returns:
+    --------
+    hash of the XML and payload to store (None if the stored graph is
+    unchanged), None if the file does not exist
+    """
+    try:
+        with open(path, 'rb') as xml_file:
+            data = xml_file.read()
+    except FileNotFoundError:
+        return None
+    digest = hashlib.sha256(data).hexdigest()
+    if digest == stored_hash and encoding == stored_encoding:
+        return digest, None
+    return digest, compression.compress(data, encoding)
+
+
+def upload_graphs(db, tests, graph_path, workers=None, encoding=compression.IDENTITY):
     """
     Upload XML graph to mysql database.
 
@@ -74,22 +149,47 @@ def upload_graphs(db, tests, graph_path):
      - db: mysql db connection
      - tests: list of tests
      - graph_path: base path containing xml path
+     - workers: number of reading processes
+     - encoding: storage encoding of the graphs
+
+    Returns:
+    --------
+    number of uploaded, unchanged and missing graphs
     """
-    with db.cursor() as cursor:
+    tests = [test for test in tests if test['graphPath']]
+    paths = [os.path.join(graph_path, test['graphPath']) for test in tests]
+    uploaded = unchanged = missing = 0
+    batch = []
+    with db.cursor() as cursor, ProcessPoolExecutor(max_workers=workers) as pool:
+        graphs = pool.map(read_graph, paths, [encoding] * len(paths),
+                          [test['hash'] for test in tests],
+                          [test['encoding'] for test in tests], chunksize=16)
         total = len(tests)
-        for i, test in enumerate(tests):
+        for i, (test, graph) in enumerate(zip(tests, graphs)):
             print(f'\rUploading: {i+1:>4}/{total}', flush=True, end='')
-            path = os.path.join(graph_path, test['graphPath'])
-            test_id = int(test['ID'])
-            with open(path, 'r') as xml_file:
-                text = xml_file.read().encode('utf-8')
-                query = f"INSERT INTO test_graph (test, graph) VALUES ('{test_id}', {str(text)[1:]});"
-                cursor.execute(query)
+            if graph is None:
+                missing += 1
+                continue
+            digest, payload = graph
+            if payload is None:
+                unchanged += 1
+                continue
+            batch.append((int(test['ID']), payload, encoding, digest))
+            if len(batch) == BATCH:
+                cursor.executemany(UPSERT_GRAPH, batch)
+                db.commit()
+                uploaded += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(UPSERT_GRAPH, batch)
+            db.commit()
+            uploaded += len(batch)
         print()
-    db.commit()
+    return uploaded, unchanged, missing
+
 
 if __name__ == "__main__":
-    DB_INFO, GPT_PATH = __args__()
+    DB_INFO, GPT_PATH, WORKERS, ENCODING = __args__()
     DB = pymysql.connect(
         host=DB_INFO.host,
         port=int(DB_INFO.port),
@@ -100,5 +200,6 @@ if __name__ == "__main__":
     )
     print('MySQL DB connected')
     TESTS = retrive_tests(DB)
-    upload_graphs(DB, TESTS, GPT_PATH)
-    print('Done')
\ No newline at end of file
+    UPLOADED, UNCHANGED, MISSING = upload_graphs(DB, TESTS, GPT_PATH, WORKERS, ENCODING)
+    print(f'{UPLOADED} graphs uploaded, {UNCHANGED} unchanged, {MISSING} missing')
+    print('Done')
@@ -15,7 +15,9 @@ setup(
     author='Martino Ferrari',
     author_email='martino.ferrari@c-s.fr',
     packages=setuptools.find_packages(),
-    install_requires=['sanic', 'sanic-cors', 'aiomysql', 'uvloop', 'cryptography'],
-    scripts=['scripts/updatereferences.py'],
+    install_requires=['sanic', 'sanic-cors', 'aiomysql', 'uvloop', 'cryptography',
+                      'numpy', 'orjson'],
+    scripts=['scripts/updatereferences.py', 'scripts/update_job_stats.py',
+             'scripts/load_results.py'],
     python_requires='>=3.6'
 )
@@ -6,5 +6,8 @@ from .branch import branch
 from .job import job
 from .reference import reference
 from .testset import testset
+from .status import status
+from .batch import batch
 
-api = Blueprint.group(test, branch, job, reference, testset, url_prefix='/api')
+api = Blueprint.group(test, branch, job, reference, testset, status, batch,
+                      url_prefix='/api')
@@ -0,0 +1,93 @@
+"""Implement api/batch apis."""
+import asyncio
+import json as jsonlib
+
+from sanic import Blueprint
+from sanic.compat import Header
+from sanic.request import Request
+from sanic.response import text
+from sanic.exceptions import SanicException
+
+from serializer import json
+from support import DB
+
+batch = Blueprint('api_batch')
+
+MAX_REQUESTS = 50
+
+# headers not forwarded to the sub-requests: their bodies are embedded in
+# the JSON response, so they must be complete and not encoded
+STRIPPED_HEADERS = ('accept-encoding', 'if-none-match', 'if-modified-since')
+
+
+def __headers__(request):
+    """Build the headers of the sub-requests."""
+    return Header([(key, value) for key, value in request.headers.items()
+                   if key.lower() not in STRIPPED_HEADERS])
+
+
+async def __dispatch__(request, path):
+    """
+    Execute a GET sub-request against the application routes.
+
+    Returns:
+    --------
+    dictionary with the path, the status and the decoded body
+    """
+    res = {'path': path}
+    if not path.startswith('/api/') or path.split('?')[0].rstrip('/') == '/api/batch':
+        res['status'] = 400
+        res['body'] = 'Path not valid'
+        return res
+    try:
+        sub = Request(path.encode('utf-8'), __headers__(request), request.version,
+                      'GET', request.transport, request.app)
+        _, handler, params = request.app.router.get(sub.path, 'GET', None)
+        response = await handler(sub, **params)
+    except SanicException as error:
+        res['status'] = error.status_code
+        res['body'] = str(error)
+        return res
+    except Exception as error:  # pylint: disable=broad-except
+        res['status'] = 500
+        res['body'] = str(error)
+        return res
+    if response.headers.get('content-encoding', 'identity') != 'identity':
+        res['status'] = 500
+        res['body'] = 'Encoded responses can not be batched'
+        return res
+    res['status'] = response.status
+    body = response.body or b''
+    if response.content_type and 'json' in response.content_type:
+        res['body'] = jsonlib.loads(body) if body else None
+    else:
+        res['body'] = body.decode('utf-8', errors='replace')
+    return res
+
+
+@batch.route("/batch", methods=['POST'])
+async def run_batch(request):
+    """
+    Execute several API GET requests concurrently.
+
+    The body is a JSON list of API paths (query string included), or an
+    object with such a list as `requests`. The response contains, in the
+    same order, the status and the body of every sub-request.
+    """
+    paths = request.json
+    if isinstance(paths, dict):
+        paths = paths.get('requests')
+    if not isinstance(paths, list) or not all(isinstance(x, str) for x in paths):
+        return text("Body must be a list of API paths", status=500)
+    if len(paths) > MAX_REQUESTS:
+        return text(f"Too many requests (max {MAX_REQUESTS})", status=500)
+
+    # do not queue more sub-requests than the DB pool can serve
+    semaphore = asyncio.Semaphore(DB.maxsize)
+
+    async def run(path):
+        async with semaphore:
+            return await __dispatch__(request, path)
+
+    results = await asyncio.gather(*[run(path) for path in paths])
+    return json({'responses': results})
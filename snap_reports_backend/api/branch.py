@@ -1,11 +1,13 @@
 """Implement api/branch apis."""
 from sanic import Blueprint
-from sanic.response import json, text
+from sanic.response import text
 
-import support
 import performances
-from support import DB
-import dbfactory
+import rolling
+from serializer import json
+from support import DB, CATALOG, parse_tag, get_tag_id, get_success_id
+import queries
+from cache import cached
 
 branch = Blueprint('api_branch', url_prefix='/branch')
 
@@ -44,117 +46,60 @@ def __init_result__():
         }
     }
 
-async def __stats_N__(cursor, tag, last=None):
-    query = f"""
-    SELECT 
-        COUNT(results.ID), 
-        AVG((reference_values.duration - results.duration)/ reference_values.duration * 100), 
-        AVG((reference_values.cpu_time - results.cpu_time)/ reference_values.cpu_time * 100), 
-        AVG((reference_values.memory_avg - results.memory_avg)/reference_values.memory_avg * 100), 
-        AVG((reference_values.io_read - results.io_read) / reference_values.io_read * 100),
-        SUM(reference_values.duration * 0.97 > results.duration),
-        SUM(reference_values.cpu_time * 0.97 > results.cpu_time),
-        SUM(reference_values.memory_avg * 0.97 > results.memory_avg),
-        SUM(reference_values.io_read * 0.97 > results.io_read),
-        SUM(reference_values.io_read * 0.97 > results.io_read AND 
-            reference_values.memory_avg * 0.97 > results.memory_avg AND
-            reference_values.duration * 0.97 > results.duration),
-        SUM(reference_values.duration * 1.03 < results.duration),
-        SUM(reference_values.cpu_time * 1.03 < results.cpu_time),
-        SUM(reference_values.memory_avg * 1.03 < results.memory_avg),
-        SUM(reference_values.io_read * 1.03 < results.io_read),
-        SUM(reference_values.io_read  * 1.03 < results.io_read AND 
-            reference_values.memory_avg * 1.03 < results.memory_avg AND
-            reference_values.duration  * 1.03 < results.duration)
-    FROM results 
-    JOIN (
-            SELECT ID from jobs where 
-            dockerTag = 
-                (SELECT ID from dockerTags WHERE name='{tag}')
-            ORDER BY ID DESC {'LIMIT '+str(last) if last else ''}
-        ) jobs ON results.job IN (jobs.ID)
-    INNER JOIN resultTags ON
-        results.result = resultTags.ID
-    INNER JOIN reference_values ON
-        results.test = reference_values.test
-    WHERE 
-        resultTags.tag = "SUCCESS";
+STATS_FIELDS = queries.STATS_FIELDS
+STATS_WINDOWS = queries.STATS_WINDOWS
+
+
+async def __stats__(tag):
     """
-    row = await dbfactory.fetchone(cursor, query)
-    values = list(row.values()) 
-    return {
-        'count': values[0],
-        'duration': values[1],
-        'cpu': values[2],
-        'memory': values[3],
-        'read': values[4],
-        'improved': {
-            'duration': values[5],
-            'cpu': values[6],
-            'memory': values[7],
-            'read': values[8],
-            'both': values[9] 
-        },
-        'regressed': {
-            'duration': values[10],
-            'cpu': values[11],
-            'memory': values[12],
-            'read': values[13],
-            'both': values[14] 
-        }
-    }
+    Compute the branch statistics of every summary window in a single scan.
 
+    Counters (count, improved and regressed) refer to the last 10 jobs.
+    """
+    row = await DB.fetchone(queries.BRANCH_STATS(), {
+        'tag': await get_tag_id(tag),
+        'success': await get_success_id()
+    })
+    res = {
+        'count': row['count'],
+        'improved': {},
+        'regressed': {}
+    }
+    for key in STATS_FIELDS:
+        res[key] = {window: row[f'{window}_{key}'] for window in STATS_WINDOWS}
+    for name in ('improved', 'regressed'):
+        for key in list(STATS_FIELDS) + ['both']:
+            res[name][key] = row[f'{name}_{key}']
+    return res
 
-def parse_tag(tag):
-    """Function to decode url tag"""
-    return tag.replace('%3A', ':')
 
 @branch.route("/<tag:str>/summary")
+@cached()
 async def get_branch_summary(_, tag):
     """Get branch statistics summary."""
     tag = parse_tag(tag)
-    conn = await DB.open()
-    async with conn.cursor() as cursor:
-        res = __init_result__()
-        
-        data = {
-            'last': await __stats_N__(cursor, tag, 1),
-            'last10': await __stats_N__(cursor, tag, 10),
-            'average': await __stats_N__(cursor, tag, None),
-        }
-        res['count'] = data['last10']['count']
-        res['improved'] = data['last10']['improved']
-        res['regressed'] = data['last10']['regressed']
-
-        for key in ('duration', 'cpu', 'memory', 'read'):
-            res[key] = {
-                'last': data['last'][key],
-                'last10': data['last10'][key],
-                'average': data['average'][key]
-            }
-
-        return json(res)
+    res = __init_result__()
+    res.update(await __stats__(tag))
+    return json(res)
 
 
 @branch.route("/<tag:str>/summary/absolute")
+@cached()
 async def get_branch_summary_absolute(_, tag):
     """Get branch statistics absolute numbers."""
     tag = parse_tag(tag)
-    tests = await support.get_test_list(branch=tag)
+    stat = await performances.get_branch_status_fulldata(tag)
     res = __init_result__()
-    for test in tests:
-        stat = await performances.get_status_fulldata_dict(test, tag)
-        if stat:
-            res['count'] += 1
-            for key in stat:
-                for sub_key in stat[key]:
-                    if sub_key in res[key]:
-                        value = (stat[key][sub_key] - stat[key]['reference'])
-                        res[key][sub_key] += value
+    res['count'] = len(stat['tests'])
+    for key in performances.STATUS_FIELDS:
+        for sub_key in ('last', 'last10', 'average'):
+            value = stat[key][sub_key] - stat[key]['reference']
+            res[key][sub_key] += float(value.sum())
     return json(res)
 
 
 @branch.route("/<tag:str>/history/scheduled/<field:str>")
+@cached()
 async def get_branch_schduled_field_history(_, tag, field):
     result = await performances.get_branch_scheduled_field_history(tag, field) 
     if  result is None:
@@ -164,9 +109,13 @@ async def get_branch_schduled_field_history(_, tag, field):
 
 
 @branch.route("/<tag:str>/history/scheduled/<field:str>/<window:int>")
-async def get_branch_scheduled_field_history_ma(_, tag, field, window):
+@cached()
+async def get_branch_scheduled_field_history_ma(request, tag, field, window):
     tag = parse_tag(tag)
-    result = await performances.get_branch_scheduled_field_history_moving_average(tag, field, window) 
+    mode = request.args.get('mode', 'simple')
+    if mode not in rolling.MODES:
+        return text(f"Mode `{mode}` does not exist", status=500)
+    result = await performances.get_branch_scheduled_field_history_moving_average(tag, field, window, mode)
     if  result is None:
         return text(f"Field `{field}` does not exist", status=500)
     dates, values = result
@@ -174,6 +123,7 @@ async def get_branch_scheduled_field_history_ma(_, tag, field, window):
 
 
 @branch.route("/<tag:str>/history/<field:str>")
+@cached()
 async def get_branch_field_history(_, tag, field):
     tag = parse_tag(tag)
     result = await performances.get_branch_field_history(tag, field) 
@@ -183,9 +133,13 @@ async def get_branch_field_history(_, tag, field):
     return json({"date": dates, "value": values})
 
 @branch.route("/<tag:str>/history/<field:str>/<window:int>")
-async def get_branch_field_history_ma(_, tag, field, window):
+@cached()
+async def get_branch_field_history_ma(request, tag, field, window):
     tag = parse_tag(tag)
-    result = await performances.get_branch_field_history_moving_average(tag, field, window) 
+    mode = request.args.get('mode', 'simple')
+    if mode not in rolling.MODES:
+        return text(f"Mode `{mode}` does not exist", status=500)
+    result = await performances.get_branch_field_history_moving_average(tag, field, window, mode)
     if  result is None:
         return text(f"Field `{field}` does not exist", status=500)
     dates, values = result
@@ -193,76 +147,37 @@ async def get_branch_field_history_ma(_, tag, field, window):
 
 
 async def __details_N__(tag, num):
-    query = f"""
-    SELECT 
-        tests.ID AS test_ID, 
-        tests.name AS test_name, 
-        COUNT(results.ID) AS num_exec, 
-        AVG(results.duration) AS res_duration,  
-        AVG(results.cpu_time) AS res_cpu,
-        AVG(results.memory_avg) AS res_memory, 
-        AVG(results.io_read) AS res_read, 
-        AVG(reference_values.duration) AS ref_duration, 
-        AVG(reference_values.cpu_time) AS ref_cpu,
-        AVG(reference_values.memory_avg) AS ref_memory, 
-        AVG(reference_values.io_read) AS ref_read
-    FROM results 
-    JOIN (
-        SELECT ID from jobs where 
-        dockerTag = 
-            (SELECT ID from dockerTags WHERE name='{tag}')
-        ORDER BY ID DESC {'LIMIT '+str(num) if num else ''}
-    ) jobs on results.job In (jobs.ID)
-    INNER JOIN reference_values ON
-        results.test = reference_values.test
-    INNER JOIN tests ON
-        results.test = tests.ID
-    INNER JOIN resultTags ON
-        results.result = resultTags.ID
-    WHERE 
-        resultTags.tag = 'SUCCESS'
-    GROUP BY tests.ID;
-    """
-    stats = await DB.fetchall(query)
+    stats = await DB.fetchall(queries.BRANCH_DETAILS(), {
+        'tag': await get_tag_id(tag),
+        'success': await get_success_id(),
+        'limit': num if num else queries.NO_LIMIT
+    })
     return stats
 
 
+async def __result_tag__(res_id):
+    result = await CATALOG.result(res_id)
+    return None if result is None else result['tag']
+
+
 @branch.route("/<tag:str>/details/last")
+@cached()
 async def get_branch_details_last(_, tag):
     """Get branch statistics summary."""
-    tag = parse_tag(tag)
-    query = f"""
-    SELECT 
-        tests.ID AS test_ID, tests.name AS name, 
-        results.ID AS result_ID, results.job, resultTags.tag AS result, 
-        results.start, results.duration / ref.duration AS duration, 
-        results.cpu_time / ref.cpu_time AS cpu_time,
-        results.memory_avg / ref.memory_avg AS memory_avg, 
-        results.memory_max / ref.memory_max AS memory_max, 
-        results.io_read / ref.io_read AS io_read, 
-        results.io_write / ref.io_write AS io_write
-    FROM tests
-    INNER JOIN reference_values AS ref ON ref.test = tests.ID
-    INNER JOIN results ON results.test = tests.ID
-    JOIN (
-            SELECT test, max(job) AS lastJob 
-            FROM results 
-            WHERE job IN
-                (SELECT ID FROM jobs WHERE dockerTag = (SELECT ID FROM dockerTags WHERE name = '{tag}')) 
-            GROUP BY test
-        ) filtr ON filtr.test = results.test AND filtr.lastJob = results.job
-    INNER JOIN resultTags ON results.result = resultTags.ID
-    ORDER BY tests.ID;
-    """
-    stats = await DB.fetchall(query)
+    stats = await DB.fetchall(queries.BRANCH_DETAILS_LAST(), {
+        'tag': await get_tag_id(parse_tag(tag))})
+    for stat in stats:
+        stat['result'] = await __result_tag__(stat['result'])
     return json(stats)
 
 @branch.route("/<tag:str>/details")
+@cached()
 async def get_branch_details_n(_, tag):
     """Get branch statistics summary."""
     return json({'details': await __details_N__(tag, None)})
 
 @branch.route("/<tag:str>/details/<n:int>")
+@cached()
 async def get_branch_details(_, tag, n):
     """Get branch statistics summary."""
     return json({'details': await __details_N__(tag, n)})
@@ -271,38 +186,36 @@ async def get_branch_details(_, tag, n):
 @branch.route("/<tag:str>/last_job")
 async def get_branch_last_job(_, tag):
     """Get last job of a given branch."""
-    tag = parse_tag(tag)
-    row = await DB.fetchone(f'''
-        SELECT jobs.ID, jobs.jobnum, jobs.timestamp_start, jobs.testScope, 
-            resultTags.tag
-        FROM jobs
-        INNER JOIN resultTags ON jobs.result = resultTags.ID
-        WHERE jobs.dockerTag =
-            (SELECT ID FROM dockerTags WHERE name='{tag}')
-        ORDER BY jobs.ID DESC LIMIT 1;''')
+    row = await DB.fetchone(queries.BRANCH_LAST_JOB(), {
+        'tag': await get_tag_id(parse_tag(tag))})
+    if row is not None:
+        row['tag'] = await __result_tag__(row.pop('result'))
     return json(row)
 
 
 @branch.route("/list")
 async def get_list(_):
     """Get list of branches."""
-    rows = await DB.fetchall('SELECT ID, name FROM dockerTags;')
+    rows = await DB.fetchall(queries.DOCKER_TAGS())
     return json({'branches': rows})
 
 
 @branch.route("/<tag:str>/njobs")
 async def get_branch_njobs(_, tag):
     """Get number of jobs executed of a given branch."""
-    tag = parse_tag(tag)
-    row = await DB.fetchone(f'''
-        SELECT COUNT(ID) 
-        FROM jobs
-        WHERE dockerTag = (
-            SELECT ID 
-            FROM dockerTags
-            WHERE name='{tag}'
-        );''')
-    return json({'njobs': row['COUNT(ID)']})
+    row = await DB.fetchone(queries.BRANCH_NJOBS(), {
+        'tag': await get_tag_id(parse_tag(tag))})
+    return json({'njobs': row['njobs']})
+
+
+def __compare_filters__(args):
+    """Return the comparison filter parameters (None if not valid)."""
+    params = dict.fromkeys(queries.COMPARE_FILTERS)
+    for key in args:
+        if key not in queries.COMPARE_FILTERS:
+            return None
+        params[key] = args[key][0]
+    return params
 
 
 @branch.route("/compare/<tag_a:str>/<tag_b:str>/<field:str>")
@@ -317,111 +230,81 @@ async def get_branch_comparison(request, tag_a, tag_b, field):
      - tag_b: second branch tag
      - field: field to examine (CPU Time, Memory etc)
     """
-    tag_a = parse_tag(tag_a)
-    tag_b = parse_tag(tag_b)
-    if field.lower() not in FIELD_SET:
+    field = field.lower()
+    if field not in FIELD_SET:
         return text(f"Field `{field}` does not exist", status=500)
-    q_filter = ''
-    for key in request.args:
-        value = request.args[key][0]
-        if key == 'author':
-            q_filter += f" AND UPPER(tests.{key}) = '{value.upper()}'"
-        else:
-            q_filter += f" AND tests.{key} LIKE '%{value}%'"
-    
-    intersect_query = f"""
-    SELECT
-    DISTINCT results.test
-    FROM results
-    INNER JOIN jobs ON jobs.ID = results.job
-    WHERE 
-        jobs.dockerTag = (SELECT ID FROM dockerTags WHERE name='{tag_a}')
-        AND
-        results.result = (SELECT ID FROM resultTags WHERE tag='SUCCESS')
-        AND
-        results.test in  (
-            SELECT DISTINCT
-            results.test
-            FROM results
-            INNER JOIN jobs ON jobs.ID = results.job
-            WHERE 
-                jobs.dockerTag = (SELECT ID FROM dockerTags WHERE name='{tag_b}')
-                AND
-                results.result = (SELECT ID FROM resultTags WHERE tag='SUCCESS'))
+    params = __compare_filters__(request.args)
+    if params is None:
+        return text("Filter not valid", status=500)
+    params['tag_a'] = await get_tag_id(parse_tag(tag_a))
+    params['tag_b'] = await get_tag_id(parse_tag(tag_b))
+    params['success'] = await get_success_id()
+
+    rows = await DB.fetchall(queries.BRANCH_COMPARE(field=field), params)
+    for row in rows:
+        row['diff_abs'] = row['br_a_avg'] - row['br_b_avg']
+        row['diff_rel'] = row['diff_abs'] / row['br_b_avg'] * 100 if row['br_b_avg'] else None
+    return json(rows)
+
+
+@branch.route("/compare")
+async def get_branches_comparison(request):
     """
+    Compare a specific field of several branches against a baseline.
 
-    query_a = f"""
-    SELECT 
-        tests.ID AS test_ID, 
-        tests.name AS test_name, 
-        COUNT(results.ID) AS num_exec, 
-        AVG(results.{field.lower()}) AS field
-    FROM results 
-    JOIN (
-        SELECT ID from jobs where 
-        dockerTag = 
-            (SELECT ID from dockerTags WHERE name='{tag_a}')
-        ORDER BY jobs.timestamp_start DESC LIMIT 5
-    ) jobs on results.job In (jobs.ID)
-    INNER JOIN tests ON
-        results.test = tests.ID
-    INNER JOIN resultTags ON
-        results.result = resultTags.ID
-    WHERE 
-        resultTags.tag = 'SUCCESS'
-    AND 
-        tests.ID in ({intersect_query})
-    {q_filter}
-    GROUP BY tests.ID
-    ORDER BY tests.ID ASC;
-    """
+    Query arguments
+    ---------------
+     - tags: comma separated branch tags, the first one is the baseline
+     - field: field to examine (CPU Time, Memory etc)
+     - any of the test filters of the two branches comparison
 
-    query_b = f"""
-    SELECT 
-        tests.ID AS test_ID, 
-        tests.name AS test_name, 
-        COUNT(results.ID) AS num_exec, 
-        AVG(results.{field.lower()}) AS field
-    FROM results 
-    JOIN (
-        SELECT ID from jobs where 
-        dockerTag = 
-            (SELECT ID from dockerTags WHERE name='{tag_b}')
-        ORDER BY jobs.timestamp_start DESC LIMIT 5
-    ) jobs on results.job In (jobs.ID)
-    INNER JOIN tests ON
-        results.test = tests.ID
-    INNER JOIN resultTags ON
-        results.result = resultTags.ID
-    WHERE 
-        resultTags.tag = 'SUCCESS'
-    AND 
-        tests.ID in ({intersect_query})
-    {q_filter}
-    GROUP BY tests.ID
-    ORDER BY tests.ID ASC;
+    Only tests executed by the baseline are reported, branches without
+    executions of a test are omitted from its entry.
     """
-    stats_a = await DB.fetchall(query_a)
-    stats_b = await DB.fetchall(query_b)
-    stats_b_ids = [el['test_ID'] for el in stats_b]
+    args = dict(request.args)
+    tags = [parse_tag(tag) for tag in args.pop('tags', [''])[0].split(',') if tag]
+    field = args.pop('field', [''])[0].lower()
+    if len(tags) < 2:
+        return text("At least two tags are required", status=500)
+    if len(tags) > queries.MAX_COMPARE_TAGS:
+        return text(f"At most {queries.MAX_COMPARE_TAGS} tags can be compared", status=500)
+    if field not in FIELD_SET:
+        return text(f"Field `{field}` does not exist", status=500)
+    params = __compare_filters__(args)
+    if params is None:
+        return text("Filter not valid", status=500)
+    tag_ids = {}
+    for tag in tags:
+        tag_id = await get_tag_id(tag)
+        if tag_id is None:
+            return text(f"Branch `{tag}` not found", status=404)
+        tag_ids[tag_id] = tag
+    for i, tag_id in enumerate(tag_ids):
+        params[f'tag_{i}'] = tag_id
+    params['success'] = await get_success_id()
+
+    rows = await DB.fetchall(
+        queries.BRANCH_COMPARE_MANY(field=field, tags=len(tag_ids)), params)
+    baseline = tags[0]
+    tests = {}
+    for row in rows:
+        test = tests.setdefault(row['test_ID'], {
+            'test_ID': row['test_ID'],
+            'test_name': row['test_name'],
+            'branches': {}
+        })
+        test['branches'][tag_ids[row['tag']]] = {
+            'count': row['num_exec'],
+            'avg': row['field']
+        }
     results = []
-    # Return first element index matching el['test_ID']
-    search = lambda lst, test_id: [i for i, el in enumerate(lst) if el['test_ID'] == test_id][0]
-    for el_a in stats_a:
-        if el_a['test_ID'] in stats_b_ids:
-            id_b = search(stats_b, el_a['test_ID'])
-            el_b = stats_b[id_b]
-            stats_b.pop(id_b)
-            val = {
-                'test_ID': el_a['test_ID'],
-                'test_name': el_a['test_name'],
-                'br_a_count': el_a['num_exec'],
-                'br_b_count': el_b['num_exec'],
-                'br_a_avg': el_a['field'],
-                'br_b_avg': el_b['field'],
-                'diff_abs': el_a['field'] - el_b['field'],
-                'diff_rel': (el_a['field'] - el_b['field']) / el_b['field'] * 100
-            }
-            results.append(val)
-        
-    return json(results)
\ No newline at end of file
+    for test in tests.values():
+        base = test['branches'].get(baseline)
+        if base is None:
+            continue
+        for branch_stats in test['branches'].values():
+            branch_stats['diff_abs'] = branch_stats['avg'] - base['avg']
+            branch_stats['diff_rel'] = (branch_stats['diff_abs'] / base['avg'] * 100
+                                        if base['avg'] else None)
+        results.append(test)
+    return json({'baseline': baseline, 'tags': tags, 'tests': results})
@@ -1,38 +1,32 @@
 """Implement api/job apis."""
-from sanic import Blueprint
-from sanic.response import json, text
+import asyncio
 
-import csv
+from sanic import Blueprint
+from sanic.response import text, raw
 
+from serializer import json
 from support import DB
 import support
-import performances
+import dbfactory
+import rawdata
+import compression
+import downsampling
+import ingest
+import queries
+import rollup
 
 job = Blueprint('api_job', url_prefix='/job')
 
 
-def __convert_csv__(data):
-    string = data
-    reader = csv.reader(string.splitlines()[2:], delimiter=',')
-    rows = []
-    for row in reader:
-        rows.append(row)
-    return rows
-
-
 @job.route("/list")
 async def job_list(request):
     """Retrieve list of jobs."""
-    query_str = ''
-    for i, key in enumerate(request.args):
-        if i > 0:
-            query_str += " AND "
-        val = request.args[key]
-        query_str += f"{key}='{val[0]}'"
-
-    if query_str:
-        query_str = "WHERE " + query_str
-    rows = await DB.fetchall("SELECT * FROM jobs "+query_str + " ORDER BY id DESC")
+    filters = {key: request.args[key][0] for key in request.args}
+    try:
+        query = queries.JOB_LIST(where=queries.filter_key(filters))
+    except ValueError:
+        return text("Filter not valid", status=500)
+    rows = await DB.fetchall(query, filters)
 
     for value in rows:
         value['dockerTag'] = await support.convert_tag(value['dockerTag'])
@@ -40,6 +34,118 @@ async def job_list(request):
     return json(rows)
 
 
+async def __resolve__(job_obj, results):
+    """
+    Replace tag and test names by their IDs.
+
+    Returns:
+    --------
+    error message, None if every name is known
+    """
+    job_obj['result'] = await support.CATALOG.result_id(job_obj['result'])
+    if job_obj['result'] is None:
+        return 'Unknown job result tag'
+    tests = set()
+    for i, res in enumerate(results):
+        res['result'] = await support.CATALOG.result_id(res['result'])
+        if res['result'] is None:
+            return f'Unknown result tag of result {i}'
+        test_id = await support.get_test_id(res['test'])
+        if test_id is None or await support.CATALOG.test_name(test_id) is None:
+            return f'Unknown test `{res["test"]}`'
+        # a test given both by name and by ID
+        if test_id in tests:
+            return f'Duplicated test `{res["test"]}` of result {i}'
+        tests.add(test_id)
+        res['test'] = test_id
+    return None
+
+
+def __encode_blobs__(results):
+    """Compress the profiles of the results (run in an executor)."""
+    blobs = []
+    for res in results:
+        if res.get('raw_data') is None:
+            continue
+        payload, encoding = rawdata.encode(res['raw_data'])
+        output = res.get('output')
+        if isinstance(output, str):
+            output = output.encode('utf-8')
+        blobs.append({'test': res['test'], 'raw_data': payload,
+                      'encoding': encoding, 'output': output})
+    return blobs
+
+
+async def __store__(job_obj, results, blobs):
+    """
+    Insert a job, its results and their blobs in a single transaction.
+
+    Returns:
+    --------
+    the ID of the new job
+    """
+    async with DB.acquire() as conn:
+        await conn.begin()
+        try:
+            async with conn.cursor() as cursor:
+                if job_obj['dockerTag'] is None:
+                    await cursor.execute(queries.INSERT_DOCKER_TAG(),
+                                         {'name': job_obj['dockerName']})
+                    job_obj['dockerTag'] = cursor.lastrowid
+                await cursor.execute(queries.INSERT_JOB(), job_obj)
+                job_id = cursor.lastrowid
+                rows = [dict({key: res[key] for key in ingest.RESULT_KEYS},
+                             job=job_id) for res in results]
+                await cursor.executemany(queries.INSERT_RESULTS(), rows)
+                if blobs:
+                    await cursor.execute(queries.JOB_RESULT_IDS(), {'job': job_id})
+                    ids = {test: res_id for res_id, test in await cursor.fetchall()}
+                    for blob in blobs:
+                        blob['result'] = ids[blob['test']]
+                    await cursor.executemany(queries.INSERT_RESULT_DATA(), blobs)
+                await cursor.execute(rollup.UPDATE_JOB, (job_id,))
+            await conn.commit()
+        except BaseException:
+            await conn.rollback()
+            raise
+    return job_id
+
+
+@job.route("", methods=['POST'])
+async def post_job(request):
+    """
+    Store a job with all its results.
+
+    The body is a JSON object or NDJSON, optionally gzip compressed (see
+    the `ingest` module). Requests must be authenticated with the
+    `Authorization: Bearer <INGEST_TOKEN>` header.
+    """
+    if not ingest.authorized(request.headers.get('authorization')):
+        return text("Not authorized", status=401)
+    try:
+        job_obj, results = ingest.parse(request.body,
+                                        request.headers.get('content-type'))
+    except ingest.PayloadError as error:
+        return text(f"Payload not valid: {error}", status=500)
+
+    error = await __resolve__(job_obj, results)
+    if error is not None:
+        return text(error, status=500)
+    job_obj['dockerName'] = job_obj['dockerTag']
+    job_obj['dockerTag'] = await support.get_tag_id(job_obj['dockerName'])
+    new_tag = job_obj['dockerTag'] is None
+
+    loop = asyncio.get_event_loop()
+    blobs = await loop.run_in_executor(None, __encode_blobs__, results)
+    try:
+        job_id = await __store__(job_obj, results, blobs)
+    except dbfactory.IntegrityError:
+        return text("Job already exists", status=500)
+    if new_tag:
+        await support.CATALOG.refresh(force=True)
+    return json({'job': job_id, 'results': len(results)}, status=201)
+
+
 @job.route("/tag/<tag:str>")
 async def job_list_by_tag(_, tag):
     """
@@ -50,8 +156,7 @@ async def job_list_by_tag(_, tag):
      - tag: frequency tag
     """
     tag = tag.lower()
-    rows = await DB.fetchall(
-        f"SELECT * FROM jobs WHERE LOWER(testScope) = '{tag}' ORDER BY id")
+    rows = await DB.fetchall(queries.JOBS_BY_SCOPE(), {'scope': tag})
     res = []
     for row in rows:
         value = row
@@ -95,15 +200,39 @@ async def get_job_results(_, job_id):
     return await support.get_job_stats(job_id)
 
 
+async def __exec_stat__(job_id, exec_id):
+    """
+    Retrieve a test execution, its profile payload and its output.
+
+    The blob columns are returned undecoded as the last three values of
+    the row: raw_data payload, raw_data encoding and output.
+    """
+    async with DB.cursor() as cursor:
+        await cursor.execute(queries.JOB_EXEC(),
+                             {'job': job_id, 'test': exec_id})
+        return await cursor.fetchone(), cursor.description
+
+
 @job.route("/<job_id>/statistics/<exec_id:int>")
-async def get_job_exec_stat(_, job_id, exec_id):
+async def get_job_exec_stat(request, job_id, exec_id):
     """
     Retrieve list of jobs.
 
     Parameters:
     -----------
      - id: job id
+
+    Query arguments:
+    ----------------
+     - points: downsample the raw_data trace to at most N rows
+     - method: downsampling method (`lttb` default, `minmax` or `mean`)
     """
+    points = request.args.get('points')
+    method = request.args.get('method', 'lttb')
+    if points is not None and (not points.isdigit() or int(points) < 3):
+        return text("Points option not valid", status=500)
+    if method not in downsampling.METHODS:
+        return text(f"Method `{method}` not supported", status=500)
     job_id = await support.get_id(job_id, 'jobs')
 
     if job_id is None:
@@ -112,18 +241,51 @@ async def get_job_exec_stat(_, job_id, exec_id):
     if job_obj is None:
         return text("Job do not exist", status=404)
 
-    val = await DB.fetchone(f"""
-        SELECT *
-        FROM results WHERE job = '{job_id}' AND test = '{exec_id}'""")
-    if val:
+    row, desc = await __exec_stat__(job_id, exec_id)
+    if row:
+        val = dbfactory.r2d(row[:-3], desc[:-3])
+        payload, encoding, output = row[-3:]
         val['result'] = await support.convert_result(val['result'])
         val['test'] = await support.get_test(val['test'])
         val['job'] = job_obj
-        val['raw_data'] = __convert_csv__(val['raw_data'])
+        val['raw_data'] = list(rawdata.iter_rows(payload, encoding))
+        if points is not None:
+            val['raw_data'] = downsampling.downsample(
+                val['raw_data'], int(points), method)
+        val['output'] = output
         return json(val)
     return text("No results found", status=404)
 
 
+@job.route("/<job_id>/statistics/<exec_id:int>/raw_data")
+async def get_job_exec_raw_data(request, job_id, exec_id):
+    """
+    Retrieve the raw CSV profile of a test execution.
+
+    The stored payload is sent still compressed if the client accepts its
+    encoding.
+
+    Parameters:
+    -----------
+     - job_id: job id
+     - exec_id: test id
+    """
+    job_id = await support.get_id(job_id, 'jobs')
+    if job_id is None:
+        return text("Job option non valid", status=500)
+    row, _ = await __exec_stat__(job_id, exec_id)
+    if not row or row[-3] is None:
+        return text("No results found", status=404)
+    payload, encoding = row[-3:-1]
+    accepted = request.headers.get('accept-encoding', '')
+    if encoding != compression.IDENTITY and compression.accepts(accepted, encoding):
+        return raw(payload, content_type='text/csv',
+                   headers={'Content-Encoding': encoding,
+                            'Vary': 'Accept-Encoding'})
+    return raw(compression.decompress(payload, encoding),
+               content_type='text/csv', headers={'Vary': 'Accept-Encoding'})
+
+
 @job.route("/<job_id>/summary")
 async def get_job_summary(_, job_id):
     """
@@ -140,11 +302,7 @@ async def get_job_summary(_, job_id):
     if job_obj is None:
         return text("Job do not exist", status=404)
 
-    rows = await DB.fetchall(f"""
-        SELECT
-            test, result, duration, cpu_time, memory_avg, memory_max, io_read,
-            io_write
-        FROM results WHERE job = '{job_id}' ORDER BY test""")
+    rows = await DB.fetchall(queries.JOB_SUMMARY(), {'job': job_id})
 
     summary = {
         'num_tests': 0,
@@ -164,44 +322,39 @@ async def get_job_summary(_, job_id):
         'skipped': 0
     }
     if not rows:
-        return summary
+        return json(summary)
 
     for row in rows:
-        test_id = row['test']
-        reference = await performances.get_test_reference(test_id)
-        if reference:
+        if row['ref_ID'] is not None:
             test = {
-                'duration': row['duration'] / reference['duration'],
-                'cpu_time': row['cpu_time'] / reference['cpu_time'],
+                'duration': row['ratio_duration'],
+                'cpu_time': row['ratio_cpu_time'],
                 'memory': {
-                    'average': row['memory_avg'] / reference['memory_avg'],
-                    'max': row['memory_max'] / reference['memory_max']
+                    'average': row['ratio_memory_avg'],
+                    'max': row['ratio_memory_max']
                 },
                 'IO': {
-                    'read': row['io_read'] / reference['io_read'],
-                    'write': row['io_write'] / reference['io_write']
+                    'read': row['ratio_io_read'],
+                    'write': row['ratio_io_write']
                 }
             }
         else:
             test = {}
-        test['name'] = await performances.__get_test_name__(test_id)
+        test['name'] = row['name']
         test['ID'] = row['test']
         summary['tests'].append(test)
-        summary['num_tests'] += 1
-        summary['duration'] += row['duration']
-        summary['cpu_time'] += row['cpu_time']
-        if row['result'] == 1:
-            summary['passed'] += 1
-        elif row['result'] == 2:
-            summary['skipped'] += 1
-        else:
-            summary['failed'] += 1
-        if summary['memory']['max'] < row['memory_max']:
-            summary['memory']['max'] = row['memory_max']
-        summary['IO']['read'] += row['io_read']
-        summary['IO']['write'] += row['io_write']
-        summary['memory']['average'] += row['memory_avg']
-    summary['memory']['average'] /= summary['num_tests']
+
+    totals = rows[0]
+    summary['num_tests'] = totals['num_tests']
+    summary['duration'] = totals['duration']
+    summary['cpu_time'] = totals['cpu_time']
+    summary['passed'] = totals['passed']
+    summary['skipped'] = totals['skipped']
+    summary['failed'] = totals['num_tests'] - totals['passed'] - totals['skipped']
+    summary['memory']['max'] = max(totals['memory_max'], 0)
+    summary['memory']['average'] = totals['memory_avg']
+    summary['IO']['read'] = totals['io_read']
+    summary['IO']['write'] = totals['io_write']
     return json(summary)
 
 
@@ -215,35 +368,7 @@ async def get_testsets_summary(_, job_id):
     if job_obj is None:
         return text("Job do not exist", status=404)
 
-    rows = await DB.fetchall(f"""
-        SELECT
-            tests.ID AS tst_ID, 
-            tests.name AS tst_name,
-            tests.testset AS tst_testset, 
-            results.result AS res_ID, 
-            resultTags.tag AS res_tag, 
-            results.duration AS prf_duration, 
-            results.cpu_time AS prf_cpu_time, 
-            results.memory_avg AS prf_memory_avg, 
-            results.memory_max AS prf_memory_max, 
-            results.io_read AS prf_io_read,
-            results.io_write AS prf_io_write, 
-            reference_values.updated AS ref_updated,
-            reference_values.duration AS ref_duration, 
-            reference_values.cpu_time AS ref_cpu_time, 
-            reference_values.memory_avg AS ref_memory_avg, 
-            reference_values.memory_max AS ref_memory_max, 
-            reference_values.io_read AS ref_io_read,
-            reference_values.io_write AS ref_io_write,
-            reference_values.threads_avg as ref_threads_avg
-        FROM results 
-        LEFT JOIN reference_values ON reference_values.test = results.test
-        INNER JOIN tests ON 
-            results.test = tests.ID
-        INNER JOIN resultTags ON
-            results.result = resultTags.ID
-        WHERE job = {job_id}
-        ORDER BY tests.ID""")
+    rows = await DB.fetchall(queries.JOB_TESTSETS(), {'job': job_id})
     passed = 0
     count = 0
     summary = {}
@@ -0,0 +1,26 @@
+"""Implement api/status apis."""
+from sanic import Blueprint
+
+from serializer import json
+from support import DB
+import cache
+
+status = Blueprint('api_status', url_prefix='/status')
+
+
+@status.route("/pool")
+async def get_pool_stats(_):
+    """Retrieve DB connection pool saturation statistics."""
+    return json(DB.stats())
+
+
+@status.route("/cache")
+async def get_cache_stats(_):
+    """Retrieve response cache statistics."""
+    return json(cache.CACHE.info())
+
+
+@status.route("/graphs")
+async def get_graph_cache_stats(_):
+    """Retrieve graph cache statistics."""
+    return json(cache.GRAPHS.info())
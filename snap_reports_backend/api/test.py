@@ -1,27 +1,32 @@
 """Implement api/test apis."""
+import asyncio
+
 from sanic import Blueprint
-from sanic.response import json, text
+from sanic.response import text, raw, HTTPResponse
 
+from serializer import json
 from support import DB
 import support
 import performances
+from cache import cached, GRAPHS
+import queries
+import compression
 
 test = Blueprint('api_test', url_prefix='/test')
 
+# encodings of the graphs, by order of preference
+GRAPH_ENCODINGS = (compression.BROTLI, compression.GZIP)
+
 
 @test.route("/list")
 async def test_list(request):
     """Retrieve list of tests."""
-    query_str = ''
-    for i, key in enumerate(request.args):
-        if i > 0:
-            query_str += " AND "
-        val = request.args[key]
-        query_str += f"{key}='{val[0]}'"
-
-    if query_str:
-        query_str = "WHERE " + query_str
-    rows = await DB.fetchall("SELECT * FROM tests " + query_str + " ORDER BY id")
+    filters = {key: request.args[key][0] for key in request.args}
+    try:
+        query = queries.TEST_LIST(where=queries.filter_key(filters))
+    except ValueError:
+        return text("Filter not valid", status=500)
+    rows = await DB.fetchall(query, filters)
     res = []
     for row in rows:
         res.append(dict(row))
@@ -50,6 +55,7 @@ async def get_test_summary(_, test):
 
 
 @test.route("/<test>/summary/<tag:str>")
+@cached()
 async def get_test_summary_by_tag(_, test, tag):
     """Retrieve test performances summary."""
     test_id = await support.get_test_id(test)
@@ -97,20 +103,21 @@ async def get_history_moving_avg(request, test, field, tag, num):
     last_n = None
     if 'max' in request.args:
         last_n = int(request.args['max'][0])
-    return await performances.history_ma(test_id, tag, field, num, last_n)
+    mode = request.args.get('mode', 'simple')
+    return await performances.history_ma(test_id, tag, field, num, last_n, mode)
 
 
 @test.route("/author/<name:str>")
 async def get_test_by_author(_, name):
     """Retrieve list of tests by author."""
-    res = await DB.fetchall(f"SELECT * FROM tests where author='{name}' ORDER BY id")
+    res = await DB.fetchall(queries.TESTS_BY_AUTHOR(), {'author': name})
     return json({'tests': res})
 
 
 @test.route("/tag/<name:str>")
 async def get_test_by_frequency(_, name):
     """Retrieve list of tests by frequency tag."""
-    rows = await DB.fetchall(f"SELECT * FROM tests ORDER BY id")
+    rows = await DB.fetchall(queries.ALL_TESTS())
     res = []
     lowcase = name.lower()
     for val in rows:
@@ -126,13 +133,8 @@ async def get_test_exec_count(_, tag):
     test_id = await support.get_test_id(tag)
     if test_id is None:
         return text(f"Test `{tag}` not found", status=404)
-    row = await DB.fetchone(f'''
-        SELECT COUNT(ID)
-        FROM jobs
-        WHERE ID IN
-            (SELECT job FROM results WHERE test = '{test_id}');
-        ''')
-    return json({'count': row['COUNT(ID)']})
+    row = await DB.fetchone(queries.TEST_EXEC_COUNT(), {'test': test_id})
+    return json({'count': row['count']})
 
 
 @test.route('/<tag>/last_job')
@@ -141,22 +143,46 @@ async def get_test_last_job(_, tag):
     test_id = await support.get_test_id(tag)
     if test_id is None:
         return text(f"Test `{tag}` not found", status=404)
-    row = await DB.fetchone(f'''
-        SELECT jobs.*, resultTags.tag, dockerTags.name
-        FROM jobs 
-        INNER JOIN resultTags ON jobs.result = resultTags.ID
-        INNER JOIN dockerTags ON jobs.dockerTag = dockerTags.ID
-        WHERE jobs.ID IN 
-            (SELECT job FROM results WHERE test = '{test_id}')
-        ORDER BY jobs.ID DESC LIMIT 1;
-        ''')
+    row = await DB.fetchone(queries.TEST_LAST_JOB(), {'test': test_id})
     return json(row)
 
+def __etag_matches__(header, etag):
+    """Check an `If-None-Match` header against an entity tag."""
+    if not header:
+        return False
+    for item in header.split(','):
+        item = item.strip()
+        if item.startswith('W/'):
+            item = item[2:]
+        if item in ('*', etag):
+            return True
+    return False
+
+
+def __graph_headers__(etag, encoding=compression.IDENTITY):
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if encoding != compression.IDENTITY:
+        headers['Content-Encoding'] = encoding
+    return headers
+
+
+def __encode_graph__(graph, stored, encoding):
+    """Re-encode a stored graph (run in an executor)."""
+    if stored == encoding:
+        return graph
+    return compression.compress(compression.decompress(graph, stored), encoding)
+
+
 @test.route('/<tag>/graph.xml')
-async def get_test_xml(_, tag):
+async def get_test_xml(request, tag):
     """
     Retrive the test graph.
 
+    The hash of the graph is sent as ETag: clients revalidating an
+    unchanged graph get a `304 Not Modified` without any DB query. Graphs
+    are compressed with the preferred encoding accepted by the client and
+    kept in the GRAPHS cache.
+
     Pramaters:
     ----------
      - tag: test identifier
@@ -164,7 +190,26 @@ async def get_test_xml(_, tag):
     test_id = await support.get_test_id(tag)
     if test_id is None:
         return text(f"Test `{tag}` not found", status=404)
-    query = f"SELECT graph FROM test_graph WHERE test='{test_id}';"
-    row = await DB.fetchone(query)
-    return text(row['graph'])
+    digest = await support.CATALOG.graph_hash(test_id)
+    if digest is None:
+        return text(f"Graph of test `{tag}` not found", status=404)
+    etag = f'"{digest}"'
+    if __etag_matches__(request.headers.get('if-none-match'), etag):
+        return HTTPResponse(status=304, headers=__graph_headers__(etag))
+    encoding = compression.negotiate(
+        request.headers.get('accept-encoding', ''), GRAPH_ENCODINGS)
+    key = (test_id, encoding)
+    entry = GRAPHS.get(key, digest)
+    if entry is None:
+        row = await DB.fetchone(queries.TEST_GRAPH(), {'test': test_id})
+        if row is None:
+            return text(f"Graph of test `{tag}` not found", status=404)
+        loop = asyncio.get_event_loop()
+        body = await loop.run_in_executor(
+            None, __encode_graph__, row['graph'], row['encoding'], encoding)
+        # the catalog may be behind an upload
+        entry = {'body': body, 'etag': f'"{row["hash"]}"'}
+        GRAPHS.put(key, row['hash'], entry)
+    return raw(entry['body'], content_type='application/xml; charset=utf-8',
+               headers=__graph_headers__(entry['etag'], encoding))
     
\ No newline at end of file
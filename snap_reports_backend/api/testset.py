@@ -1,8 +1,9 @@
 """Implement api/testset apis."""
 from sanic import Blueprint
-from sanic.response import json
 
+from serializer import json
 from support import DB
+import queries
 
 testset = Blueprint('api_testset', url_prefix='/testset')
 
@@ -10,7 +11,7 @@ testset = Blueprint('api_testset', url_prefix='/testset')
 @testset.route("/list")
 async def testset_list(_):
     """Retrieve list of testset."""
-    rows = await DB.fetchall("SELECT DISTINCT testset FROM tests")
+    rows = await DB.fetchall(queries.TESTSETS())
     res = []
     for row in rows:
         res.append(row['testset'])
@@ -20,6 +21,5 @@ async def testset_list(_):
 @testset.route("/<name:str>")
 async def testset_test_list(_, name):
     """Retrieve list of tests of a given testset."""
-    rows = await DB.fetchall(
-        f"SELECT * FROM tests WHERE testset='{name}' ORDER BY id")
+    rows = await DB.fetchall(queries.TESTS_BY_TESTSET(), {'testset': name})
     return json({"tests": rows})
@@ -4,11 +4,24 @@ from sanic import Sanic
 from sanic_cors import CORS
 
 from api import api
+import support
+import middleware
 
 def create_app() -> Sanic:
     app = Sanic(name='Reports')
     app.blueprint(api)
     CORS(app)
+    app.register_middleware(middleware.compress_response, 'response')
+
+    @app.listener('before_server_start')
+    async def load_catalog(app, _):
+        await support.CATALOG.load()
+        app.add_task(support.CATALOG.run())
+
+    @app.listener('after_server_stop')
+    async def close_db(*_):
+        await support.DB.close()
+        middleware.EXECUTOR.shutdown(wait=False)
 
     # Production
     if os.getenv('MYSQL_DATABASE') != None:
@@ -0,0 +1,191 @@
+"""
+Response cache versioned by branch watermarks.
+
+Results are appended per job, so the analytics of a docker tag only change
+when a job of that tag receives new results, or when the reference values
+are refreshed. Responses are cached together with a watermark made of the
+last job of the tag, its number of results, the last result of any job of
+the tag (results loaded into older jobs) and the last reference update: a
+cached response is served as long as the watermark did not change.
+
+Entries are evicted in LRU order once the total size of the cached bodies
+exceeds RESPONSE_CACHE_SIZE megabytes.
+
+Identical concurrent requests are coalesced into a single computation.
+With RESPONSE_CACHE_SWR enabled, an outdated entry is served (marked as
+stale) while a single background computation refreshes it.
+"""
+import os
+import asyncio
+import functools
+from collections import OrderedDict
+
+from sanic.response import HTTPResponse
+
+from support import DB, parse_tag, get_tag_id
+import queries
+
+
+class ResponseCache:
+    """
+    LRU cache of responses with a memory cap.
+
+    Parameters:
+    -----------
+     - max_size: maximum size in bytes of the cached bodies
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = OrderedDict()
+        self.stats = {'hits': 0, 'stale': 0, 'misses': 0, 'coalesced': 0,
+                      'evictions': 0}
+
+    def get(self, key, watermark, stale=False):
+        """
+        Return the cached entry of a key.
+
+        Parameters:
+        -----------
+         - key: cache key
+         - watermark: current watermark
+         - stale: also return entries cached with a different watermark
+        """
+        entry = self.entries.get(key)
+        if entry is None or (entry['watermark'] != watermark and not stale):
+            self.stats['misses'] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats['hits' if entry['watermark'] == watermark else 'stale'] += 1
+        return entry
+
+    def put(self, key, watermark, entry):
+        """Store a response snapshot (see `__snapshot__`)."""
+        body = entry['body']
+        if len(body) > self.max_size:
+            return
+        self.discard(key)
+        self.entries[key] = dict(entry, watermark=watermark)
+        self.size += len(body)
+        while self.size > self.max_size:
+            _, entry = self.entries.popitem(last=False)
+            self.size -= len(entry['body'])
+            self.stats['evictions'] += 1
+
+    def discard(self, key):
+        """Remove an entry."""
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry['body'])
+
+    def info(self):
+        """Return cache statistics."""
+        res = dict(self.stats)
+        res['entries'] = len(self.entries)
+        res['size'] = self.size
+        res['max_size'] = self.max_size
+        return res
+
+
+CACHE = ResponseCache(int(float(os.getenv('RESPONSE_CACHE_SIZE', '64')) * 1024 * 1024))
+# encoded GPT graphs, by test and encoding, versioned by the graph hash
+GRAPHS = ResponseCache(int(float(os.getenv('GRAPH_CACHE_SIZE', '16')) * 1024 * 1024))
+STALE_WHILE_REVALIDATE = os.getenv('RESPONSE_CACHE_SWR', '0').lower() in ('1', 'true', 'yes')
+
+# computations in progress, by cache key and watermark
+INFLIGHT = {}
+
+
+async def get_watermark(tag):
+    """
+    Retrieve the watermark of a docker tag.
+
+    Returns:
+    --------
+    tuple of last job ID, number of results of the last job, last result
+    ID of the tag and last reference update
+    """
+    row = await DB.fetchone(queries.BRANCH_WATERMARK(), {
+        'tag': await get_tag_id(tag)})
+    return (row['job'], row['results'], row['result'], row['reference'])
+
+
+def __snapshot__(response):
+    return {
+        'body': response.body or b'',
+        'status': response.status,
+        'content_type': response.content_type,
+        'headers': dict(response.headers),
+    }
+
+
+def __response__(entry, status=None):
+    headers = dict(entry['headers'])
+    if status:
+        headers['X-Cache'] = status
+    return HTTPResponse(entry['body'], status=entry['status'], headers=headers,
+                        content_type=entry['content_type'])
+
+
+def __compute__(key, watermark, handler, request, args, kwargs):
+    """
+    Run a handler once for concurrent identical requests.
+
+    Returns:
+    --------
+    task resolving to the snapshot of the response
+    """
+    flight = (key, watermark)
+    task = INFLIGHT.get(flight)
+    if task is not None:
+        CACHE.stats['coalesced'] += 1
+        return task
+
+    async def run():
+        entry = __snapshot__(await handler(request, *args, **kwargs))
+        if entry['status'] == 200:
+            CACHE.put(key, watermark, entry)
+        return entry
+
+    def done(task):
+        INFLIGHT.pop(flight, None)
+        if not task.cancelled():
+            # retrieve the exception of background refreshes
+            task.exception()
+
+    task = asyncio.ensure_future(run())
+    task.add_done_callback(done)
+    INFLIGHT[flight] = task
+    return task
+
+
+def cached(tag_arg='tag', stale_while_revalidate=None):
+    """
+    Cache the responses of a route handler.
+
+    Parameters:
+    -----------
+     - tag_arg: name of the route argument holding the docker tag
+     - stale_while_revalidate: serve outdated entries while refreshing them
+       (defaults to RESPONSE_CACHE_SWR)
+    """
+    if stale_while_revalidate is None:
+        stale_while_revalidate = STALE_WHILE_REVALIDATE
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request, *args, **kwargs):
+            watermark = await get_watermark(parse_tag(kwargs[tag_arg]))
+            key = (handler.__name__, tuple(sorted(kwargs.items())),
+                   request.query_string)
+            entry = CACHE.get(key, watermark, stale=stale_while_revalidate)
+            if entry is not None:
+                if entry['watermark'] == watermark:
+                    return __response__(entry, 'HIT')
+                __compute__(key, watermark, handler, request, args, kwargs)
+                return __response__(entry, 'STALE')
+            task = __compute__(key, watermark, handler, request, args, kwargs)
+            # a cancelled request must not cancel the coalesced ones
+            return __response__(await asyncio.shield(task))
+        return wrapper
+    return decorator
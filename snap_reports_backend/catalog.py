@@ -0,0 +1,119 @@
+"""
+In-memory catalog of docker tags, result tags, tests and graph hashes.
+
+The lookup tables are small and change rarely, so they are loaded at
+startup and fully reloaded periodically (every CATALOG_REFRESH seconds) or
+when a name is not found, which lets queries use plain integer IDs instead
+of name subqueries. Reloads replace the whole catalog, so renamed or
+deleted entries do not survive a refresh.
+"""
+import asyncio
+import time
+
+import queries
+
+
+class Catalog:
+    """
+    Catalog of the lookup tables.
+
+    Parameters:
+    -----------
+     - db: database interface
+     - refresh_interval: seconds between periodic reloads
+     - miss_interval: minimum seconds between reloads caused by unknown
+       names
+    """
+    def __init__(self, db, refresh_interval=60, miss_interval=5):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.miss_interval = miss_interval
+        self.loaded = 0
+        self.tags = {}
+        self.tag_ids = {}
+        self.results = {}
+        self.result_ids = {}
+        self.tests = {}
+        self.test_ids = {}
+        self.graphs = {}
+        self._lock = None
+
+    async def load(self, table=None, key=None):
+        """
+        Reload the whole catalog.
+
+        When reloading because `key` is missing from `table`, the reload is
+        skipped if a concurrent one already loaded the key or just ran.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if table is not None and (
+                    key in getattr(self, table) or
+                    time.monotonic() - self.loaded <= self.miss_interval):
+                return
+            tags = await self.db.fetchall(queries.DOCKER_TAGS())
+            results = await self.db.fetchall(queries.RESULT_TAGS())
+            tests = await self.db.fetchall(queries.TEST_NAMES())
+            graphs = await self.db.fetchall(queries.GRAPH_HASHES())
+            self.tags = {row['ID']: row for row in tags}
+            self.tag_ids = {row['name']: row['ID'] for row in tags}
+            self.results = {row['ID']: row for row in results}
+            self.result_ids = {row['tag']: row['ID'] for row in results}
+            self.tests = {row['ID']: row['name'] for row in tests}
+            self.test_ids = {row['name']: row['ID'] for row in tests}
+            self.graphs = {row['test']: row['hash'] for row in graphs}
+            self.loaded = time.monotonic()
+
+    async def refresh(self, force=False):
+        """Reload the catalog if forced or if outdated."""
+        if force or time.monotonic() - self.loaded > self.refresh_interval:
+            await self.load()
+
+    async def run(self):
+        """Periodically reload the catalog (to be run as background task)."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as error:  # pylint: disable=broad-except
+                print(f'Catalog refresh failed: {error}')
+
+    async def __lookup__(self, table, key):
+        if key not in getattr(self, table) and \
+                time.monotonic() - self.loaded > self.miss_interval:
+            await self.load(table, key)
+        return getattr(self, table).get(key)
+
+    async def docker_tag_id(self, name):
+        """Resolve a docker tag name."""
+        return await self.__lookup__('tag_ids', name)
+
+    async def docker_tag(self, tag_id):
+        """Retrieve a docker tag object (ID and name)."""
+        return await self.__lookup__('tags', tag_id)
+
+    async def result_id(self, tag):
+        """Resolve a result tag (e.g. `SUCCESS`)."""
+        return await self.__lookup__('result_ids', tag)
+
+    async def result(self, res_id):
+        """Retrieve a result tag object (ID and tag)."""
+        return await self.__lookup__('results', res_id)
+
+    async def test_id(self, name):
+        """Resolve a test name."""
+        return await self.__lookup__('test_ids', name)
+
+    async def test_name(self, test_id):
+        """Retrieve the name of a test."""
+        return await self.__lookup__('tests', test_id)
+
+    async def graph_hash(self, test_id):
+        """
+        Retrieve the hash of the graph of a test.
+
+        Most tests have no graph, so misses do not reload the catalog: new
+        graphs are found by the periodic reload.
+        """
+        return self.graphs.get(test_id)
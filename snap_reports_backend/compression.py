@@ -0,0 +1,154 @@
+"""
+Compression codecs for stored payloads.
+
+Payloads are tagged with the name of their encoding, using the HTTP
+content-coding names so that they can be sent as is to clients accepting
+them. `zstd` requires the optional `zstandard` package and `br` the
+optional `brotli` package.
+"""
+import gzip
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IDENTITY = 'identity'
+GZIP = 'gzip'
+ZSTD = 'zstd'
+BROTLI = 'br'
+
+CHUNK_SIZE = 64 * 1024
+
+
+def available():
+    """Return the list of supported encodings."""
+    res = [IDENTITY, GZIP]
+    if zstandard is not None:
+        res.append(ZSTD)
+    if brotli is not None:
+        res.append(BROTLI)
+    return res
+
+
+def __check__(encoding):
+    if encoding not in available():
+        raise ValueError(f'Encoding `{encoding}` not supported')
+
+
+def __qvalue__(params):
+    params = params.replace(' ', '')
+    if not params.startswith('q='):
+        return 1.0
+    try:
+        return float(params[2:])
+    except ValueError:
+        return 0.0
+
+
+def accepts(header, encoding):
+    """
+    Check if an `Accept-Encoding` header accepts an encoding.
+
+    An encoding listed in the header is accepted unless its `q` is 0, the
+    others follow the `*` wildcard if any. Identity is accepted unless
+    excluded (`identity;q=0`, or `*;q=0` without identity).
+
+    Parameters:
+    -----------
+     - header: value of the Accept-Encoding header
+     - encoding: content-coding name
+    """
+    wildcard = None
+    for item in (header or '').split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if name == encoding:
+            return __qvalue__(params) > 0
+        if name == '*':
+            wildcard = __qvalue__(params)
+    if wildcard is not None:
+        return wildcard > 0
+    return encoding == IDENTITY
+
+
+def negotiate(header, encodings):
+    """
+    Choose the encoding of a response.
+
+    Parameters:
+    -----------
+     - header: value of the Accept-Encoding header
+     - encodings: candidate encodings, by order of preference
+
+    Returns:
+    --------
+    first available candidate accepted by the header, identity if none
+    (even if the header excludes it, the response is then not encoded)
+    """
+    supported = available()
+    for encoding in encodings:
+        if encoding in supported and header and accepts(header, encoding):
+            return encoding
+    return IDENTITY
+
+
+def compress(data, encoding, level=None):
+    """
+    Compress a payload.
+
+    Parameters:
+    -----------
+     - data: bytes to compress
+     - encoding: target encoding
+     - level: compression level (codec default if None)
+    """
+    __check__(encoding)
+    if encoding == GZIP:
+        return gzip.compress(data, compresslevel=6 if level is None else level)
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+    if encoding == BROTLI:
+        return brotli.compress(data, quality=5 if level is None else level)
+    return data
+
+
+def decompress(data, encoding):
+    """Decompress a whole payload."""
+    return b''.join(stream(data, encoding))
+
+
+def stream(data, encoding, chunk_size=CHUNK_SIZE):
+    """
+    Decompress a payload incrementally.
+
+    Yields:
+    -------
+    chunks of decompressed bytes
+    """
+    __check__(encoding)
+    if encoding == IDENTITY:
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+        return
+    if encoding == GZIP:
+        decoder = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        decompress = decoder.decompress
+    elif encoding == BROTLI:
+        decompress = brotli.Decompressor().process
+    else:
+        decompress = zstandard.ZstdDecompressor().decompressobj().decompress
+    for i in range(0, len(data), chunk_size):
+        chunk = decompress(data[i:i + chunk_size])
+        if chunk:
+            yield chunk
+    if encoding == GZIP:
+        chunk = decoder.flush()
+        if chunk:
+            yield chunk
@@ -5,8 +5,8 @@ import os
 import sys
 import sqlite3
 import asyncio
+import contextlib
 import aiomysql
-import decimal
 from dotenv import load_dotenv
 
 class SQLiteInterface:
@@ -51,83 +51,146 @@ class SQLiteInterface:
 
 
 def r2d(row, desc):
-    """Convert row to dictionary."""
+    """
+    Convert row to dictionary.
+
+    Values are kept as returned by the driver, they are converted by the
+    JSON serializer (see serializer.py).
+    """
     if row is None:
         return None
-    res = {}
-    for i, col in enumerate(desc):
-        key = str(col[0])
-        res[key] = v2v(row[i])
-    return res
+    return {str(col[0]): value for col, value in zip(desc, row)}
 
-def a2v(xs):
-    """Convert array to value."""
-    return [v2v(x) for x in xs]
 
-def v2v(x):
-    """Convert value to value."""
-    if x is None:
-        return None
-    tx = type(x)
-    if tx == list:
-        return a2v(x)
-    if tx == dict:
-        return d2v(x)
-    if tx == decimal.Decimal:
-        return float(x)
-    if tx == bytes:
-        return x.decode('utf-8')
-    if tx in (str, int, float):
-        return x
-    return str(x)
+IntegrityError = aiomysql.IntegrityError
+
+
+async def __acquire__(pool):
+    return await pool.acquire()
 
 
 class MySQLInterfce:
-    """MySQL interface."""
-    def __init__(self, dbname):
+    """
+    MySQL interface backed by a managed aiomysql connection pool.
+
+    Parameters:
+    -----------
+     - dbname: connection string `user:password@host:port/db`
+     - minsize: minimum number of pooled connections
+     - maxsize: maximum number of pooled connections
+     - recycle: seconds after which an idle connection is reopened
+     - ping_interval: seconds of inactivity after which a connection is
+       pinged (and reconnected if needed) before being handed out
+     - acquire_timeout: seconds to wait for a free connection
+    """
+    def __init__(self, dbname, minsize=1, maxsize=10, recycle=3600,
+                 ping_interval=30, acquire_timeout=10):
         self.user, self.password = dbname.split('@')[0].split(':')
         self.db_name = dbname.split('@')[1].split('/')[1]
         self.host, self.port = dbname.split('@')[1].split('/')[0].split(':')
         self.port = int(self.port)
-        self.connection = None
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self.acquire_timeout = acquire_timeout
+        self.pool = None
+        self._lock = None
+        self._stats = {
+            'acquired': 0,
+            'waited': 0,
+            'timeouts': 0,
+            'pings': 0,
+            'in_use': 0,
+            'max_in_use': 0,
+            'wait_time': 0.0,
+        }
 
     async def open(self):
+        """Return the connection pool, creating it on first use."""
+        if self.pool is not None:
+            return self.pool
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.pool is None:
+                # autocommit is required: pooled connections are reused and
+                # would otherwise keep reading from a stale REPEATABLE READ
+                # snapshot.
+                self.pool = await aiomysql.create_pool(
+                    host=self.host, port=self.port,
+                    user=self.user, password=self.password,
+                    db=self.db_name, minsize=self.minsize,
+                    maxsize=self.maxsize, pool_recycle=self.recycle,
+                    autocommit=True)
+        return self.pool
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        """Acquire a pooled connection, releasing it on exit."""
+        pool = await self.open()
         loop = asyncio.get_event_loop()
-        return await aiomysql.connect(host=self.host, port=self.port,
-                                    user=self.user, password=self.password,
-                                    db=self.db_name, loop=loop)
+        if pool.freesize == 0 and pool.size >= pool.maxsize:
+            self._stats['waited'] += 1
+        begin = loop.time()
+        try:
+            conn = await asyncio.wait_for(__acquire__(pool),
+                                          self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._stats['timeouts'] += 1
+            raise
+        self._stats['wait_time'] += loop.time() - begin
+        self._stats['acquired'] += 1
+        self._stats['in_use'] += 1
+        self._stats['max_in_use'] = max(self._stats['max_in_use'],
+                                         self._stats['in_use'])
+        try:
+            if loop.time() - conn.last_usage > self.ping_interval:
+                self._stats['pings'] += 1
+                await conn.ping(reconnect=True)
+            yield conn
+        finally:
+            self._stats['in_use'] -= 1
+            pool.release(conn)
+
+    @contextlib.asynccontextmanager
+    async def cursor(self):
+        """Open a cursor on a pooled connection."""
+        async with self.acquire() as conn:
+            async with conn.cursor() as cursor:
+                yield cursor
 
     async def execute(self, query, *args):
         """Execute query."""
-        async with conn.cursor() as cursor:
+        async with self.cursor() as cursor:
             await cursor.execute(query, *args)
 
     async def fetchall(self, query, *args):
         """Fetch all rows of a query."""
-        conn = await self.open()
-        res = []   
-        async with conn.cursor() as cursor:
-            await cursor.execute(query, *args)
-            desc = cursor.description
-            rows = await cursor.fetchall()
-            for row in rows:
-                res.append(r2d(row, desc))        
-        return res
+        async with self.cursor() as cursor:
+            return await fetchall(cursor, query, *args)
 
     async def fetchone(self, query, *args):
         """Fetch one row of a query."""
-        conn = await self.open()
-        obj = None
-        async with conn.cursor() as cursor:            
-            await cursor.execute(query, *args)
-            desc = cursor.description
-            row = await cursor.fetchone()
-            obj = r2d(row, desc)
-        return obj
+        async with self.cursor() as cursor:
+            return await fetchone(cursor, query, *args)
+
+    def stats(self):
+        """Return pool saturation statistics."""
+        res = dict(self._stats)
+        res['minsize'] = self.minsize
+        res['maxsize'] = self.maxsize
+        res['size'] = self.pool.size if self.pool else 0
+        res['free'] = self.pool.freesize if self.pool else 0
+        return res
+
+    async def close(self):
+        """Close the pool and all its connections."""
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
 
-    def __del__(self):
-        if self.connection:
-            self.connection.close()
 
 async def fetchone(cursor, query, *args):
     await cursor.execute(query, *args)
@@ -148,6 +211,16 @@ async def fetchall(cursor, query, *args):
 async def execute(cursor, query, *args):
     await cursor.execute(query, *args)
 
+def __pool_settings__():
+    return {
+        'minsize': int(os.getenv('DB_POOL_MINSIZE', '1')),
+        'maxsize': int(os.getenv('DB_POOL_MAXSIZE', '10')),
+        'recycle': int(os.getenv('DB_POOL_RECYCLE', '3600')),
+        'ping_interval': float(os.getenv('DB_POOL_PING_INTERVAL', '30')),
+        'acquire_timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    }
+
+
 def get_interface(mode, name):
     """Return correct DB interface given the current configuration."""
     mode = mode.upper()
@@ -155,7 +228,7 @@ def get_interface(mode, name):
         print('Deprcated')
         return None
     if mode == 'MYSQL':
-        return MySQLInterfce(name)
+        return MySQLInterfce(name, **__pool_settings__())
     print(f'Mode `{mode}` not supported')
     return None
 
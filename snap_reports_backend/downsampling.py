@@ -0,0 +1,167 @@
+"""
+Downsampling of the raw_data time series.
+
+The first column of a profile is used as time axis, every other column is
+a series. Peak preserving methods (`lttb`, `minmax`) select original rows,
+`mean` averages the rows of each bucket and formats them as text when the
+rows are parsed CSV text, so that every method returns the same row type.
+"""
+import numpy as np
+
+METHODS = ('lttb', 'minmax', 'mean')
+# budget adjustments to fill the merged selection of several series
+REFINE_STEPS = 4
+
+
+def __buckets__(size, num):
+    """Return the start index of `num` (almost) equal buckets over `size`."""
+    return np.unique(np.linspace(0, size, num + 1).astype(int)[:-1])
+
+
+def lttb_indices(x, y, num):
+    """
+    Largest-Triangle-Three-Buckets selection of a series.
+
+    Parameters:
+    -----------
+     - x: time values
+     - y: series values
+     - num: number of points to keep (at least 3)
+
+    Returns:
+    --------
+    sorted indices of the selected points
+    """
+    size = len(x)
+    if num >= size or num < 3:
+        return np.arange(size)
+    # first and last points are always kept, the others are bucketed
+    starts = __buckets__(size - 2, num - 2) + 1
+    ends = np.append(starts[1:], size - 1)
+    res = np.empty(len(starts) + 2, dtype=int)
+    res[0] = 0
+    res[-1] = size - 1
+    prev = 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        if i + 1 < len(starts):
+            next_x = x[ends[i]:ends[i + 1]].mean()
+            next_y = y[ends[i]:ends[i + 1]].mean()
+        else:
+            next_x = x[-1]
+            next_y = y[-1]
+        area = np.abs((x[prev] - next_x) * (y[start:end] - y[prev]) -
+                      (x[prev] - x[start:end]) * (next_y - y[prev]))
+        prev = start + int(np.argmax(area))
+        res[i + 1] = prev
+    return res
+
+
+def minmax_indices(y, num):
+    """
+    Select the minimum and the maximum of each bucket of a series.
+
+    Parameters:
+    -----------
+     - y: series values
+     - num: number of points to keep, first and last included
+
+    Returns:
+    --------
+    sorted indices of the selected points
+    """
+    size = len(y)
+    if num >= size:
+        return np.arange(size)
+    bucket = np.zeros(size, dtype=int)
+    bucket[__buckets__(size, max((num - 2) // 2, 1))[1:]] = 1
+    bucket = np.cumsum(bucket)
+    order = np.lexsort((y, bucket))
+    first = np.flatnonzero(np.diff(bucket[order], prepend=-1) != 0)
+    last = np.append(first[1:], size) - 1
+    return np.unique(np.concatenate(([0, size - 1], order[first], order[last])))
+
+
+def mean_buckets(data, num):
+    """Average the rows of `num` equal buckets of a 2D array."""
+    if num >= len(data):
+        return data
+    starts = __buckets__(len(data), num)
+    sizes = np.diff(np.append(starts, len(data)))
+    return np.add.reduceat(data, starts, axis=0) / sizes[:, None]
+
+
+def __text_rows__(data):
+    """Format rows of numbers like parsed CSV rows."""
+    return [[np.format_float_positional(value, trim='-') for value in row]
+            for row in data]
+
+
+def __select__(data, num, method):
+    """Merge the selections of `num` points of every series."""
+    selected = []
+    for col in range(1, data.shape[1]):
+        if method == 'lttb':
+            selected.append(lttb_indices(data[:, 0], data[:, col], num))
+        else:
+            selected.append(minmax_indices(data[:, col], num))
+    return np.unique(np.concatenate(selected))
+
+
+def __trim__(indices, num):
+    """Keep `num` evenly spaced indices, first and last included."""
+    if len(indices) <= num:
+        return indices
+    return indices[np.unique(np.linspace(0, len(indices) - 1, num).astype(int))]
+
+
+def downsample(rows, num, method='lttb'):
+    """
+    Downsample the rows of a profile.
+
+    Parameters:
+    -----------
+     - rows: list of parsed CSV rows (first column is the time axis)
+     - num: maximum number of rows to return
+     - method: one of METHODS
+
+    Returns:
+    --------
+    list of rows of the same type as the input ones, unchanged if the
+    profile is not numeric or already small enough
+    """
+    if method not in METHODS:
+        raise ValueError(f'Method `{method}` not supported')
+    if len(rows) <= num:
+        return rows
+    try:
+        data = np.array(rows, dtype=float)
+    except ValueError:
+        return rows
+    if data.ndim != 2 or data.shape[1] < 2:
+        return rows
+    if method == 'mean':
+        means = mean_buckets(data, num)
+        if isinstance(rows[0][0], str):
+            return __text_rows__(means)
+        return means.tolist()
+    # the budget is shared among the series, whose selections all contain
+    # the first and last rows and overlap once merged
+    nseries = data.shape[1] - 1
+    low = max((num - 2) // nseries + 2, 3)
+    selected = __select__(data, low, method)
+    high = None
+    for _ in range(REFINE_STEPS):
+        if len(selected) >= num:
+            break
+        if high is None:
+            budget = int(low * num / len(selected))
+        else:
+            budget = (low + high) // 2
+        if budget <= low:
+            break
+        candidate = __select__(data, budget, method)
+        if len(candidate) > num:
+            high = budget
+        else:
+            low, selected = budget, candidate
+    return [rows[i] for i in __trim__(selected, num)]
@@ -0,0 +1,129 @@
+"""
+Parsing and validation of the jobs posted to `/api/job`.
+
+A job is posted either as a JSON object, `{"job": {...}, "results": [...]}`,
+or as NDJSON (`application/x-ndjson`) whose first line is the job and every
+following line a result. Both can be gzip compressed.
+
+Job keys are those of the `jobs` table, with `dockerTag` and `result` given
+by name. Result keys are `test` (name or ID), `result` (tag name), `start`,
+every field of the rollup and optionally the `raw_data` CSV profile and the
+`output` of the test.
+"""
+import hmac
+import json
+import os
+import zlib
+from datetime import datetime
+
+import compression
+import rollup
+
+TOKEN = os.getenv('INGEST_TOKEN')
+
+NDJSON = 'application/x-ndjson'
+GZIP_MAGIC = b'\x1f\x8b'
+
+JOB_KEYS = ('branch', 'jobnum', 'dockerTag', 'testScope', 'timestamp_start',
+            'timestamp_end', 'result')
+RESULT_KEYS = ('test', 'result', 'start') + tuple(rollup.FIELDS)
+DATE_KEYS = ('timestamp_start', 'timestamp_end', 'start')
+INT_KEYS = ('jobnum',) + tuple(rollup.FIELDS)
+
+
+class PayloadError(ValueError):
+    """Invalid job payload."""
+
+
+def authorized(header):
+    """Check the `Authorization: Bearer <INGEST_TOKEN>` header."""
+    if not TOKEN or not header:
+        return False
+    scheme, _, token = header.partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip(), TOKEN)
+
+
+def __check__(obj, keys, what):
+    if not isinstance(obj, dict):
+        raise PayloadError(f'{what} must be an object')
+    missing = [key for key in keys if obj.get(key) is None]
+    if missing:
+        raise PayloadError(f'{what} misses {", ".join(missing)}')
+    res = dict(obj)
+    for key in keys:
+        try:
+            if key in DATE_KEYS:
+                res[key] = datetime.fromisoformat(str(obj[key]))
+            elif key in INT_KEYS:
+                res[key] = int(obj[key])
+        except (TypeError, ValueError):
+            raise PayloadError(f'{what}: `{key}` is not valid') from None
+    return res
+
+
+def __test__(test, what):
+    """Normalize the test of a result, so that `5` and `"5"` are the same."""
+    if isinstance(test, bool) or not isinstance(test, (str, int)):
+        raise PayloadError(f'{what}: `test` is not valid')
+    return str(test)
+
+
+def validate(job, results):
+    """
+    Validate a job and its results.
+
+    Returns:
+    --------
+    normalized copies of the job and of its results (dates and numbers
+    converted, tests as text)
+
+    Raises PayloadError if the payload is not valid.
+    """
+    job = __check__(job, JOB_KEYS, 'job')
+    if not isinstance(results, list) or not results:
+        raise PayloadError('results must be a non empty list')
+    res = []
+    tests = set()
+    for i, result in enumerate(results):
+        result = __check__(result, RESULT_KEYS, f'result {i}')
+        result['test'] = __test__(result['test'], f'result {i}')
+        if result['test'] in tests:
+            raise PayloadError(f'result {i}: duplicated test `{result["test"]}`')
+        tests.add(result['test'])
+        res.append(result)
+    return job, res
+
+
+def parse(body, content_type=None):
+    """
+    Decode a posted job.
+
+    Parameters:
+    -----------
+     - body: request body, optionally gzip compressed
+     - content_type: request content type
+
+    Returns:
+    --------
+    validated job and results (see validate)
+    """
+    if body[:2] == GZIP_MAGIC:
+        try:
+            body = compression.decompress(body, compression.GZIP)
+        except zlib.error:
+            raise PayloadError('corrupted gzip body') from None
+    ndjson = bool(content_type) and content_type.split(';')[0].strip() == NDJSON
+    try:
+        if ndjson:
+            lines = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            obj = json.loads(body)
+    except ValueError as error:
+        raise PayloadError(f'malformed body: {error}') from None
+    if ndjson:
+        if not lines:
+            raise PayloadError('empty body')
+        return validate(lines[0], lines[1:])
+    if not isinstance(obj, dict):
+        raise PayloadError('body must be an object')
+    return validate(obj.get('job'), obj.get('results'))
@@ -0,0 +1,77 @@
+"""
+Compression of the responses.
+
+Responses of at least COMPRESSION_THRESHOLD bytes are compressed with the
+preferred encoding accepted by the client (`zstd` and `br` when their
+optional packages are installed, then `gzip`) at COMPRESSION_LEVEL, clamped
+to the range of each codec (codec default if unset). Bodies of at least COMPRESSION_OFFLOAD bytes are
+compressed in a pool of COMPRESSION_WORKERS threads, so that large
+responses do not block the event loop. Responses already encoded (e.g.
+stored profiles and graphs) are sent as is.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import compression
+
+THRESHOLD = int(os.getenv('COMPRESSION_THRESHOLD', '1024'))
+LEVEL = int(os.getenv('COMPRESSION_LEVEL')) if os.getenv('COMPRESSION_LEVEL') else None
+OFFLOAD = int(os.getenv('COMPRESSION_OFFLOAD', str(256 * 1024)))
+WORKERS = int(os.getenv('COMPRESSION_WORKERS', '2'))
+
+# encodings of the responses, by order of preference
+ENCODINGS = (compression.ZSTD, compression.BROTLI, compression.GZIP)
+COMPRESSIBLE = ('application/json', 'application/xml', 'text/')
+
+# valid levels of each codec
+LEVEL_RANGES = {
+    compression.GZIP: (1, 9),
+    compression.ZSTD: (1, 22),
+    compression.BROTLI: (0, 11),
+}
+
+EXECUTOR = ThreadPoolExecutor(max_workers=WORKERS,
+                              thread_name_prefix='compression')
+
+
+def __level__(encoding):
+    """Level of a codec, COMPRESSION_LEVEL clamped to its range."""
+    if LEVEL is None:
+        return None
+    low, high = LEVEL_RANGES[encoding]
+    return min(max(LEVEL, low), high)
+
+
+def __vary__(response):
+    """Add `Accept-Encoding` to the `Vary` header of a response."""
+    vary = response.headers.get('vary')
+    if not vary:
+        response.headers['Vary'] = 'Accept-Encoding'
+        return
+    fields = [field.strip().lower() for field in vary.split(',')]
+    if '*' not in fields and 'accept-encoding' not in fields:
+        response.headers['Vary'] = f'{vary}, Accept-Encoding'
+
+
+async def compress_response(request, response):
+    """Compress a response (response middleware)."""
+    body = getattr(response, 'body', None)
+    if not body or len(body) < THRESHOLD or \
+            'content-encoding' in response.headers or \
+            not (response.content_type or '').startswith(COMPRESSIBLE):
+        return
+    __vary__(response)
+    encoding = compression.negotiate(
+        request.headers.get('accept-encoding', ''), ENCODINGS)
+    if encoding == compression.IDENTITY:
+        return
+    if len(body) >= OFFLOAD:
+        loop = asyncio.get_event_loop()
+        body = await loop.run_in_executor(
+            EXECUTOR, compression.compress, body, encoding, __level__(encoding))
+    else:
+        body = compression.compress(body, encoding, __level__(encoding))
+    response.body = body
+    response.headers['Content-Encoding'] = encoding
+    response.headers.pop('content-length', None)
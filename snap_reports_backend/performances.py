@@ -6,19 +6,22 @@ email: martino.ferrari@c-s.fr
 """
 import os
 import statistics
-from sanic.response import text, json
+import numpy as np
+from sanic.response import text
 
 from datetime import datetime
 
-from support import DB
+from support import DB, CATALOG, get_tag_id, get_success_id
 import dbfactory
+from serializer import json
+import queries
+import rollup
+import rolling
 
 CWD = os.path.abspath(os.getcwd())
 
 
-FIELDS = ["duration", "cpu_time", "cpu_usage_avg", "cpu_usage_max",
-          "memory_avg", "memory_max", "io_read", "io_write", "threads_avg",
-          "threads_max"]
+FIELDS = rollup.FIELDS
 
 
 def __parse_results__(rows):
@@ -98,45 +101,26 @@ async def test_summary(test_id, tag=None):
     """Get test summary."""
     if test_id is None:
         return text("Test not found", status=404)
-    query = f"""
-    SELECT
-        result, duration, cpu_time, cpu_usage_avg, memory_avg, memory_max,
-        io_write, io_read, threads_avg
-    FROM results
-    WHERE test={test_id}
-    """
     if tag is not None:
-        query += f"""
-        AND job IN
-            (SELECT ID FROM jobs WHERE dockerTag =
-                (SELECT ID FROM dockerTags WHERE name='{tag}'));"""
-    rows = await DB.fetchall(query)
+        rows = await DB.fetchall(queries.BRANCH_TEST_SUMMARY(), {
+            'test': test_id, 'tag': await get_tag_id(tag)})
+    else:
+        rows = await DB.fetchall(queries.TEST_SUMMARY(), {'test': test_id})
     if not rows:
         return text("No rows found", status=500)
     return __parse_results__(rows)
 
 
 async def __get_test_name__(test_id):
-    row = await DB.fetchone(f"""
-        SELECT name
-        FROM tests
-        WHERE id = '{test_id}';
-    """)
-    if not row:
-        return None
-    return row['name']
+    return await CATALOG.test_name(test_id)
 
 
 async def __get_reference__(test_id, field, cursor=None):
-    query = f"""
-            SELECT {field}
-            FROM reference_values
-            WHERE test={test_id}
-        """
     if cursor:
-        row = await dbfactory.fetchone(cursor, query)
+        row = await dbfactory.fetchone(cursor, queries.TEST_REFERENCE(),
+                                       {'test': test_id})
     else:
-        row = await DB.fetchone(query)
+        row = await get_test_reference(test_id)
     if not row:
         return None
     return row[field]
@@ -144,13 +128,7 @@ async def __get_reference__(test_id, field, cursor=None):
 
 async def get_test_reference(test_id):
     """Get test references values."""
-    row = await DB.fetchone(f"""
-            SELECT
-                updated, duration, cpu_time, cpu_usage_avg, memory_avg,
-                memory_max, io_write, io_read, threads_avg
-            FROM reference_values
-            WHERE test={test_id}
-        """)
+    row = await DB.fetchone(queries.TEST_REFERENCE(), {'test': test_id})
     return row
 
 
@@ -165,28 +143,20 @@ async def test_reference(test_id):
 
 
 async def __history__(test_id, tag, field, last_n, cursor=None):
+    params = {
+        'test': test_id,
+        'success': await get_success_id(),
+        'limit': queries.NO_LIMIT if last_n is None else last_n
+    }
     if tag.lower() != 'any':
-        query = f"""
-            SELECT start, {field}
-            FROM results
-            WHERE test = '{test_id}' AND result = '1'
-            AND job IN (SELECT id FROM jobs WHERE dockerTag =
-                (SELECT id FROM dockerTags WHERE name='{tag}'))
-            ORDER BY start DESC
-            """
+        params['tag'] = await get_tag_id(tag)
+        query = queries.BRANCH_TEST_HISTORY(field=field)
     else:
-        query = f"""
-            SELECT start, {field}
-            FROM results
-            WHERE test = '{test_id}' AND result = '1'
-            ORDER BY start DESC
-            """
-    if last_n is not None:
-        query += f" LIMIT {last_n}"
+        query = queries.TEST_HISTORY(field=field)
     if cursor:
-        rows = await dbfactory.fetchall(cursor, query)
+        rows = await dbfactory.fetchall(cursor, query, params)
     else:
-        rows = await DB.fetchall(query)
+        rows = await DB.fetchall(query, params)
     value = []
     date = []
     for row in rows:
@@ -200,15 +170,26 @@ async def __history_mean_value__(test_id, tag, field, last_n):
     return statistics.mean(value)
 
 
-async def __history_moving_avg__(test_id, tag, field, last_n, window):
+def __moving_average__(dates, values, window, mode):
+    """
+    Compute the moving average of a history.
+
+    Histories are ordered from the most recent value, the result keeps the
+    same order. Dates are averaged over each window.
+    """
+    dates = np.array([
+        (x if isinstance(x, datetime) else datetime.fromisoformat(x)).timestamp()
+        for x in dates])
+    values = np.array(values, dtype=float)
+    sub_x = rolling.rolling_mean(dates[::-1], window)[::-1]
+    sub_y = rolling.rolling(values[::-1], window, mode)[::-1]
+    sub_x = [datetime.fromtimestamp(x).strftime('%Y-%m-%d %H:%M:%S') for x in sub_x]
+    return sub_x, sub_y.tolist()
+
+
+async def __history_moving_avg__(test_id, tag, field, last_n, window, mode):
     date, value = await __history__(test_id, tag, field, last_n)
-    date = [datetime.fromisoformat(x).timestamp() for x in date]
-    sub_x = []
-    sub_y = []
-    for i in range(window, len(date)):
-        sub_x.append(statistics.mean(date[i-window:i]))
-        sub_y.append(statistics.mean(value[i-window:i]))
-    return sub_x, sub_y
+    return __moving_average__(date, value, window, mode)
 
 
 async def history(test_id, tag, field, last_n=None, cursor=None):
@@ -224,15 +205,17 @@ async def history(test_id, tag, field, last_n=None, cursor=None):
     })
 
 
-async def history_ma(test_id, tag, field, num, last_n=None):
-    """Retrive the historic values of a specific field of a given test."""
+async def history_ma(test_id, tag, field, num, last_n=None, mode='simple'):
+    """Retrive the moving average of a specific field of a given test."""
     field = field.lower()
     if field not in FIELDS:
         return text("Field not valid", status=500)
+    if mode not in rolling.MODES:
+        return text("Mode not valid", status=500)
 
-    date, value = await __history_moving_avg__(test_id, tag, field, last_n, num)
+    date, value = await __history_moving_avg__(test_id, tag, field, last_n, num, mode)
     return json({
-        'date':  [datetime.fromtimestamp(x).strftime('%Y-%m-%d %H:%M:%S') for x in date],
+        'date': date,
         'value': value
     })
 
@@ -272,6 +255,61 @@ async def get_status_fulldata_dict(test_id, tag, cursor=None):
     return res
 
 
+STATUS_FIELDS = queries.STATUS_FIELDS
+
+
+async def get_branch_status_fulldata(tag, window=10):
+    """
+    Get the status of every test of a branch at once.
+
+    The histories of all the tests are scanned by a single query that
+    returns, for each test, the `window` most recent executions together
+    with the number and the sum of all its executions. The per-test
+    statistics are then computed with grouped NumPy operations.
+
+    Parameters:
+    -----------
+     - tag: docker tag name
+     - window: number of recent executions used for the `last10` value
+
+    Returns:
+    --------
+    dictionary with the test ids and, for each key of STATUS_FIELDS, the
+    arrays of `last`, `last10`, `average` and `reference` values
+    """
+    columns = list(STATUS_FIELDS.values())
+    params = {
+        'tag': await get_tag_id(tag),
+        'success': await get_success_id(),
+        'window': int(window)
+    }
+    async with DB.cursor() as cursor:
+        await cursor.execute(queries.BRANCH_STATUS(), params)
+        rows = await cursor.fetchall()
+
+    ncol = len(columns)
+    data = np.array(rows, dtype=float).reshape(-1, 2 + 3 * ncol)
+    tests = data[:, 0]
+    # index of the first (most recent) row of each test group
+    first = np.flatnonzero(np.diff(tests, prepend=np.nan) != 0)
+    sizes = np.diff(np.append(first, len(tests)))
+    executions = data[first, 1]
+    res = {
+        'tests': tests[first].astype(int),
+        'executions': executions.astype(int)
+    }
+    for i, key in enumerate(STATUS_FIELDS):
+        values = data[:, 2 + i]
+        window_sum = np.add.reduceat(values, first) if len(first) else values[first]
+        res[key] = {
+            'last': values[first],
+            'last10': window_sum / sizes,
+            'average': data[first, 2 + ncol + i] / executions,
+            'reference': data[first, 2 + 2 * ncol + i]
+        }
+    return res
+
+
 async def get_status_dict(test_id, tag, cursor=None):
     """Get branch test status."""
     res = await get_status_fulldata_dict(test_id, tag, cursor=cursor)
@@ -295,71 +333,42 @@ async def get_status(test_id, tag):
     return json(res)
 
 
-async def get_branch_scheduled_field_history(tag, field):
-    """Get history of a field for a branch, realative to reference."""
+async def __branch_field_history__(tag, field, scheduled):
     if field not in FIELDS:
         return None
-    query = f"""
-    SELECT jobs.timestamp_start AS time, (100 - 100 * AVG(results.{field})/AVG(reference_values.{field})) AS value
-    FROM results
-    INNER JOIN reference_values ON reference_values.test = results.test
-    INNER JOIN jobs ON jobs.ID = results.job
-    WHERE jobs.dockerTag = (SELECT ID FROM dockerTags WHERE name='{tag}') 
-        AND results.result = (SELECT ID FROM resultTags WHERE tag='SUCCESS')
-        AND (jobs.testScope = 'DAILY' OR jobs.testScope = 'WEEKLY') 
-    GROUP BY jobs.ID
-    ORDER BY jobs.timestamp_start DESC;
-    """
-    stats = await DB.fetchall(query)
+    query = queries.BRANCH_HISTORY(
+        field=field, scope='scheduled' if scheduled else 'all')
+    stats = await DB.fetchall(query, {
+        'tag': await get_tag_id(tag),
+        'success': await get_success_id()
+    })
     timestamp = [x['time'] for x in stats]
     values = [x['value'] for x in stats]
     return timestamp, values
 
 
-async def get_branch_scheduled_field_history_moving_average(tag, field, window):
+async def get_branch_scheduled_field_history(tag, field):
+    """Get history of a field for a branch, realative to reference."""
+    return await __branch_field_history__(tag, field, scheduled=True)
+
+
+async def get_branch_scheduled_field_history_moving_average(tag, field, window, mode='simple'):
+    """Get moving average of the history of a field for a branch."""
     res = await get_branch_scheduled_field_history(tag, field)
     if res is None:
         return None
     dates, values = res
-    dates = [datetime.fromisoformat(x).timestamp() for x in dates]
-    sub_x = []
-    sub_y = []
-    for i in range(window, len(dates)):
-        sub_x.append(statistics.mean(dates[i-window:i]))
-        sub_y.append(statistics.mean(values[i-window:i]))
-    sub_x = [datetime.fromtimestamp(x).strftime('%Y-%m-%d %H:%M:%S') for x in sub_x]
-    return sub_x, sub_y
+    return __moving_average__(dates, values, window, mode)
 
 
 async def get_branch_field_history(tag, field):
     """Get history of a field for a branch, realative to reference."""
-    if field not in FIELDS:
-        return None
-    query = f"""
-    SELECT jobs.timestamp_start AS time, (100 - 100 * AVG(results.{field})/AVG(reference_values.{field})) AS value
-    FROM results
-    INNER JOIN reference_values ON reference_values.test = results.test
-    INNER JOIN jobs ON jobs.ID = results.job
-    WHERE jobs.dockerTag = (SELECT ID FROM dockerTags WHERE name='{tag}') 
-        AND results.result = (SELECT ID FROM resultTags WHERE tag='SUCCESS')
-    GROUP BY jobs.ID
-    ORDER BY jobs.timestamp_start DESC;
-    """
-    stats = await DB.fetchall(query)
-    timestamp = [x['time'] for x in stats]
-    values = [x['value'] for x in stats]
-    return timestamp, values
+    return await __branch_field_history__(tag, field, scheduled=False)
 
-async def get_branch_field_history_moving_average(tag, field, window):
+async def get_branch_field_history_moving_average(tag, field, window, mode='simple'):
+    """Get moving average of the history of a field for a branch."""
     res = await get_branch_field_history(tag, field)
     if res is None:
         return None
     dates, values = res
-    dates = [datetime.fromisoformat(x).timestamp() for x in dates]
-    sub_x = []
-    sub_y = []
-    for i in range(window, len(dates)):
-        sub_x.append(statistics.mean(dates[i-window:i]))
-        sub_y.append(statistics.mean(values[i-window:i]))
-    sub_x = [datetime.fromtimestamp(x).strftime('%Y-%m-%d %H:%M:%S') for x in sub_x]
-    return sub_x, sub_y
\ No newline at end of file
+    return __moving_average__(dates, values, window, mode)
\ No newline at end of file
@@ -0,0 +1,625 @@
+"""
+Named, parameterized SQL statements of the backend.
+
+Values are never interpolated in the SQL text: they are passed as bound
+parameters (`%(name)s` placeholders) and escaped by the driver, so a
+statement always sends the same text whatever its arguments. Identifiers
+that can not be bound (field columns, scopes) are substituted only from
+explicit whitelists.
+
+aiomysql only speaks the text protocol, so the statements are not prepared
+on the server: the stable texts are what lets MySQL group them by digest,
+and `scripts/benchmark_queries.py` measures the parsing overhead against
+`PREPARE`/`EXECUTE` server side statements.
+
+This module has no dependency on the backend runtime so that it can be
+shared with the maintenance scripts.
+"""
+from itertools import combinations
+
+from rollup import FIELDS
+
+# all the statements, by name
+QUERIES = {}
+
+# value of LIMIT meaning "all the rows"
+NO_LIMIT = 18446744073709551615
+
+TEST_COLUMNS = ('ID', 'name', 'testset', 'description', 'author',
+                'frequency', 'graphPath')
+JOB_COLUMNS = ('ID', 'branch', 'jobnum', 'dockerTag', 'testScope',
+               'timestamp_start', 'timestamp_end', 'result')
+# columns of `tests` accepted as filters of the branch comparison
+COMPARE_FILTERS = ('name', 'testset', 'description', 'author', 'frequency')
+ID_TABLES = ('jobs', 'tests')
+SCOPES = {
+    'all': '',
+    'scheduled': "AND (jobs.testScope = 'DAILY' OR jobs.testScope = 'WEEKLY')",
+}
+
+STATS_FIELDS = {
+    'duration': 'duration',
+    'cpu': 'cpu_time',
+    'memory': 'memory_avg',
+    'read': 'io_read'
+}
+# number of most recent jobs of each summary window (None for all jobs)
+STATS_WINDOWS = {
+    'last': 1,
+    'last10': 10,
+    'average': None
+}
+STATUS_FIELDS = {
+    'cpu': 'cpu_time',
+    'memory': 'memory_avg',
+    'read': 'io_read'
+}
+
+
+class Query:
+    """
+    Named SQL statement.
+
+    Parameters:
+    -----------
+     - name: unique name of the statement
+     - sql: statement text, with `{identifier}` placeholders
+     - identifiers: whitelist of each placeholder, either a sequence of
+       allowed values or a mapping of allowed values to SQL fragments
+    """
+    def __init__(self, name, sql, **identifiers):
+        self.name = name
+        self.sql = sql
+        self.identifiers = identifiers
+        self._texts = {}
+        QUERIES[name] = self
+
+    def __call__(self, **values):
+        """
+        Return the statement text for the given identifiers.
+
+        Raises ValueError if an identifier is missing or not allowed.
+        """
+        key = tuple(sorted(values.items()))
+        text = self._texts.get(key)
+        if text is not None:
+            return text
+        if set(values) != set(self.identifiers):
+            raise ValueError(f'`{self.name}` expects {sorted(self.identifiers)}')
+        fragments = {}
+        for ident, value in values.items():
+            allowed = self.identifiers[ident]
+            if value not in allowed:
+                raise ValueError(f'`{value}` is not a valid {ident}')
+            fragments[ident] = allowed[value] if isinstance(allowed, dict) else value
+        text = self.sql.format(**fragments)
+        self._texts[key] = text
+        return text
+
+    def __repr__(self):
+        return f'Query({self.name!r})'
+
+
+def where(filters, columns, table):
+    """
+    Build a WHERE clause matching the filters on whitelisted columns.
+
+    Parameters:
+    -----------
+     - filters: dictionary of column name and value
+     - columns: allowed columns
+     - table: table of the columns
+
+    Returns:
+    --------
+    tuple of the clause (empty without filters) and its parameters
+
+    Raises ValueError if a column is not allowed.
+    """
+    conditions = []
+    for column in filters:
+        if column not in columns:
+            raise ValueError(f'`{column}` is not a valid filter')
+        conditions.append(f'{table}.{column} = %({column})s')
+    if not conditions:
+        return '', {}
+    return 'WHERE ' + ' AND '.join(conditions), dict(filters)
+
+
+def where_clauses(columns, table):
+    """
+    Whitelist of the WHERE clauses of `where` on the columns.
+
+    Returns:
+    --------
+    dictionary of every sorted tuple of columns (see filter_key) and clause
+    """
+    return {
+        subset: where(dict.fromkeys(subset), columns, table)[0]
+        for num in range(len(columns) + 1)
+        for subset in combinations(sorted(columns), num)
+    }
+
+
+def filter_key(filters):
+    """Identifier of the WHERE clause matching the filters."""
+    return tuple(sorted(filters))
+
+
+# --- lookup tables ---------------------------------------------------------
+
+DOCKER_TAGS = Query('docker_tags', 'SELECT ID, name FROM dockerTags')
+RESULT_TAGS = Query('result_tags', 'SELECT ID, tag FROM resultTags')
+TEST_NAMES = Query('test_names', 'SELECT ID, name FROM tests')
+TESTSETS = Query('testsets', 'SELECT DISTINCT testset FROM tests')
+GRAPH_HASHES = Query('graph_hashes', 'SELECT test, hash FROM test_graph')
+
+LAST_ID = Query('last_id', 'SELECT MAX(ID) AS id FROM {table}', table=ID_TABLES)
+FIRST_ID = Query('first_id', 'SELECT MIN(ID) AS id FROM {table}', table=ID_TABLES)
+
+# --- tests -----------------------------------------------------------------
+
+TEST = Query('test', 'SELECT * FROM tests WHERE ID = %(test)s')
+
+TESTS_BY_TESTSET = Query('tests_by_testset', """
+    SELECT * FROM tests WHERE testset = %(testset)s ORDER BY ID""")
+
+TESTS_BY_AUTHOR = Query('tests_by_author', """
+    SELECT * FROM tests WHERE author = %(author)s ORDER BY ID""")
+
+ALL_TESTS = Query('all_tests', 'SELECT * FROM tests ORDER BY ID')
+
+TEST_LIST = Query('test_list', 'SELECT * FROM tests {where} ORDER BY ID',
+                  where=where_clauses(TEST_COLUMNS, 'tests'))
+
+TEST_EXEC_COUNT = Query('test_exec_count', """
+    SELECT COUNT(ID) AS count
+    FROM jobs
+    WHERE ID IN (SELECT job FROM results WHERE test = %(test)s)""")
+
+TEST_LAST_JOB = Query('test_last_job', """
+    SELECT jobs.*, resultTags.tag, dockerTags.name
+    FROM jobs
+    INNER JOIN resultTags ON jobs.result = resultTags.ID
+    INNER JOIN dockerTags ON jobs.dockerTag = dockerTags.ID
+    WHERE jobs.ID IN (SELECT job FROM results WHERE test = %(test)s)
+    ORDER BY jobs.ID DESC LIMIT 1""")
+
+TEST_GRAPH = Query('test_graph', """
+    SELECT graph, encoding, hash FROM test_graph WHERE test = %(test)s""")
+
+EXECUTED_TESTS = Query('executed_tests', """
+    SELECT test FROM results GROUP BY test""")
+
+BRANCH_EXECUTED_TESTS = Query('branch_executed_tests', """
+    SELECT test FROM results
+    WHERE job IN (SELECT ID FROM jobs WHERE dockerTag = %(tag)s)
+    GROUP BY test""")
+
+EXECUTED_TESTS_INFO = Query('executed_tests_info', """
+    SELECT * FROM tests
+    WHERE ID IN (SELECT DISTINCT test FROM results)
+    ORDER BY ID""")
+
+BRANCH_EXECUTED_TESTS_INFO = Query('branch_executed_tests_info', """
+    SELECT * FROM tests
+    WHERE ID IN (
+        SELECT DISTINCT test FROM results
+        WHERE job IN (SELECT ID FROM jobs WHERE dockerTag = %(tag)s))
+    ORDER BY ID""")
+
+# --- test performances -----------------------------------------------------
+
+TEST_SUMMARY = Query('test_summary', """
+    SELECT
+        result, duration, cpu_time, cpu_usage_avg, memory_avg, memory_max,
+        io_write, io_read, threads_avg
+    FROM results
+    WHERE test = %(test)s""")
+
+BRANCH_TEST_SUMMARY = Query('branch_test_summary', """
+    SELECT
+        result, duration, cpu_time, cpu_usage_avg, memory_avg, memory_max,
+        io_write, io_read, threads_avg
+    FROM results
+    WHERE test = %(test)s
+    AND job IN (SELECT ID FROM jobs WHERE dockerTag = %(tag)s)""")
+
+TEST_REFERENCE = Query('test_reference', """
+    SELECT
+        updated, duration, cpu_time, cpu_usage_avg, memory_avg,
+        memory_max, io_write, io_read, threads_avg
+    FROM reference_values
+    WHERE test = %(test)s""")
+
+REFERENCES = Query('references', """
+    SELECT
+        id, test, referenceTag, updated, duration, cpu_time, cpu_usage_avg,
+        cpu_usage_max, memory_avg, memory_max, io_write, io_read, threads_avg,
+        threads_max
+    FROM reference_values""")
+
+TEST_HISTORY = Query('test_history', """
+    SELECT start, {field}
+    FROM results
+    WHERE test = %(test)s AND result = %(success)s
+    ORDER BY start DESC
+    LIMIT %(limit)s""", field=FIELDS)
+
+BRANCH_TEST_HISTORY = Query('branch_test_history', """
+    SELECT start, {field}
+    FROM results
+    WHERE test = %(test)s AND result = %(success)s
+    AND job IN (SELECT ID FROM jobs WHERE dockerTag = %(tag)s)
+    ORDER BY start DESC
+    LIMIT %(limit)s""", field=FIELDS)
+
+
+__STATUS_RESULTS__ = """
+        results.result = %(success)s
+        AND results.job IN (SELECT ID FROM jobs WHERE dockerTag = %(tag)s)"""
+
+
+def __status_query__():
+    columns = list(STATUS_FIELDS.values())
+    # executions are ranked by a correlated count of the more recent ones,
+    # MySQL 5.7 has no window functions
+    return f"""
+    SELECT
+        hist.test, totals.executions,
+        {', '.join(f'hist.{col}' for col in columns)},
+        {', '.join(f'totals.sum_{col}' for col in columns)},
+        {', '.join(f'reference_values.{col}' for col in columns)}
+    FROM (
+        SELECT
+            results.test,
+            {', '.join(f'results.{col}' for col in columns)},
+            1 + (
+                SELECT COUNT(*) FROM results newer
+                WHERE newer.test = results.test
+                AND newer.result = %(success)s
+                AND newer.job IN (SELECT ID FROM jobs WHERE dockerTag = %(tag)s)
+                AND (newer.start > results.start
+                    OR (newer.start = results.start AND newer.ID > results.ID))
+            ) AS rn
+        FROM results
+        WHERE{__STATUS_RESULTS__}
+    ) hist
+    INNER JOIN (
+        SELECT
+            results.test,
+            COUNT(*) AS executions,
+            {', '.join(f'SUM(results.{col}) AS sum_{col}' for col in columns)}
+        FROM results
+        WHERE{__STATUS_RESULTS__}
+        GROUP BY results.test
+    ) totals ON totals.test = hist.test
+    INNER JOIN reference_values ON reference_values.test = hist.test
+    WHERE hist.rn <= %(window)s
+    ORDER BY hist.test, hist.rn"""
+
+
+# every test of a branch with its `window` most recent executions, their
+# number and their sum (see performances.get_branch_status_fulldata)
+BRANCH_STATUS = Query('branch_status', __status_query__())
+
+# --- jobs ------------------------------------------------------------------
+
+JOB = Query('job', 'SELECT * FROM jobs WHERE ID = %(job)s')
+
+JOB_LIST = Query('job_list', 'SELECT * FROM jobs {where} ORDER BY ID DESC',
+                 where=where_clauses(JOB_COLUMNS, 'jobs'))
+
+JOBS_BY_SCOPE = Query('jobs_by_scope', """
+    SELECT * FROM jobs WHERE LOWER(testScope) = %(scope)s ORDER BY ID""")
+
+JOB_TESTS = Query('job_tests', """
+    SELECT * FROM tests
+    WHERE ID IN (SELECT test FROM results WHERE job = %(job)s)""")
+
+JOB_RESULTS = Query('job_results', """
+    SELECT
+        ID, test, job, result, start, duration, cpu_time, cpu_usage_avg,
+        cpu_usage_max, memory_avg, memory_max, io_write, io_read,
+        threads_avg
+    FROM results WHERE job = %(job)s ORDER BY ID""")
+
+# blob columns are the last three: raw_data payload, encoding and output
+JOB_EXEC = Query('job_exec', """
+    SELECT
+        results.*, result_data.raw_data, result_data.encoding,
+        result_data.output
+    FROM results
+    LEFT JOIN result_data ON result_data.result = results.ID
+    WHERE results.job = %(job)s AND results.test = %(test)s""")
+
+# totals of the job are computed once and joined to each of its results
+JOB_SUMMARY = Query('job_summary', """
+    SELECT
+        results.test, tests.name,
+        reference_values.ID AS ref_ID,
+        results.duration / CAST(reference_values.duration AS DECIMAL(20, 6))
+            AS ratio_duration,
+        results.cpu_time / CAST(reference_values.cpu_time AS DECIMAL(20, 6))
+            AS ratio_cpu_time,
+        results.memory_avg / CAST(reference_values.memory_avg AS DECIMAL(20, 6))
+            AS ratio_memory_avg,
+        results.memory_max / CAST(reference_values.memory_max AS DECIMAL(20, 6))
+            AS ratio_memory_max,
+        results.io_read / CAST(reference_values.io_read AS DECIMAL(20, 6))
+            AS ratio_io_read,
+        results.io_write / CAST(reference_values.io_write AS DECIMAL(20, 6))
+            AS ratio_io_write,
+        totals.num_tests, totals.duration, totals.cpu_time, totals.passed,
+        totals.skipped, totals.memory_max, totals.memory_avg, totals.io_read,
+        totals.io_write
+    FROM results
+    CROSS JOIN (
+        SELECT
+            COUNT(*) AS num_tests,
+            CAST(SUM(duration) AS SIGNED) AS duration,
+            CAST(SUM(cpu_time) AS SIGNED) AS cpu_time,
+            CAST(SUM(result = 1) AS SIGNED) AS passed,
+            CAST(SUM(result = 2) AS SIGNED) AS skipped,
+            MAX(memory_max) AS memory_max,
+            SUM(memory_avg) / CAST(COUNT(*) AS DECIMAL(20, 6)) AS memory_avg,
+            CAST(SUM(io_read) AS SIGNED) AS io_read,
+            CAST(SUM(io_write) AS SIGNED) AS io_write
+        FROM results
+        WHERE job = %(job)s
+    ) totals
+    LEFT JOIN reference_values ON reference_values.test = results.test
+    LEFT JOIN tests ON tests.ID = results.test
+    WHERE results.job = %(job)s
+    ORDER BY results.test""")
+
+JOB_TESTSETS = Query('job_testsets', """
+    SELECT
+        tests.ID AS tst_ID,
+        tests.name AS tst_name,
+        tests.testset AS tst_testset,
+        results.result AS res_ID,
+        resultTags.tag AS res_tag,
+        results.duration AS prf_duration,
+        results.cpu_time AS prf_cpu_time,
+        results.memory_avg AS prf_memory_avg,
+        results.memory_max AS prf_memory_max,
+        results.io_read AS prf_io_read,
+        results.io_write AS prf_io_write,
+        reference_values.updated AS ref_updated,
+        reference_values.duration AS ref_duration,
+        reference_values.cpu_time AS ref_cpu_time,
+        reference_values.memory_avg AS ref_memory_avg,
+        reference_values.memory_max AS ref_memory_max,
+        reference_values.io_read AS ref_io_read,
+        reference_values.io_write AS ref_io_write,
+        reference_values.threads_avg as ref_threads_avg
+    FROM results
+    LEFT JOIN reference_values ON reference_values.test = results.test
+    INNER JOIN tests ON results.test = tests.ID
+    INNER JOIN resultTags ON results.result = resultTags.ID
+    WHERE job = %(job)s
+    ORDER BY tests.ID""")
+
+# --- ingestion -------------------------------------------------------------
+
+INSERT_DOCKER_TAG = Query('insert_docker_tag', """
+    INSERT INTO dockerTags (name) VALUES (%(name)s)
+    ON DUPLICATE KEY UPDATE ID = LAST_INSERT_ID(ID)""")
+
+INSERT_JOB = Query('insert_job', """
+    INSERT INTO jobs (
+        branch, jobnum, dockerTag, testScope, timestamp_start,
+        timestamp_end, result)
+    VALUES (
+        %(branch)s, %(jobnum)s, %(dockerTag)s, %(testScope)s,
+        %(timestamp_start)s, %(timestamp_end)s, %(result)s)""")
+
+# multi-row insert of the results of a job (cursor.executemany)
+INSERT_RESULTS = Query('insert_results', """
+    INSERT INTO results (test, job, result, start, """ + ', '.join(FIELDS) + """)
+    VALUES (%(test)s, %(job)s, %(result)s, %(start)s, """ + ', '.join(
+        f'%({field})s' for field in FIELDS) + """)""")
+
+JOB_RESULT_IDS = Query('job_result_ids', """
+    SELECT ID, test FROM results WHERE job = %(job)s""")
+
+# multi-row insert of the result blobs (cursor.executemany)
+INSERT_RESULT_DATA = Query('insert_result_data', """
+    INSERT INTO result_data (result, raw_data, encoding, output)
+    VALUES (%(result)s, %(raw_data)s, %(encoding)s, %(output)s)""")
+
+# --- branches --------------------------------------------------------------
+
+BRANCH_LAST_JOB = Query('branch_last_job', """
+    SELECT jobs.ID, jobs.jobnum, jobs.timestamp_start, jobs.testScope,
+        jobs.result
+    FROM jobs
+    WHERE jobs.dockerTag = %(tag)s
+    ORDER BY jobs.ID DESC LIMIT 1""")
+
+BRANCH_NJOBS = Query('branch_njobs', """
+    SELECT COUNT(ID) AS njobs FROM jobs WHERE dockerTag = %(tag)s""")
+
+BRANCH_WATERMARK = Query('branch_watermark', """
+    SELECT
+        last_job.ID AS job,
+        (SELECT COUNT(*) FROM results WHERE job = last_job.ID) AS results,
+        (SELECT MAX(ID) FROM results
+            WHERE job IN (SELECT ID FROM jobs WHERE dockerTag = %(tag)s)) AS result,
+        (SELECT MAX(updated) FROM reference_values) AS reference
+    FROM (SELECT MAX(ID) AS ID FROM jobs WHERE dockerTag = %(tag)s) last_job""")
+
+
+def __window__(num, expression):
+    if num is None:
+        return expression
+    return f"CASE WHEN last{num}.ID IS NOT NULL THEN {expression} END"
+
+
+def __stats_query__():
+    columns = [f"COUNT({__window__(10, 'results.ID')}) AS count"]
+    for window, num in STATS_WINDOWS.items():
+        for key, field in STATS_FIELDS.items():
+            ratio = (f"(reference_values.{field} - results.{field})"
+                     f" / reference_values.{field} * 100")
+            columns.append(f"AVG({__window__(num, ratio)}) AS {window}_{key}")
+    for name, comparison in (('improved', '0.97 >'), ('regressed', '1.03 <')):
+        conditions = {
+            key: f"reference_values.{field} * {comparison} results.{field}"
+            for key, field in STATS_FIELDS.items()
+        }
+        conditions['both'] = ' AND '.join(
+            conditions[key] for key in ('read', 'memory', 'duration'))
+        for key, condition in conditions.items():
+            columns.append(f"SUM({__window__(10, condition)}) AS {name}_{key}")
+    columns = ',\n        '.join(columns)
+    # the most recent jobs of each window, without window functions (MySQL 5.7)
+    windows = sorted({num for num in STATS_WINDOWS.values() if num} | {10})
+    joins = '\n    '.join(f"""LEFT JOIN (
+        SELECT ID FROM jobs
+        WHERE dockerTag = %(tag)s
+        ORDER BY ID DESC LIMIT {num}
+    ) last{num} ON last{num}.ID = jobs.ID""" for num in windows)
+    return f"""
+    SELECT
+        {columns}
+    FROM results
+    JOIN jobs ON results.job = jobs.ID
+    {joins}
+    INNER JOIN reference_values ON
+        results.test = reference_values.test
+    WHERE
+        jobs.dockerTag = %(tag)s
+        AND results.result = %(success)s"""
+
+
+# every summary window of a branch in a single scan, counters (count,
+# improved and regressed) refer to the last 10 jobs
+BRANCH_STATS = Query('branch_stats', __stats_query__())
+
+BRANCH_DETAILS = Query('branch_details', """
+    SELECT
+        tests.ID AS test_ID,
+        tests.name AS test_name,
+        COUNT(results.ID) AS num_exec,
+        AVG(results.duration) AS res_duration,
+        AVG(results.cpu_time) AS res_cpu,
+        AVG(results.memory_avg) AS res_memory,
+        AVG(results.io_read) AS res_read,
+        AVG(reference_values.duration) AS ref_duration,
+        AVG(reference_values.cpu_time) AS ref_cpu,
+        AVG(reference_values.memory_avg) AS ref_memory,
+        AVG(reference_values.io_read) AS ref_read
+    FROM results
+    JOIN (
+        SELECT ID FROM jobs
+        WHERE dockerTag = %(tag)s
+        ORDER BY ID DESC LIMIT %(limit)s
+    ) jobs ON results.job = jobs.ID
+    INNER JOIN reference_values ON results.test = reference_values.test
+    INNER JOIN tests ON results.test = tests.ID
+    WHERE results.result = %(success)s
+    GROUP BY tests.ID""")
+
+BRANCH_DETAILS_LAST = Query('branch_details_last', """
+    SELECT
+        tests.ID AS test_ID, tests.name AS name,
+        results.ID AS result_ID, results.job, results.result,
+        results.start, results.duration / ref.duration AS duration,
+        results.cpu_time / ref.cpu_time AS cpu_time,
+        results.memory_avg / ref.memory_avg AS memory_avg,
+        results.memory_max / ref.memory_max AS memory_max,
+        results.io_read / ref.io_read AS io_read,
+        results.io_write / ref.io_write AS io_write
+    FROM tests
+    INNER JOIN reference_values AS ref ON ref.test = tests.ID
+    INNER JOIN results ON results.test = tests.ID
+    JOIN (
+        SELECT test, MAX(job) AS lastJob
+        FROM results
+        WHERE job IN (SELECT ID FROM jobs WHERE dockerTag = %(tag)s)
+        GROUP BY test
+    ) filtr ON filtr.test = results.test AND filtr.lastJob = results.job
+    ORDER BY tests.ID""")
+
+BRANCH_HISTORY = Query('branch_history', """
+    SELECT time, value FROM (
+        SELECT jobs.timestamp_start AS time, job_stats.rel_{field} AS value
+        FROM job_stats
+        INNER JOIN jobs ON jobs.ID = job_stats.job
+        WHERE jobs.dockerTag = %(tag)s
+            AND job_stats.num_results > 0
+            {scope}
+        UNION ALL
+        SELECT jobs.timestamp_start AS time, (100 - 100 * AVG(results.{field})/AVG(reference_values.{field})) AS value
+        FROM results
+        INNER JOIN reference_values ON reference_values.test = results.test
+        INNER JOIN jobs ON jobs.ID = results.job
+        WHERE jobs.dockerTag = %(tag)s
+            AND results.result = %(success)s
+            AND NOT EXISTS (
+                SELECT job FROM job_stats
+                WHERE job_stats.job = jobs.ID AND job_stats.num_results > 0)
+            {scope}
+        GROUP BY jobs.ID
+    ) history
+    ORDER BY time DESC""", field=FIELDS, scope=SCOPES)
+
+# optional filters of the branch comparisons: `author` must match exactly
+# (case insensitive), the other COMPARE_FILTERS are substrings
+__COMPARE_FILTER__ = """
+    AND (%(author)s IS NULL OR UPPER(tests.author) = UPPER(%(author)s))
+    AND (%(name)s IS NULL OR tests.name LIKE CONCAT('%%', %(name)s, '%%'))
+    AND (%(testset)s IS NULL OR tests.testset LIKE CONCAT('%%', %(testset)s, '%%'))
+    AND (%(description)s IS NULL OR tests.description LIKE CONCAT('%%', %(description)s, '%%'))
+    AND (%(frequency)s IS NULL OR tests.frequency LIKE CONCAT('%%', %(frequency)s, '%%'))"""
+
+# maximum number of branches compared at once
+MAX_COMPARE_TAGS = 10
+
+
+def __compare_jobs__(params):
+    """The 5 most recent jobs of the branches bound to each of the params."""
+    return '\n        UNION\n'.join(
+        f"""        (SELECT ID, dockerTag FROM jobs WHERE dockerTag = %({param})s
+         ORDER BY timestamp_start DESC LIMIT 5)""" for param in params)
+
+# tests executed by the last 5 jobs of both branches, pivoted by branch
+BRANCH_COMPARE = Query('branch_compare', """
+    SELECT
+        tests.ID AS test_ID,
+        tests.name AS test_name,
+        COUNT(CASE WHEN jobs.dockerTag = %(tag_a)s THEN results.ID END) AS br_a_count,
+        COUNT(CASE WHEN jobs.dockerTag = %(tag_b)s THEN results.ID END) AS br_b_count,
+        AVG(CASE WHEN jobs.dockerTag = %(tag_a)s THEN results.{field} END) AS br_a_avg,
+        AVG(CASE WHEN jobs.dockerTag = %(tag_b)s THEN results.{field} END) AS br_b_avg
+    FROM results
+    JOIN (
+""" + __compare_jobs__(('tag_a', 'tag_b')) + """
+    ) jobs ON results.job = jobs.ID
+    INNER JOIN tests ON results.test = tests.ID
+    WHERE results.result = %(success)s""" + __COMPARE_FILTER__ + """
+    GROUP BY tests.ID
+    HAVING br_a_count > 0 AND br_b_count > 0
+    ORDER BY tests.ID ASC""", field=FIELDS)
+
+# tests executed by the last 5 jobs of any of the branches, by branch: the
+# `tags` branches are bound to `tag_0`, `tag_1`...
+BRANCH_COMPARE_MANY = Query('branch_compare_many', """
+    SELECT
+        tests.ID AS test_ID,
+        tests.name AS test_name,
+        jobs.dockerTag AS tag,
+        COUNT(results.ID) AS num_exec,
+        AVG(results.{field}) AS field
+    FROM results
+    JOIN (
+{tags}
+    ) jobs ON results.job = jobs.ID
+    INNER JOIN tests ON results.test = tests.ID
+    WHERE results.result = %(success)s""" + __COMPARE_FILTER__ + """
+    GROUP BY tests.ID, jobs.dockerTag
+    ORDER BY tests.ID ASC""", field=FIELDS, tags={
+        num: __compare_jobs__([f'tag_{i}' for i in range(num)])
+        for num in range(1, MAX_COMPARE_TAGS + 1)})
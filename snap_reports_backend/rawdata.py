@@ -0,0 +1,50 @@
+"""
+Storage and decoding of the `raw_data` resource profiles.
+
+Profiles are CSV files with two header lines, stored compressed in the
+`result_data` table together with their encoding.
+"""
+import codecs
+import csv
+import itertools
+import os
+
+import compression
+
+ENCODING = os.getenv('RAW_DATA_ENCODING', compression.GZIP)
+HEADER_LINES = 2
+
+
+def encode(text, encoding=ENCODING):
+    """
+    Encode a profile for storage.
+
+    Returns:
+    --------
+    compressed payload and its encoding
+    """
+    if isinstance(text, str):
+        text = text.encode('utf-8')
+    return compression.compress(text, encoding), encoding
+
+
+def iter_lines(payload, encoding):
+    """Decompress and decode a stored profile line by line."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    tail = ''
+    for chunk in compression.stream(payload, encoding):
+        lines = (tail + decoder.decode(chunk)).splitlines(keepends=True)
+        # the last line may continue (or end with `\n`) in the next chunk
+        tail = lines.pop() if lines and not lines[-1].endswith('\n') else ''
+        yield from lines
+    tail += decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_rows(payload, encoding):
+    """Parse a stored profile incrementally, skipping its header lines."""
+    if payload is None:
+        return iter(())
+    lines = itertools.islice(iter_lines(payload, encoding), HEADER_LINES, None)
+    return csv.reader(lines, delimiter=',')
@@ -0,0 +1,62 @@
+"""
+Rolling window statistics.
+
+All functions work on chronologically ordered series and return one value
+per complete window, that is `len(values) - window + 1` values, the i-th
+one covering `values[i:i + window]`.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+MODES = ('simple', 'ewma', 'median')
+
+
+def rolling_mean(values, window):
+    """Simple moving average, computed with cumulative sums."""
+    values = np.asarray(values, dtype=float)
+    if window < 1 or len(values) < window:
+        return np.empty(0)
+    csum = np.cumsum(np.insert(values, 0, 0.0))
+    return (csum[window:] - csum[:-window]) / window
+
+
+def rolling_ewma(values, window):
+    """
+    Exponentially weighted moving average over a window.
+
+    Weights decay with a smoothing factor `2 / (window + 1)`, the most
+    recent sample of each window having the highest weight.
+    """
+    values = np.asarray(values, dtype=float)
+    if window < 1 or len(values) < window:
+        return np.empty(0)
+    alpha = 2 / (window + 1)
+    weights = (1 - alpha) ** np.arange(window - 1, -1, -1)
+    return sliding_window_view(values, window) @ weights / weights.sum()
+
+
+def rolling_median(values, window):
+    """Moving median."""
+    values = np.asarray(values, dtype=float)
+    if window < 1 or len(values) < window:
+        return np.empty(0)
+    return np.median(sliding_window_view(values, window), axis=1)
+
+
+def rolling(values, window, mode='simple'):
+    """
+    Compute a moving statistic.
+
+    Parameters:
+    -----------
+     - values: chronologically ordered series
+     - window: window size
+     - mode: one of MODES
+    """
+    if mode == 'simple':
+        return rolling_mean(values, window)
+    if mode == 'ewma':
+        return rolling_ewma(values, window)
+    if mode == 'median':
+        return rolling_median(values, window)
+    raise ValueError(f'Mode `{mode}` not supported')
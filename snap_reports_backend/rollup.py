@@ -0,0 +1,56 @@
+"""
+Job level rollup of the performance statistics.
+
+The `job_stats` table stores, for every job, the average of each field
+over its successful results and the same average relative to the
+reference values. As results of a finished job never change, branch
+history endpoints can read these rows instead of aggregating `results`.
+Rows of jobs without results (e.g. rolled up while running) are ignored
+by the history, which aggregates these jobs on the fly.
+
+This module has no dependency on the backend runtime so that it can be
+shared with the maintenance scripts.
+"""
+
+FIELDS = ["duration", "cpu_time", "cpu_usage_avg", "cpu_usage_max",
+          "memory_avg", "memory_max", "io_read", "io_write", "threads_avg",
+          "threads_max"]
+
+
+def __update_query__(condition):
+    columns = ', '.join(f'{field}, rel_{field}' for field in FIELDS)
+    values = ',\n        '.join(
+        f'AVG(results.{field}), '
+        f'100 - 100 * AVG(results.{field}) / AVG(reference_values.{field})'
+        for field in FIELDS)
+    return f"""
+    REPLACE INTO job_stats (job, num_results, {columns})
+    SELECT
+        jobs.ID, COUNT(results.ID),
+        {values}
+    FROM jobs
+    LEFT JOIN (results
+        INNER JOIN reference_values ON reference_values.test = results.test)
+    ON results.job = jobs.ID
+        AND results.result = (SELECT ID FROM resultTags WHERE tag='SUCCESS')
+    WHERE {condition}
+    GROUP BY jobs.ID
+    """
+
+
+# Rollup of a single job, expects the job ID as parameter.
+UPDATE_JOB = __update_query__("jobs.ID = %s")
+# Rollup of every job not yet present in `job_stats`, or rolled up while
+# it was still receiving results (its number of results changed since).
+UPDATE_PENDING = __update_query__("""
+        jobs.ID NOT IN (SELECT job FROM job_stats)
+        OR jobs.ID IN (
+            SELECT job_stats.job FROM job_stats
+            WHERE job_stats.num_results <> (
+                SELECT COUNT(*) FROM results
+                INNER JOIN reference_values ON reference_values.test = results.test
+                WHERE results.job = job_stats.job
+                    AND results.result = (SELECT ID FROM resultTags WHERE tag='SUCCESS')))""")
+# Full rebuild, needed when reference values are refreshed.
+UPDATE_ALL = __update_query__("TRUE")
+
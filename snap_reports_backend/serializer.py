@@ -0,0 +1,58 @@
+"""
+JSON serialization of the responses.
+
+Rows are returned by the DB with their native values (Decimal, datetime,
+bytes), which are converted while serializing: decimals as floats, bytes as
+UTF-8 text and dates as `YYYY-MM-DD HH:MM:SS`. Numpy arrays and scalars are
+serialized natively. `orjson` is used when installed, the standard `json`
+module otherwise.
+"""
+import datetime
+import decimal
+import functools
+import json as jsonlib
+
+from sanic import response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def default(value):
+    """Convert the values not natively serialized."""
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode('utf-8')
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time,
+                          datetime.timedelta)):
+        return str(value)
+    if np is not None:
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        if isinstance(value, np.generic):
+            return value.item()
+    raise TypeError(f'Type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY |
+               orjson.OPT_NON_STR_KEYS)
+
+    def dumps(obj, **_):
+        """Serialize an object to JSON bytes."""
+        return orjson.dumps(obj, default=default, option=OPTIONS)
+else:
+    def dumps(obj, **_):
+        """Serialize an object to JSON text."""
+        return jsonlib.dumps(obj, default=default, separators=(',', ':'))
+
+
+json = functools.partial(response.json, dumps=dumps)
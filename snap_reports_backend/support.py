@@ -1,8 +1,12 @@
 """Support functions and utilities."""
+import os
 import sys
-from sanic.response import text, json
+from sanic.response import text
 
 import dbfactory
+from catalog import Catalog
+import queries
+from serializer import json
 import uvloop
 import asyncio
 
@@ -20,16 +24,22 @@ if not DB:
     print('db was not found - EXIT')
     sys.exit(1)
 
-TAGS = {}
-RESULTS = {}
+CATALOG = Catalog(DB, refresh_interval=float(os.getenv('CATALOG_REFRESH', '60')))
 
 
-async def __tag__(id):
-    return await DB.fetchone(f"SELECT ID, name FROM dockerTags WHERE ID='{id}'")
+def parse_tag(tag):
+    """Function to decode url tag"""
+    return tag.replace('%3A', ':')
 
 
-async def __result__(id):
-    return await DB.fetchone(f"SELECT ID, tag FROM resultTags WHERE ID='{id}'")
+async def get_tag_id(tag):
+    """Resolve a docker tag name to its ID (None if unknown)."""
+    return await CATALOG.docker_tag_id(tag)
+
+
+async def get_success_id():
+    """Resolve the ID of the `SUCCESS` result tag."""
+    return await CATALOG.result_id('SUCCESS')
 
 
 async def get_test(test_id):
@@ -40,10 +50,26 @@ async def get_test(test_id):
     -----------
      -  test_id : db test id
     """
-    row = await DB.fetchone(f"SELECT * FROM tests where id='{test_id}'")
+    row = await DB.fetchone(queries.TEST(), {'test': test_id})
     return row
 
 
+async def get_job_tests(job_id):
+    """
+    Retrieve information of all tests executed by a job.
+
+    Parameters:
+    -----------
+     - job_id: db job id
+
+    Returns:
+    --------
+    dictionary of test information indexed by test id
+    """
+    rows = await DB.fetchall(queries.JOB_TESTS(), {'job': job_id})
+    return {row['ID']: row for row in rows}
+
+
 async def get_job(job_id):
     """
     Retrieve job inforation.
@@ -52,7 +78,9 @@ async def get_job(job_id):
     ----------
      - job_id: db job id
     """
-    res = await DB.fetchone(f"SELECT * FROM jobs WHERE id = '{job_id}'")
+    res = await DB.fetchone(queries.JOB(), {'job': job_id})
+    if res is None:
+        return None
     res['dockerTag'] = await convert_tag(res['dockerTag'])
     res['result'] = await convert_result(res['result'])
     return res
@@ -66,30 +94,22 @@ async def convert_tag(tag_id):
     -----------
      - tag_id: tag name
     """
-    global TAGS
-    if tag_id in TAGS:
-        return TAGS[tag_id]
-    value = await __tag__(tag_id)
-    TAGS[tag_id] = value
-    return value
+    return await CATALOG.docker_tag(tag_id)
+
 
 async def convert_result(res_id):
     """Convert result:id to result object."""
-    global RESULTS
-    if res_id in RESULTS:
-        return RESULTS[res_id]
-    value = await __result__(res_id)
-    RESULTS[res_id] = value
-    return value
+    return await CATALOG.result(res_id)
+
 
 async def __get_last_id__(table):
-    res = await DB.fetchone(f"SELECT max(id) FROM {table}")
-    return res['max(id)']
+    res = await DB.fetchone(queries.LAST_ID(table=table))
+    return res['id']
 
 
 async def __get_first_id__(table):
-    res = await DB.fetchone(f"SELECT min(id) FROM {table}")
-    return res['min(id)']
+    res = await DB.fetchone(queries.FIRST_ID(table=table))
+    return res['id']
 
 
 async def get_id(req, table):
@@ -125,12 +145,10 @@ async def get_test_id(test):
         if test.isdigit():
             return int(test)
         if test.lower() == 'last':
-            return __get_last_id__('tests')
+            return await __get_last_id__('tests')
         if test.lower() == 'first':
-            return __get_first_id__('tests')
-        row = await DB.fetchone(f"SELECT ID FROM tests where name='{test}'")
-        if row:
-            return row['ID']
+            return await __get_first_id__('tests')
+        return await CATALOG.test_id(test)
     return None
 
 
@@ -140,17 +158,13 @@ async def get_job_stats(job_id):
     if job is None:
         return text("Job do not exist", status=404)
 
-    rows = await DB.fetchall(f"""
-        SELECT
-            ID, test, job, result, start, duration, cpu_time, cpu_usage_avg,
-            cpu_usage_max, memory_avg, memory_max, io_write, io_read,
-            threads_avg
-        FROM results WHERE job = '{job_id}' ORDER BY ID""")
+    rows = await DB.fetchall(queries.JOB_RESULTS(), {'job': job_id})
+    tests = await get_job_tests(job_id)
     res = []
     for row in rows:
         val = row
         val['result'] = await convert_result(val['result'])
-        val['test'] = await get_test(val['test'])
+        val['test'] = tests.get(val['test'])
         val['job'] = job
         res.append(val)
 
@@ -161,28 +175,22 @@ async def get_job_stats(job_id):
 
 async def get_test_list(cursor=None, branch=None):
     """Get test list."""
-    query = "SELECT test FROM results WHERE"
     if branch:
-        query += f""" job IN (SELECT ID FROM jobs WHERE dockerTag = (
-            SELECT ID FROM dockerTags WHERE name = '{branch}'
-        ))"""
-    query += " GROUP BY test"
+        query = queries.BRANCH_EXECUTED_TESTS()
+        params = {'tag': await get_tag_id(branch)}
+    else:
+        query = queries.EXECUTED_TESTS()
+        params = None
     if cursor:
-        rows = await dbfactory.fetchall(cursor, query)
+        rows = await dbfactory.fetchall(cursor, query, params)
     else:
-        rows = await DB.fetchall(query)
+        rows = await DB.fetchall(query, params)
     return [row['test'] for row in rows]
 
 
 async def get_tests(branch=None):
     """Get full tests."""
-    query = """SELECT * FROM tests WHERE ID IN
-        (SELECT DISTINCT test FROM results WHERE
-    """
     if branch:
-        query += f""" job IN (SELECT ID FROM jobs WHERE dockerTag = (
-            SELECT ID FROM dockerTags WHERE name = '{branch}'
-        ))"""
-    query += ") ORDER BY ID"
-    return await DB.fetchall(query)
-
+        return await DB.fetchall(queries.BRANCH_EXECUTED_TESTS_INFO(),
+                                 {'tag': await get_tag_id(branch)})
+    return await DB.fetchall(queries.EXECUTED_TESTS_INFO())
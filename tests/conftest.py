@@ -0,0 +1,25 @@
+"""
+Test configuration.
+
+The backend modules import each other as top level modules (as when the
+server is started from `snap_reports_backend`), and `support` reads the
+configuration file from the command line when imported: it is imported
+here with an empty configuration and a DB pool that is never opened.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'snap_reports_backend'))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+os.environ.setdefault('DB_MODE', 'MYSQL')
+os.environ.setdefault('DB', 'user:password@localhost:3306/snap_reports')
+
+ARGV = sys.argv
+sys.argv = [ARGV[0], os.devnull]
+try:
+    import support
+finally:
+    sys.argv = ARGV
+assert support.DB is not None
@@ -0,0 +1,41 @@
+"""Tests of the batch API."""
+import asyncio
+from types import SimpleNamespace
+
+from sanic.compat import Header
+from sanic.response import raw, text
+
+from api.batch import __dispatch__
+
+
+def __request__(handler):
+    router = SimpleNamespace(get=lambda path, method, host: (None, handler, {}))
+    return SimpleNamespace(
+        headers=Header([('Accept-Encoding', 'gzip'), ('If-None-Match', '"abc"'),
+                        ('Authorization', 'Bearer x')]),
+        version='1.1', transport=None, app=SimpleNamespace(router=router))
+
+
+def test_headers_not_forwarded():
+    seen = {}
+
+    async def handler(sub):
+        seen.update(sub.headers)
+        return text('ok')
+
+    res = asyncio.run(__dispatch__(__request__(handler), '/api/test/1'))
+    assert res == {'path': '/api/test/1', 'status': 200, 'body': 'ok'}
+    assert {key.lower() for key in seen} == {'authorization'}
+
+
+def test_encoded_response_rejected():
+    async def handler(_):
+        return raw(b'\x1f\x8b', headers={'Content-Encoding': 'gzip'})
+
+    res = asyncio.run(__dispatch__(__request__(handler), '/api/test/1/graph.xml'))
+    assert res['status'] == 500
+
+
+def test_batch_path_rejected():
+    res = asyncio.run(__dispatch__(__request__(None), '/api/batch'))
+    assert res['status'] == 400
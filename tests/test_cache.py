@@ -0,0 +1,38 @@
+"""Tests of the response cache."""
+import asyncio
+
+import cache
+import queries
+
+
+class FakeDB:
+    """DB answering the watermark of a branch."""
+    def __init__(self):
+        self.row = {'job': 10, 'results': 3, 'result': 120, 'reference': None}
+
+    async def fetchone(self, query, params):
+        assert query == queries.BRANCH_WATERMARK()
+        return dict(self.row)
+
+
+def test_watermark_follows_older_jobs(monkeypatch):
+    db = FakeDB()
+
+    async def get_tag_id(tag):
+        return 1
+
+    monkeypatch.setattr(cache, 'DB', db)
+    monkeypatch.setattr(cache, 'get_tag_id', get_tag_id)
+    before = asyncio.run(cache.get_watermark('master'))
+    # results loaded into an older job of the tag
+    db.row['result'] = 125
+    assert asyncio.run(cache.get_watermark('master')) != before
+
+
+def test_lru_eviction():
+    responses = cache.ResponseCache(max_size=10)
+    responses.put('a', 1, {'body': b'123456'})
+    responses.put('b', 1, {'body': b'123456'})
+    assert responses.get('a', 1) is None
+    assert responses.get('b', 1)['body'] == b'123456'
+    assert responses.get('b', 2) is None
@@ -0,0 +1,60 @@
+"""Tests of the in-memory catalog."""
+import asyncio
+
+import queries
+from catalog import Catalog
+
+ROWS = {
+    queries.DOCKER_TAGS(): [{'ID': 1, 'name': 'snap:master'}],
+    queries.RESULT_TAGS(): [{'ID': 1, 'tag': 'SUCCESS'}],
+    queries.TEST_NAMES(): [{'ID': 1, 'name': 'test_a'}, {'ID': 2, 'name': 'test_b'}],
+    queries.GRAPH_HASHES(): [{'test': 1, 'hash': 'abc'}],
+}
+
+
+class FakeDB:
+    """DB answering the catalog statements and counting the reloads."""
+    def __init__(self):
+        self.loads = 0
+
+    async def fetchall(self, query, *_):
+        if query == queries.DOCKER_TAGS():
+            self.loads += 1
+        await asyncio.sleep(0)
+        return ROWS[query]
+
+
+def __catalog__():
+    db = FakeDB()
+    catalog = Catalog(db, miss_interval=0)
+    asyncio.run(catalog.load())
+    return db, catalog
+
+
+def test_lookups():
+    _, catalog = __catalog__()
+
+    async def run():
+        return (await catalog.docker_tag_id('snap:master'),
+                await catalog.result_id('SUCCESS'),
+                await catalog.test_name(2),
+                await catalog.graph_hash(1))
+    assert asyncio.run(run()) == (1, 1, 'test_b', 'abc')
+
+
+def test_concurrent_misses_reload_once():
+    db, catalog = __catalog__()
+    catalog.loaded -= 1
+
+    async def run():
+        catalog.miss_interval = 0.5
+        return await asyncio.gather(*[catalog.docker_tag_id('snap:x')
+                                      for _ in range(10)])
+    assert asyncio.run(run()) == [None] * 10
+    assert db.loads == 2
+
+
+def test_graph_miss_does_not_reload():
+    db, catalog = __catalog__()
+    assert asyncio.run(catalog.graph_hash(2)) is None
+    assert db.loads == 1
@@ -0,0 +1,66 @@
+"""Tests of the compression codecs."""
+import pytest
+
+import compression
+
+DATA = b'time,cpu\n' + b''.join(b'%d,%d\n' % (i, i % 7) for i in range(20000))
+
+
+@pytest.mark.parametrize('encoding', compression.available())
+def test_roundtrip(encoding):
+    payload = compression.compress(DATA, encoding)
+    assert compression.decompress(payload, encoding) == DATA
+
+
+@pytest.mark.parametrize('encoding', compression.available())
+def test_stream_chunks(encoding):
+    payload = compression.compress(DATA, encoding)
+    chunks = list(compression.stream(payload, encoding, chunk_size=1000))
+    assert b''.join(chunks) == DATA
+
+
+def test_identity():
+    assert compression.compress(DATA, compression.IDENTITY) == DATA
+
+
+def test_unsupported():
+    with pytest.raises(ValueError):
+        compression.compress(DATA, 'lzma')
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip', True),
+    ('deflate, GZIP', True),
+    ('gzip;q=0.5', True),
+    ('gzip;q=0', False),
+    ('deflate', False),
+    ('', False),
+    ('*', True),
+    ('br, *;q=0.1', True),
+    ('*;q=0', False),
+    ('gzip;q=0, *', False),
+    ('gzip, *;q=0', True),
+])
+def test_accepts(header, expected):
+    assert compression.accepts(header, compression.GZIP) is expected
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('', True),
+    ('gzip', True),
+    ('identity;q=0', False),
+    ('*;q=0', False),
+    ('identity, *;q=0', True),
+])
+def test_accepts_identity(header, expected):
+    assert compression.accepts(header, compression.IDENTITY) is expected
+
+
+def test_negotiate():
+    preferred = (compression.ZSTD, compression.BROTLI, compression.GZIP)
+    assert compression.negotiate('gzip, deflate', preferred) == compression.GZIP
+    assert compression.negotiate('deflate', preferred) == compression.IDENTITY
+    assert compression.negotiate('', preferred) == compression.IDENTITY
+    assert compression.negotiate(None, preferred) == compression.IDENTITY
+    assert compression.negotiate('*', (compression.GZIP,)) == compression.GZIP
+    assert compression.negotiate('*;q=0', (compression.GZIP,)) == compression.IDENTITY
@@ -0,0 +1,68 @@
+"""Tests of the raw_data downsampling."""
+import numpy as np
+import pytest
+
+import downsampling
+
+
+def __rows__(size, nseries, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = [np.arange(size, dtype=float)]
+    columns += [rng.normal(size=size).cumsum() for _ in range(nseries)]
+    return np.column_stack(columns).tolist()
+
+
+@pytest.mark.parametrize('method', downsampling.METHODS)
+@pytest.mark.parametrize('nseries', [1, 3, 8])
+@pytest.mark.parametrize('num', [3, 5, 10, 50, 100, 500])
+def test_at_most_num_rows(method, nseries, num):
+    rows = __rows__(5000, nseries)
+    out = downsampling.downsample(rows, num, method)
+    assert len(out) <= num
+    if method != 'mean':
+        assert out[0] == rows[0]
+        assert out[-1] == rows[-1]
+
+
+@pytest.mark.parametrize('method', ('lttb', 'minmax'))
+def test_budget_filled(method):
+    out = downsampling.downsample(__rows__(5000, 8), 100, method)
+    assert len(out) >= 90
+
+
+def test_peaks_kept():
+    rows = __rows__(5000, 2)
+    rows[1234][1] = 1e6
+    rows[4321][2] = -1e6
+    for method in ('lttb', 'minmax'):
+        out = downsampling.downsample(rows, 50, method)
+        assert rows[1234] in out
+        assert rows[4321] in out
+
+
+def test_small_or_not_numeric_unchanged():
+    rows = __rows__(10, 2)
+    assert downsampling.downsample(rows, 10) is rows
+    text = [['a', 'b']] * 100
+    assert downsampling.downsample(text, 10) is text
+
+
+def test_mean_buckets():
+    data = np.arange(20, dtype=float).reshape(10, 2)
+    assert downsampling.mean_buckets(data, 5).tolist() == [
+        [1, 2], [5, 6], [9, 10], [13, 14], [17, 18]]
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        downsampling.downsample(__rows__(100, 1), 10, 'median')
+
+
+@pytest.mark.parametrize('method', downsampling.METHODS)
+def test_row_type_kept(method):
+    rows = [[str(i), str(i % 7), f'{i / 4}'] for i in range(1000)]
+    out = downsampling.downsample(rows, 20, method)
+    assert all(isinstance(value, str) for row in out for value in row)
+    assert all(len(row) == 3 for row in out)
+    if method == 'mean':
+        assert float(out[0][0]) == np.mean(np.arange(50))
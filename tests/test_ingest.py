@@ -0,0 +1,106 @@
+"""Tests of the job ingestion payloads."""
+import asyncio
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+
+import ingest
+import rollup
+import support
+from api.job import __resolve__
+
+JOB = {'branch': 'master', 'jobnum': '12', 'dockerTag': 'snap:master',
+       'testScope': 'DAILY', 'timestamp_start': '2020-01-01T10:00:00',
+       'timestamp_end': '2020-01-01 11:00:00', 'result': 'SUCCESS'}
+
+
+def __result__(test, **values):
+    res = {'test': test, 'result': 'SUCCESS', 'start': '2020-01-01T10:05:00'}
+    res.update({field: 1 for field in rollup.FIELDS})
+    res.update(values)
+    return res
+
+
+def test_validate_converts():
+    job, results = ingest.validate(JOB, [__result__('a', duration='42')])
+    assert job['jobnum'] == 12
+    assert job['timestamp_end'] == datetime(2020, 1, 1, 11)
+    assert results[0]['duration'] == 42
+    assert results[0]['start'] == datetime(2020, 1, 1, 10, 5)
+    # the payload is not modified
+    assert JOB['jobnum'] == '12'
+
+
+@pytest.mark.parametrize('job, results', [
+    (dict(JOB, jobnum=None), [__result__('a')]),
+    (dict(JOB, jobnum='twelve'), [__result__('a')]),
+    (JOB, []),
+    (JOB, [__result__('a', start='yesterday')]),
+    (JOB, [__result__('a'), __result__('a')]),
+    (JOB, [__result__(5), __result__('5')]),
+    (JOB, [__result__(['a'])]),
+    (dict(JOB, jobnum=[]), [__result__('a')]),
+    (dict(JOB, timestamp_end={'date': 'today'}), [__result__('a')]),
+    (JOB, [__result__('a', duration=[1])]),
+    (JOB, ['a']),
+    (None, [__result__('a')]),
+])
+def test_validate_rejects(job, results):
+    with pytest.raises(ingest.PayloadError):
+        ingest.validate(job, results)
+
+
+def test_parse_json():
+    body = json.dumps({'job': JOB, 'results': [__result__('a')]}).encode()
+    job, results = ingest.parse(body, 'application/json')
+    assert job['branch'] == 'master'
+    assert [res['test'] for res in results] == ['a']
+
+
+def test_parse_ndjson_gzip():
+    lines = [JOB, __result__('a'), __result__('b')]
+    body = gzip.compress('\n'.join(json.dumps(line) for line in lines).encode() + b'\n')
+    _, results = ingest.parse(body, 'application/x-ndjson; charset=utf-8')
+    assert [res['test'] for res in results] == ['a', 'b']
+
+
+@pytest.mark.parametrize('body, content_type', [
+    (b'{not json', 'application/json'),
+    (b'[]', 'application/json'),
+    (b'', ingest.NDJSON),
+    (ingest.GZIP_MAGIC + b'corrupted', 'application/json'),
+])
+def test_parse_rejects(body, content_type):
+    with pytest.raises(ingest.PayloadError):
+        ingest.parse(body, content_type)
+
+
+def test_authorized(monkeypatch):
+    monkeypatch.setattr(ingest, 'TOKEN', 'secret')
+    assert ingest.authorized('Bearer secret')
+    assert ingest.authorized('bearer secret ')
+    assert not ingest.authorized('Bearer other')
+    assert not ingest.authorized('Basic secret')
+    assert not ingest.authorized(None)
+    monkeypatch.setattr(ingest, 'TOKEN', None)
+    assert not ingest.authorized('Bearer ')
+
+
+def test_resolve_rejects_test_by_name_and_id(monkeypatch):
+    async def result_id(tag):
+        return 1
+
+    async def test_id(name):
+        return {'a': 5}.get(name)
+
+    async def test_name(test):
+        return {5: 'a'}.get(test)
+
+    monkeypatch.setattr(support.CATALOG, 'result_id', result_id)
+    monkeypatch.setattr(support.CATALOG, 'test_id', test_id)
+    monkeypatch.setattr(support.CATALOG, 'test_name', test_name)
+    job, results = ingest.validate(JOB, [__result__('a'), __result__(5)])
+    error = asyncio.run(__resolve__(job, results))
+    assert error == 'Duplicated test `5` of result 1'
@@ -0,0 +1,59 @@
+"""Tests of the parsing of the result artifacts."""
+import hashlib
+import json
+
+import rollup
+from load_results import parse_graph, parse_job, stage
+
+GRAPH = b'<graph id="Graph">\r\n  <version>1.0</version>\r\n</graph>\r\n'
+
+
+def test_parse_graph_hashes_bytes(tmp_path):
+    path = tmp_path / 'graphs' / 'test.xml'
+    path.parent.mkdir()
+    path.write_bytes(GRAPH)
+    graph_path, graph, digest = parse_graph(str(path), str(tmp_path)).rstrip('\n').split('\t')
+    assert graph_path == 'graphs/test.xml'
+    # line endings are kept, the hash matches the one of upload_graphs
+    assert bytes.fromhex(graph) == GRAPH
+    assert digest == hashlib.sha256(GRAPH).hexdigest()
+
+
+def test_parse_graph_malformed(tmp_path):
+    path = tmp_path / 'test.xml'
+    path.write_bytes(b'<graph>')
+    assert parse_graph(str(path), str(tmp_path)) is None
+
+
+JOB = {'branch': 'master', 'jobnum': 12, 'dockerTag': 'snap:master',
+       'testScope': 'DAILY', 'timestamp_start': '2020-01-01T10:00:00',
+       'timestamp_end': '2020-01-01T11:00:00', 'result': 'SUCCESS'}
+
+
+def __job__(directory, job, test='test'):
+    directory.mkdir()
+    (directory / 'job.json').write_text(json.dumps(job), encoding='utf-8')
+    header = ['result', 'start'] + list(rollup.FIELDS)
+    row = ['SUCCESS', '2020-01-01T10:05:00'] + ['1'] * len(rollup.FIELDS)
+    (directory / (test + '.stats.csv')).write_text(
+        ','.join(header) + '\n' + ','.join(row) + '\n', encoding='utf-8')
+
+
+def test_parse_job_utf8(tmp_path):
+    __job__(tmp_path / 'job', JOB, test='tést')
+    staging = tmp_path / 'staging'
+    staging.mkdir()
+    files = parse_job(str(tmp_path / 'job'), str(staging))
+    with open(files['staging_results'], 'rb') as results:
+        assert results.read().decode('utf-8').split('\t')[2] == 'tést'
+
+
+def test_stage_skips_malformed_jobs(tmp_path):
+    results = tmp_path / 'results'
+    results.mkdir()
+    __job__(results / 'good', JOB)
+    __job__(results / 'bad', dict(JOB, jobnum={'number': 13}))
+    staging = tmp_path / 'staging'
+    staging.mkdir()
+    files = stage(str(results), str(staging), 1)
+    assert len(files['staging_jobs']) == 1
@@ -0,0 +1,51 @@
+"""Tests of the compression of the responses."""
+import asyncio
+import gzip
+from types import SimpleNamespace
+
+from sanic import response as responses
+
+import compression
+import middleware
+
+BODY = b'{"values":[' + b','.join(b'%d' % i for i in range(1000)) + b']}'
+
+
+def __compress__(response, accept='gzip'):
+    request = SimpleNamespace(headers={'accept-encoding': accept})
+    asyncio.run(middleware.compress_response(request, response))
+    return response
+
+
+def __response__(**headers):
+    return responses.raw(BODY, content_type='application/json', headers=headers)
+
+
+def test_compress_gzip():
+    response = __compress__(__response__())
+    assert response.headers['content-encoding'] == compression.GZIP
+    assert response.headers['vary'] == 'Accept-Encoding'
+    assert gzip.decompress(response.body) == BODY
+
+
+def test_identity():
+    response = __compress__(__response__(), accept='identity')
+    assert 'content-encoding' not in response.headers
+    assert response.body == BODY
+
+
+def test_vary_appended():
+    response = __compress__(__response__(Vary='Origin'))
+    assert response.headers['vary'] == 'Origin, Accept-Encoding'
+    response = __compress__(__response__(Vary='origin, accept-encoding'))
+    assert response.headers['vary'] == 'origin, accept-encoding'
+
+
+def test_level_clamped(monkeypatch):
+    monkeypatch.setattr(middleware, 'LEVEL', 11)
+    assert middleware.__level__(compression.GZIP) == 9
+    assert middleware.__level__(compression.BROTLI) == 11
+    response = __compress__(__response__())
+    assert gzip.decompress(response.body) == BODY
+    monkeypatch.setattr(middleware, 'LEVEL', None)
+    assert middleware.__level__(compression.ZSTD) is None
@@ -0,0 +1,39 @@
+"""Tests of the migration helpers."""
+import os
+
+import migrate
+
+
+def test_split_statements():
+    script = """
+    -- comment; not a statement
+    CREATE TABLE a (ID INTEGER); # trailing comment;
+    /* block; comment */
+    INSERT INTO a VALUES (1);
+    """
+    assert migrate.split_statements(script) == [
+        'CREATE TABLE a (ID INTEGER)', 'INSERT INTO a VALUES (1)']
+
+
+def test_split_statements_quotes():
+    script = """INSERT INTO t VALUES ('a;b', "c;d", 'it''s;', 'e\\';f');
+    SELECT `odd;name` FROM t"""
+    assert migrate.split_statements(script) == [
+        """INSERT INTO t VALUES ('a;b', "c;d", 'it''s;', 'e\\';f')""",
+        'SELECT `odd;name` FROM t']
+
+
+def test_split_migrations():
+    for migration in migrate.list_migrations():
+        if migration.path.endswith('.sql'):
+            with open(migration.path, 'r') as sql_file:
+                queries = migrate.split_statements(sql_file.read())
+            assert queries
+            assert not any(query.startswith('--') for query in queries)
+
+
+def test_list_migrations_sorted():
+    versions = [migration.version for migration in migrate.list_migrations()]
+    assert versions == sorted(versions)
+    assert all(os.path.exists(migration.path)
+               for migration in migrate.list_migrations())
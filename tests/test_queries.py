@@ -0,0 +1,70 @@
+"""Tests of the statements module."""
+import re
+
+import pytest
+
+import queries
+
+
+def test_where():
+    clause, params = queries.where({'author': 'me', 'testset': 'gpt'},
+                                   queries.TEST_COLUMNS, 'tests')
+    assert clause == 'WHERE tests.author = %(author)s AND tests.testset = %(testset)s'
+    assert params == {'author': 'me', 'testset': 'gpt'}
+
+
+def test_where_without_filters():
+    assert queries.where({}, queries.TEST_COLUMNS, 'tests') == ('', {})
+
+
+@pytest.mark.parametrize('column', ['ID; DROP TABLE tests', 'password', '1=1'])
+def test_where_rejects_columns(column):
+    with pytest.raises(ValueError):
+        queries.where({column: 'x'}, queries.TEST_COLUMNS, 'tests')
+
+
+def test_identifiers_whitelisted():
+    assert 'cpu_time' in queries.TEST_HISTORY(field='cpu_time')
+    with pytest.raises(ValueError):
+        queries.TEST_HISTORY(field='cpu_time FROM tests --')
+    with pytest.raises(ValueError):
+        queries.TEST_HISTORY()
+
+
+def test_texts_memoized():
+    assert queries.BRANCH_HISTORY(field='duration', scope='all') is \
+        queries.BRANCH_HISTORY(field='duration', scope='all')
+
+
+def test_statements_bound():
+    """Every statement only takes values as bound parameters."""
+    for query in queries.QUERIES.values():
+        identifiers = {ident: next(iter(allowed))
+                       for ident, allowed in query.identifiers.items()}
+        text = query(**identifiers)
+        assert '{' not in text, query.name
+        assert not re.search(r"%[^(s]", text.replace('%%', '')), query.name
+
+
+def test_no_window_functions():
+    """The deployed MySQL 5.7 has no window functions."""
+    for query in queries.QUERIES.values():
+        for values in zip(*query.identifiers.values()):
+            text = query(**dict(zip(query.identifiers, values)))
+            assert not re.search(r'\bOVER\s*\(', text), query.name
+            assert 'AS DOUBLE' not in text, query.name
+
+
+def test_compare_tags_whitelisted():
+    text = queries.BRANCH_COMPARE_MANY(field='duration', tags=3)
+    assert '%(tag_2)s' in text and '%(tag_3)s' not in text
+    with pytest.raises(ValueError):
+        queries.BRANCH_COMPARE_MANY(field='duration', tags=queries.MAX_COMPARE_TAGS + 1)
+
+
+def test_list_filters_whitelisted():
+    text = queries.TEST_LIST(where=queries.filter_key({'testset': 'gpt', 'author': 'me'}))
+    assert 'WHERE tests.author = %(author)s AND tests.testset = %(testset)s' in text
+    assert 'WHERE' not in queries.JOB_LIST(where=queries.filter_key({}))
+    with pytest.raises(ValueError):
+        queries.JOB_LIST(where=queries.filter_key({'1=1': 'x'}))
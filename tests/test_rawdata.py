@@ -0,0 +1,33 @@
+"""Tests of the raw_data profiles storage."""
+import pytest
+
+import compression
+import rawdata
+
+PROFILE = ('# profile\ntime,cpu,memory\n' +
+           ''.join(f'{i},{i % 100},{i * 2}\n' for i in range(30000)))
+
+
+@pytest.mark.parametrize('encoding', compression.available())
+def test_iter_rows(encoding):
+    payload, stored = rawdata.encode(PROFILE, encoding)
+    assert stored == encoding
+    rows = list(rawdata.iter_rows(payload, stored))
+    assert len(rows) == 30000
+    assert rows[0] == ['0', '0', '0']
+    assert rows[-1] == ['29999', '99', '59998']
+
+
+def test_iter_lines_multibyte():
+    text = 'h1\nh2\n' + 'é,ü\n' * 40000
+    payload, encoding = rawdata.encode(text, compression.GZIP)
+    assert ''.join(rawdata.iter_lines(payload, encoding)) == text
+
+
+def test_iter_lines_no_trailing_newline():
+    payload, encoding = rawdata.encode('h1\nh2\n1,2', compression.GZIP)
+    assert list(rawdata.iter_lines(payload, encoding)) == ['h1\n', 'h2\n', '1,2']
+
+
+def test_iter_rows_none():
+    assert list(rawdata.iter_rows(None, compression.IDENTITY)) == []
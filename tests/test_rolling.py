@@ -0,0 +1,40 @@
+"""Tests of the rolling window statistics."""
+import numpy as np
+import pytest
+
+import rolling
+
+VALUES = [3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0]
+
+
+def test_rolling_mean():
+    expected = [np.mean(VALUES[i:i + 3]) for i in range(len(VALUES) - 2)]
+    assert np.allclose(rolling.rolling_mean(VALUES, 3), expected)
+
+
+def test_rolling_median():
+    expected = [np.median(VALUES[i:i + 4]) for i in range(len(VALUES) - 3)]
+    assert np.allclose(rolling.rolling_median(VALUES, 4), expected)
+
+
+def test_rolling_ewma():
+    alpha = 2 / 4
+    weights = np.array([(1 - alpha) ** 2, 1 - alpha, 1])
+    expected = [np.dot(VALUES[i:i + 3], weights) / weights.sum()
+                for i in range(len(VALUES) - 2)]
+    assert np.allclose(rolling.rolling_ewma(VALUES, 3), expected)
+    # the most recent value has the highest weight
+    assert rolling.rolling_ewma([0, 0, 1], 3)[0] > 1 / 3
+
+
+@pytest.mark.parametrize('mode', rolling.MODES)
+def test_window_sizes(mode):
+    assert len(rolling.rolling(VALUES, 1, mode)) == len(VALUES)
+    assert len(rolling.rolling(VALUES, len(VALUES), mode)) == 1
+    assert len(rolling.rolling(VALUES, len(VALUES) + 1, mode)) == 0
+    assert len(rolling.rolling(VALUES, 0, mode)) == 0
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        rolling.rolling(VALUES, 3, 'max')
@@ -0,0 +1,70 @@
+"""Tests of the support functions."""
+import asyncio
+import datetime as dt
+
+import pytest
+
+import queries
+import support
+
+
+class FakeDB:
+    """DB answering the job statements and counting the queries."""
+    def __init__(self, num_tests):
+        self.num_tests = num_tests
+        self.queries = 0
+
+    def __rows__(self, query):
+        if query == queries.JOB():
+            return [{'ID': 1, 'branch': 'master', 'jobnum': 1, 'dockerTag': 1,
+                     'testScope': 'DAILY', 'result': 1,
+                     'timestamp_start': dt.datetime(2020, 1, 1),
+                     'timestamp_end': dt.datetime(2020, 1, 2)}]
+        if query == queries.JOB_RESULTS():
+            return [{'ID': i, 'test': i, 'job': 1, 'result': 1, 'duration': 10}
+                    for i in range(self.num_tests)]
+        if query == queries.JOB_TESTS():
+            return [{'ID': i, 'name': f'test_{i}'} for i in range(self.num_tests)]
+        if query == queries.DOCKER_TAGS():
+            return [{'ID': 1, 'name': 'snap:master'}]
+        if query == queries.RESULT_TAGS():
+            return [{'ID': 1, 'tag': 'SUCCESS'}]
+        if query == queries.TEST_NAMES():
+            return [{'ID': i, 'name': f'test_{i}'} for i in range(self.num_tests)]
+        return []
+
+    async def fetchall(self, query, *_):
+        self.queries += 1
+        return [dict(row) for row in self.__rows__(query)]
+
+    async def fetchone(self, query, *_):
+        rows = await self.fetchall(query)
+        return rows[0] if rows else None
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    def install(num_tests):
+        db = FakeDB(num_tests)
+        monkeypatch.setattr(support, 'DB', db)
+        monkeypatch.setattr(support.CATALOG, 'db', db)
+        asyncio.run(support.CATALOG.load())
+        db.queries = 0
+        return db
+    return install
+
+
+def __job_stats_queries__(db):
+    response = asyncio.run(support.get_job_stats(1))
+    assert response.status == 200
+    return db.queries
+
+
+def test_job_stats_queries_do_not_depend_on_tests(fake_db):
+    assert __job_stats_queries__(fake_db(1)) == __job_stats_queries__(fake_db(500))
+
+
+def test_job_stats_missing_job(fake_db):
+    db = fake_db(0)
+    db.__rows__ = lambda query: []
+    assert asyncio.run(support.get_job_stats(1)).status == 404
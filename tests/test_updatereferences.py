@@ -0,0 +1,67 @@
+"""Tests of the refresh of the reference values."""
+import pytest
+
+import updatereferences
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+    def execute(self, query, params=None):
+        self.db.queries.append(query)
+        if query == updatereferences.REF_TAG_QUERY:
+            self.row = {'ID': 3}
+        elif query == updatereferences.COUNT_REFRESHED:
+            self.row = {'num': self.db.refreshed}
+        return 0
+
+    def fetchone(self):
+        return self.row
+
+
+class FakeDB:
+    def __init__(self, refreshed):
+        self.refreshed = refreshed
+        self.queries = []
+        self.commits = self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_nothing_refreshed_keeps_references():
+    db = FakeDB(refreshed=0)
+    with pytest.raises(ValueError):
+        updatereferences.update_references(db, 'master', jobs=0)
+    assert updatereferences.CLEAR_STALE not in db.queries
+    assert (db.commits, db.rollbacks) == (0, 1)
+
+
+def test_refresh_clears_stale():
+    db = FakeDB(refreshed=5)
+    refreshed, _ = updatereferences.update_references(db, 'master')
+    assert refreshed == 5
+    assert updatereferences.CLEAR_STALE in db.queries
+    assert (db.commits, db.rollbacks) == (1, 0)
+
+
+@pytest.mark.parametrize('aggregation', list(updatereferences.AGGREGATIONS))
+def test_refresh_without_window_functions(aggregation):
+    """The deployed MySQL 5.7 has no window functions."""
+    query = updatereferences.refresh_query(aggregation)
+    assert 'OVER' not in query
+    assert query.count('AS rn_') == len(updatereferences.KEYS)
@@ -0,0 +1,29 @@
+"""Tests of the reading of the GPT graphs."""
+import hashlib
+
+import compression
+from upload_graphs import read_graph
+
+GRAPH = b'<graph id="Graph">\r\n  <version>1.0</version>\r\n</graph>\r\n'
+DIGEST = hashlib.sha256(GRAPH).hexdigest()
+
+
+def test_read_graph(tmp_path):
+    path = tmp_path / 'test.xml'
+    path.write_bytes(GRAPH)
+    digest, payload = read_graph(str(path), compression.GZIP)
+    assert digest == DIGEST
+    assert compression.decompress(payload, compression.GZIP) == GRAPH
+
+
+def test_read_graph_unchanged(tmp_path):
+    path = tmp_path / 'test.xml'
+    path.write_bytes(GRAPH)
+    assert read_graph(str(path), compression.GZIP, DIGEST, compression.GZIP) == (DIGEST, None)
+    # a new storage encoding re-encodes the graph
+    digest, payload = read_graph(str(path), compression.GZIP, DIGEST, compression.IDENTITY)
+    assert payload is not None
+
+
+def test_read_graph_missing(tmp_path):
+    assert read_graph(str(tmp_path / 'missing.xml'), compression.IDENTITY) is None